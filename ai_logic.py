@@ -1,115 +1,468 @@
+import asyncio
+import concurrent.futures
+import functools
 import os
-from dotenv import load_dotenv
-import semantic_kernel as sk
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
-from semantic_kernel.functions import KernelFunctionFromPrompt
-from semantic_kernel.functions import KernelArguments
 import json
+import queue
+import threading
+import time
 # from data.menu_data import MENU # Import MENU from the new file location - REMOVED
-import semantic_kernel.functions as sk_functions # Use alias to avoid potential conflicts
-from src.ai_drive_thru.db_utils import get_menu_items, get_item_quantity, update_item_quantity # Import DB utils
-from typing import List, Dict, Any
-
-load_dotenv() # Load environment variables from .env file
+from src.ai_drive_thru import db_utils
+from src.ai_drive_thru.db_utils import get_item_quantities, update_item_quantities, reorder_low_stock # Import DB utils
+from src.ai_drive_thru.menu_cache import get_menu_snapshot
+from src.ai_drive_thru.chef_context import get_chef_context
+from src.ai_drive_thru.fast_parser import parse_order_fast, parse_admin_command_fast, record_fast_path_attempt, record_llm_latency
+from src.ai_drive_thru.response_cache import ResponseCache, make_cache_key
+from src.ai_drive_thru.request_policy import RequestPolicy, RequestStats, hedged_call, stream_with_fallback
+from src.ai_drive_thru.confirmation import render_confirmation, canonical_order_json
+from src.ai_drive_thru.background_loop import BackgroundEventLoop
+from src.ai_drive_thru.scheduler import PeriodicTask, ProcessLock
+from src.ai_drive_thru.streaming_json import IncrementalActionParser
+from src.ai_drive_thru.voice_pipeline import TranscriptionBackend, OpenAITranscriptionBackend, split_wav_utterances, stream_utterance_pipeline
+from typing import List, Dict, Any, Optional, AsyncIterator, Iterator, Awaitable, Callable
+
+# --- Lazy Initialization ---
+# Importing semantic_kernel and openai takes seconds, and so did building the
+# kernel and parsing the .prompty files, all before Streamlit could draw the
+# first frame. Everything below is now built on first use (or by warm_up(),
+# which the app starts in the background) and memoized. Assigning to the
+# module-level names (kernel, openai_client, transcription_backend) still
+# overrides them, e.g. with a stand-in kernel in benchmarks.
 
-# Configure Semantic Kernel
-kernel = sk.Kernel()
-
-# Add OpenAI chat completion service
-api_key = os.getenv("OPENAI_API_KEY")
-org_id = os.getenv("OPENAI_ORG_ID") # Optional: if using OpenAI org ID
 service_id = "default" # Can be any name
 model_id = "gpt-4o" # Or your preferred model compatible with the prompt
-
-kernel.add_service(
-    OpenAIChatCompletion(
-        service_id=service_id,
-        ai_model_id=model_id,
-        api_key=api_key,
-        org_id=org_id,
-    ),
-)
+policy_service_id = "default-policy" # The same model, for calls made under a RequestPolicy
+fallback_service_id = "fallback"
+FALLBACK_MODEL_ID = os.getenv("FALLBACK_MODEL_ID", "gpt-4o-mini") # Faster model for hedged OrderTaker requests
+
+kernel = None # Built by get_kernel()
+openai_client = None # Built by get_openai_client()
+_init_lock = threading.RLock()
+_env_loaded = False
+
+def load_environment() -> None:
+    """Loads environment variables from .env, once."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _init_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv() # Load environment variables from .env file
+            _env_loaded = True
+
+def get_openai_client():
+    """Returns the shared AsyncOpenAI client, creating it on first use.
+
+    One long-lived client with an explicit keep-alive pool. Every kernel call
+    runs on the background loop below, so pooled connections (and their TLS
+    sessions) are reused across requests instead of being re-established per call.
+    OPENAI_BASE_URL, if set, points the client at another OpenAI-compatible endpoint.
+    """
+    global openai_client
+    if openai_client is None:
+        with _init_lock:
+            if openai_client is None:
+                load_environment()
+                import httpx
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+                openai_client = AsyncOpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    organization=os.getenv("OPENAI_ORG_ID"), # Optional: if using OpenAI org ID
+                    base_url=os.getenv("OPENAI_BASE_URL") or None,
+                    http_client=DefaultAsyncHttpxClient(
+                        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=120),
+                    ),
+                )
+    return openai_client
+
+def get_kernel():
+    """Returns the Semantic Kernel with the OpenAI chat service registered, building it on first use."""
+    global kernel
+    if kernel is None:
+        with _init_lock:
+            if kernel is None:
+                import semantic_kernel as sk
+                from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
+                new_kernel = sk.Kernel()
+                new_kernel.add_service(
+                    OpenAIChatCompletion(
+                        service_id=service_id,
+                        ai_model_id=model_id,
+                        async_client=get_openai_client(),
+                    ),
+                )
+                # Calls under a request policy (OrderTaker) are retried by the policy
+                # within its deadline; the SDK's own retries would stack on top of
+                # those, so these services' clients don't retry on their own
+                new_kernel.add_service(
+                    OpenAIChatCompletion(
+                        service_id=policy_service_id,
+                        ai_model_id=model_id,
+                        async_client=get_openai_client().with_options(max_retries=0),
+                    ),
+                )
+                if FALLBACK_MODEL_ID:
+                    new_kernel.add_service(
+                        OpenAIChatCompletion(
+                            service_id=fallback_service_id,
+                            ai_model_id=FALLBACK_MODEL_ID,
+                            async_client=get_openai_client().with_options(max_retries=0),
+                        ),
+                    )
+                kernel = new_kernel
+    return kernel
+
+def kernel_arguments(**values):
+    """Builds KernelArguments without importing semantic_kernel at module import time."""
+    from semantic_kernel.functions import KernelArguments
+    return KernelArguments(**values)
+
+# Event loop shared by every synchronous wrapper below (see background_loop.py)
+background_loop = BackgroundEventLoop(name="ai-logic-loop")
+
+def run_sync(coro):
+    """Runs a coroutine on ai_logic's background loop and returns its result."""
+    return background_loop.run(coro)
+
+# Blocking work (SQLite queries, audio processing) is handed to a small pool of
+# worker threads so the event loop keeps serving other lanes meanwhile. Each
+# worker thread keeps its own pooled SQLite connection (see db_utils.py).
+DB_WORKER_THREADS = 8
+_blocking_executor = concurrent.futures.ThreadPoolExecutor(max_workers=DB_WORKER_THREADS, thread_name_prefix="ai-logic-db")
+
+async def run_blocking(func, *args):
+    """Runs a blocking call on ai_logic's worker threads and awaits its result."""
+    return await asyncio.get_running_loop().run_in_executor(_blocking_executor, functools.partial(func, *args))
+
+# Parse simple utterances ("two cheeseburgers and a fries") locally and only call
+# the OrderTaker LLM when the fast-path parser is not confident.
+USE_FAST_ORDER_PARSER = True
 
 # Define the path to the prompts directory
 prompts_dir = os.path.join(os.path.dirname(__file__), "prompts")
 
 # --- Helper Function to Format Menu (Updated for DB data and stock) ---
 def format_menu_for_prompt() -> str: # No longer takes menu_data as input
-    """Fetches menu items from DB and formats them into a string for the LLM prompt,
-       excluding items with quantity 0."""
-    menu_items = get_menu_items() # Fetch from DB
-    menu_lines = []
-    # Group items by name for potential variations (like Soda flavours if we add them later)
-    # For now, we assume unique names from the DB schema constraint
-    for item in menu_items:
-        if item['quantity'] > 0: # Only include items in stock
-            # Basic formatting, assuming 'description' isn't needed for the core prompt
-            menu_lines.append(f"- {item['name']}: ${item['price']:.2f}")
-            # We might need a more complex formatting if variations (like Soda flavors)
-            # are stored differently in the DB later.
-
-    if not menu_lines:
-        return "Apologies, the menu is currently empty or unavailable."
-
-    return "\n".join(menu_lines)
+    """Returns the menu string for the LLM prompt, excluding items with quantity 0.
+
+    Served from the shared menu snapshot, so this is a dictionary lookup unless
+    the menu changed since the last call.
+    """
+    return get_menu_snapshot().menu_prompt
 
 # --- Helper Function to Format Full Inventory (for Admin) ---
 def format_inventory_for_prompt() -> str:
-    """Fetches all inventory items from DB and formats them into a string for the LLM prompt,
-       including their quantities."""
-    inventory_items = get_menu_items() # Fetch all items from DB
-    inventory_lines = []
-    for item in inventory_items:
-        inventory_lines.append(f"- {item['name']}: {item['quantity']} available")
-
-    if not inventory_lines:
-        return "Inventory is currently empty."
-
-    return "\n".join(inventory_lines)
-
-# Load the OrderTaker function from its prompty file content
-try:
-    order_taker_path = os.path.join(prompts_dir, "OrderTaker.prompty")
-    # Revert to using from_yaml, loading the file content first
-    with open(order_taker_path, 'r') as f:
-        order_taker_yaml = f.read()
-    order_taker_func = sk_functions.KernelFunctionFromPrompt.from_yaml(order_taker_yaml)
-
-except FileNotFoundError:
-    print(f"Error: OrderTaker.prompty not found at {order_taker_path}")
-    order_taker_func = None # Set to None to indicate failure
-except Exception as e:
-    print(f"An unexpected error occurred loading OrderTaker prompt: {e}")
-    order_taker_func = None # Set to None to indicate failure
-
-# Load the Confirmer function from its prompty file content
-try:
-    confirmer_path = os.path.join(prompts_dir, "Confirmer.prompty")
-    # Revert to using from_yaml for Confirmer as well
-    with open(confirmer_path, 'r') as f:
-        confirmer_yaml = f.read()
-    confirmer_func = sk_functions.KernelFunctionFromPrompt.from_yaml(confirmer_yaml)
-
-except FileNotFoundError:
-    print(f"Error: Confirmer.prompty not found at {confirmer_path}")
-    confirmer_func = None
-except Exception as e:
-    print(f"An unexpected error occurred loading Confirmer prompt: {e}")
-    confirmer_func = None
-
-# Load the AdminManager function from its prompty file content
-try:
-    admin_manager_path = os.path.join(prompts_dir, "AdminManager.prompty")
-    with open(admin_manager_path, 'r') as f:
-        admin_manager_yaml = f.read()
-    admin_manager_func = sk_functions.KernelFunctionFromPrompt.from_yaml(admin_manager_yaml)
-
-except FileNotFoundError:
-    print(f"Error: AdminManager.prompty not found at {admin_manager_path}")
-    admin_manager_func = None
-except Exception as e:
-    print(f"An unexpected error occurred loading AdminManager prompt: {e}")
-    admin_manager_func = None
+    """Returns the inventory string (including quantities) for the admin LLM prompt,
+       served from the shared menu snapshot."""
+    return get_menu_snapshot().inventory_prompt
+
+# --- Prompt Functions ---
+# Each .prompty file is parsed on first use and memoized. A prompt that fails
+# to load is remembered as None (and reported once), as before.
+_prompt_functions: Dict[str, Any] = {}
+
+def get_prompt_function(name: str):
+    """Returns the kernel function for prompts/<name>.prompty, or None if it could not be loaded."""
+    if name in _prompt_functions:
+        return _prompt_functions[name]
+    with _init_lock:
+        if name not in _prompt_functions:
+            _prompt_functions[name] = _load_prompt_function(name)
+    return _prompt_functions[name]
+
+def _load_prompt_function(name: str):
+    prompt_path = os.path.join(prompts_dir, f"{name}.prompty")
+    try:
+        from semantic_kernel.functions import KernelFunctionFromPrompt
+        # Load with from_yaml, reading the file content first
+        with open(prompt_path, 'r') as f:
+            prompt_yaml = f.read()
+        return KernelFunctionFromPrompt.from_yaml(prompt_yaml)
+    except FileNotFoundError:
+        print(f"Error: {name}.prompty not found at {prompt_path}")
+    except Exception as e:
+        print(f"An unexpected error occurred loading {name} prompt: {e}")
+    return None # None indicates failure
+
+# --- Warm-Up ---
+PROMPT_NAMES = ["OrderTaker", "Confirmer", "AdminManager"]
+_warm_up_thread: Optional[threading.Thread] = None
+
+def warm_up(connect: bool = False) -> Dict[str, float]:
+    """Does all lazy initialization now instead of on the first request.
+
+    Loads .env, builds the OpenAI client and the kernel, parses every prompt,
+    builds the menu snapshot and imports the audio preprocessing stage (NumPy,
+    and scipy if installed, which alone takes a second or more). With connect=True it also opens a pooled connection
+    to the API (which also verifies the key), replacing the old startup check.
+
+    Returns:
+        Seconds spent on each step.
+    """
+    timings = {}
+    steps = [
+        ("environment", load_environment),
+        ("client", get_openai_client),
+        ("kernel", get_kernel),
+        ("prompts", lambda: [get_prompt_function(name) for name in PROMPT_NAMES]),
+        ("menu", get_menu_snapshot),
+    ]
+    if PREPROCESS_AUDIO:
+        steps.append(("audio", _load_audio_preprocessing))
+    if connect:
+        async def list_models():
+            return await get_openai_client().models.list() # An awaitable paginator, not a coroutine
+        steps.append(("connection", lambda: run_sync(list_models())))
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Warm-up step '{name}' failed: {e}")
+        timings[name] = time.perf_counter() - started
+    return timings
+
+def start_background_warm_up(connect: bool = True) -> threading.Thread:
+    """Runs warm_up() on a daemon thread, once per process, and returns the thread."""
+    global _warm_up_thread
+    with _init_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, kwargs={"connect": connect}, name="ai-logic-warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
+
+# --- Cached Kernel Invocation ---
+# Responses are keyed on the prompt, the normalized user input and the exact
+# menu/inventory text the prompt is rendered with (see response_cache.py), so
+# any stock change that alters that text invalidates the affected entries.
+USE_RESPONSE_CACHE = True
+response_cache = ResponseCache()
+
+async def invoke_with_cache(function, prompt_name: str, text_input: str, context: str, arguments,
+                            invoke: Optional[Callable[[], Awaitable[Any]]] = None) -> tuple:
+    """Invokes a prompt function through the response cache.
+
+    Args:
+        function: The kernel function to invoke on a cache miss.
+        prompt_name: Identifies the prompt in the cache key (e.g. "OrderTaker").
+        text_input: The user's input, normalized for the key.
+        context: The menu/inventory text passed to the prompt.
+        arguments: The KernelArguments for the invocation.
+        invoke: Makes the call on a cache miss instead of a plain kernel.invoke
+            (e.g. invoke_with_policy).
+
+    Returns:
+        A (response text, served from cache) tuple.
+    """
+    cache_key = make_cache_key(prompt_name, text_input, context) if USE_RESPONSE_CACHE else None
+    if cache_key:
+        cached = await run_blocking(response_cache.get, cache_key)
+        if cached is not None:
+            print(f"{prompt_name} response served from cache.")
+            return cached, True
+
+    result = await (invoke() if invoke is not None else get_kernel().invoke(function, arguments=arguments))
+    result_str = str(result)
+
+    # Only remember well-formed JSON answers; anything else should be retried next time
+    if cache_key:
+        try:
+            json.loads(result_str)
+            await run_blocking(response_cache.put, cache_key, result_str)
+        except json.JSONDecodeError:
+            pass
+    return result_str, False
+
+# --- OrderTaker Request Policy ---
+# A slow gpt-4o reply leaves a car waiting at the speaker. OrderTaker calls
+# have a deadline, retry transient errors, and are hedged: if gpt-4o hasn't
+# answered after LLM_HEDGE_DELAY_MS, the same prompt goes to FALLBACK_MODEL_ID
+# and the first answer wins (see request_policy.py). order_taker_stats shows
+# how often the hedge fires and wins, and the p99 latency.
+USE_HEDGED_REQUESTS = True
+ORDER_TAKER_POLICY = RequestPolicy(
+    deadline_seconds=float(os.getenv("LLM_DEADLINE_MS", "8000")) / 1000,
+    hedge_delay_seconds=float(os.getenv("LLM_HEDGE_DELAY_MS", "1500")) / 1000,
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "1")),
+)
+order_taker_stats = RequestStats()
+
+def _service_settings(function, target_service_id: str):
+    """The function's execution settings (temperature, JSON mode, ...) pointed at another service."""
+    from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+    settings = (getattr(function, "prompt_execution_settings", None) or {}).get(service_id)
+    if settings is None:
+        return PromptExecutionSettings(service_id=target_service_id)
+    return settings.model_copy(update={"service_id": target_service_id})
+
+async def invoke_with_policy(function, policy: RequestPolicy, stats: Optional[RequestStats] = None, **values):
+    """Invokes a prompt function under a request policy, hedging with the fallback model.
+
+    Each request gets fresh KernelArguments built from values, since the
+    kernel's service selection adds to the arguments' settings.
+    """
+    active_kernel = get_kernel()
+    primary_settings = _service_settings(function, policy_service_id)
+
+    async def primary():
+        return await active_kernel.invoke(function, arguments=kernel_arguments(settings=primary_settings, **values))
+
+    fallback_settings = _service_settings(function, fallback_service_id)
+
+    async def fallback_call():
+        return await active_kernel.invoke(function, arguments=kernel_arguments(settings=fallback_settings, **values))
+
+    hedge = fallback_call if USE_HEDGED_REQUESTS and FALLBACK_MODEL_ID else None
+    return await hedged_call(primary, hedge, policy, stats)
+
+def get_order_taker_stats() -> Dict[str, Any]:
+    """Returns the OrderTaker request counters: hedges sent and won, retries, timeouts, p50/p99 latency."""
+    return order_taker_stats.snapshot()
+
+# --- Helper Function to Validate Stock for a Parsed Order ---
+def _requested_quantity(line: Dict[str, Any]) -> int:
+    """Reads a line's quantity, assuming 1 if it is missing or malformed."""
+    try:
+        return int(line.get("quantity", 1))
+    except (ValueError, TypeError):
+        return 1
+
+def check_order_stock(order_data: Dict[str, Any]) -> None:
+    """Validates every line of a parsed OrderTaker response against current stock.
+
+    Handles both the "actions" list the OrderTaker prompt returns and the legacy
+    "order" list. Quantities for the whole order are fetched in a single query.
+    Lines that cannot be fulfilled are dropped and reported under
+    "unavailable_items"; "remove" actions are never stock-checked. Several lines
+    for the same item draw down the same available quantity.
+    The order_data dictionary is updated in place.
+    """
+    # Each entry: (key holding the list, predicate selecting lines that consume stock)
+    line_lists = []
+    if isinstance(order_data.get("actions"), list):
+        line_lists.append(("actions", lambda line: line.get("action") == "add"))
+    if isinstance(order_data.get("order"), list):
+        line_lists.append(("order", lambda line: True))
+    if not line_lists:
+        return
+
+    names_to_check = [
+        line.get("item")
+        for key, needs_stock in line_lists
+        for line in order_data[key]
+        if isinstance(line, dict) and needs_stock(line)
+    ]
+    # One round trip for the whole order, however many lines it has
+    available = get_item_quantities(names_to_check)
+    remaining = {name.lower(): quantity for name, quantity in available.items() if quantity is not None}
+
+    unavailable_items = []
+    for key, needs_stock in line_lists:
+        validated_lines = []
+        for item_details in order_data[key]:
+            if not isinstance(item_details, dict):
+                print(f"Warning: Skipping malformed order line: {item_details}")
+                continue
+            if not needs_stock(item_details):
+                validated_lines.append(item_details) # e.g. removals don't need stock
+                continue
+            if validate_order_line(item_details, remaining, unavailable_items):
+                validated_lines.append(item_details)
+
+        # Replace the original lines with the validated ones
+        order_data[key] = validated_lines
+
+    # Add information about unavailable items
+    if unavailable_items:
+        order_data["unavailable_items"] = unavailable_items
+
+def validate_order_line(item_details: Dict[str, Any], remaining: Dict[str, int], unavailable_items: List[Dict[str, Any]]) -> bool:
+    """Checks one stock-consuming line against the remaining quantities.
+
+    Args:
+        item_details: The order line ({"item": ..., "quantity": ...}).
+        remaining: Lower-cased item name -> quantity still available; drawn down on success.
+        unavailable_items: Receives a {"item", "reason"} entry if the line is rejected.
+
+    Returns:
+        True if the line can be fulfilled.
+    """
+    item_name = item_details.get("item")
+    if not item_name:
+        print(f"Warning: Order item missing 'item' key: {item_details}")
+        return False # Skip invalid item entries
+
+    item_quantity_requested = _requested_quantity(item_details)
+    available_quantity = remaining.get(item_name.lower())
+
+    if available_quantity is None:
+        # The OrderTaker prompt should only return known items; anything else
+        # is likely a hallucination, so report it as unavailable.
+        print(f"Warning: Item '{item_name}' not found in DB during stock check.")
+        unavailable_items.append({"item": item_name, "reason": "Item not found on menu."})
+        return False
+
+    if available_quantity == 0:
+        print(f"Stock Check: Item '{item_name}' is out of stock.")
+        unavailable_items.append({"item": item_name, "reason": "Out of stock."})
+        return False
+
+    if available_quantity < item_quantity_requested:
+        print(f"Stock Check: Insufficient stock for '{item_name}'. Requested: {item_quantity_requested}, Available: {available_quantity}")
+        unavailable_items.append({
+            "item": item_name,
+            "reason": f"Insufficient stock. Only {available_quantity} available."
+        })
+        return False
+
+    # Item is in stock and quantity is sufficient
+    remaining[item_name.lower()] = available_quantity - item_quantity_requested
+    return True
+
+def try_fast_path(text_input: str) -> Optional[Dict[str, Any]]:
+    """Parses the input with the local fast-path parser, stock-checked, or returns None to use the LLM."""
+    if not USE_FAST_ORDER_PARSER:
+        return None
+    parse_started = time.perf_counter()
+    try:
+        fast_result = parse_order_fast(text_input, get_menu_snapshot())
+    except Exception as e:
+        print(f"Fast-path parser failed, falling back to LLM: {e}")
+        fast_result = None
+    record_fast_path_attempt(fast_result is not None, time.perf_counter() - parse_started)
+    if fast_result is not None:
+        print(f"Fast-path parse: {fast_result}") # Debugging
+        check_order_stock(fast_result)
+    return fast_result
+
+def load_order_json(result_str: str) -> Dict[str, Any]:
+    """Parses an OrderTaker response into a dictionary (without the stock check).
+
+    Returns a dictionary with an "error" key if the response is not valid JSON.
+    """
+    try:
+        order_data = json.loads(result_str)
+        # Add raw response for potential debugging in app.py if needed
+        order_data["raw_response"] = result_str
+        return order_data
+    except json.JSONDecodeError as json_e:
+        print(f"JSON Decode Error: {json_e}")
+        # Try to find JSON within potential ```json ... ``` block if model wraps it
+        if "```json" in result_str:
+            try:
+                json_block = result_str.split("```json")[1].split("```")[0].strip()
+                order_data = json.loads(json_block)
+                order_data["raw_response"] = result_str # Still include original raw
+                return order_data
+            except Exception as inner_e:
+                 print(f"Failed to extract/parse JSON block: {inner_e}")
+                 return {"error": f"Failed to parse order JSON: {json_e}", "raw_response": result_str}
+        else:
+            return {"error": f"Failed to parse order JSON: {json_e}", "raw_response": result_str}
+    except Exception as e:
+        print(f"Error processing kernel result: {e}")
+        return {"error": f"An unexpected error occurred: {str(e)}", "raw_response": result_str}
 
 async def get_order_from_text_async(text_input: str) -> dict:
     """Processes the user's text input using Semantic Kernel and OrderTaker prompt.
@@ -120,109 +473,248 @@ async def get_order_from_text_async(text_input: str) -> dict:
     Returns:
         A dictionary representing the structured order or an error message.
     """
+    # --- Fast Path: simple utterances are parsed locally, skipping the LLM ---
+    fast_result = await run_blocking(try_fast_path, text_input)
+    if fast_result is not None:
+        return fast_result
+
+    order_taker_func = get_prompt_function("OrderTaker")
+
     if not order_taker_func:
          return {"error": "Order Taker function not loaded properly."}
     try:
         # Format the current menu from DB
-        formatted_menu = format_menu_for_prompt()
+        formatted_menu = await run_blocking(format_menu_for_prompt)
 
         # Prepare arguments, including the dynamic menu
-        # Use the alias for KernelArguments
-        arguments = sk_functions.KernelArguments(input=text_input, menu=formatted_menu)
+        arguments = kernel_arguments(input=text_input, menu=formatted_menu)
 
-        # Invoke the function loaded from YAML
-        result = await kernel.invoke(
+        # Invoke the function loaded from YAML (or reuse a cached answer for the same input and menu)
+        llm_started = time.perf_counter()
+        result_str, from_cache = await invoke_with_cache(
              order_taker_func, # Invoke the function object directly
-             arguments=arguments
+             "OrderTaker",
+             text_input,
+             formatted_menu,
+             arguments,
+             # Deadline, retries and a hedge to the fallback model on a cache miss
+             invoke=lambda: invoke_with_policy(order_taker_func, ORDER_TAKER_POLICY, order_taker_stats,
+                                               input=text_input, menu=formatted_menu),
         )
+        if not from_cache:
+            record_llm_latency(time.perf_counter() - llm_started)
 
         # The result from a JSON prompt should ideally be a JSON string.
-        result_str = str(result)
         print(f"Semantic Kernel Response Content: {result_str}") # Debugging
 
-        # Parse the JSON string result
-        try:
-            order_data = json.loads(result_str)
-            # Add raw response for potential debugging in app.py if needed
-            order_data["raw_response"] = result_str
-
+        order_data = load_order_json(result_str)
+        if "error" not in order_data:
             # --- Post-processing: Stock Check ---
-            if "order" in order_data and isinstance(order_data["order"], list):
-                validated_order = []
-                unavailable_items = []
-                items_to_check = order_data["order"] # Get the list of items from the LLM response
-
-                for item_details in items_to_check:
-                    item_name = item_details.get("item")
-                    item_quantity_requested = item_details.get("quantity", 1) # Assume 1 if not specified
-
-                    if not item_name:
-                        print(f"Warning: Order item missing 'item' key: {item_details}")
-                        continue # Skip invalid item entries
-
-                    # Check stock in DB
-                    available_quantity = get_item_quantity(item_name)
-
-                    if available_quantity is None:
-                        print(f"Warning: Item '{item_name}' not found in DB during stock check.")
-                        # Decide how to handle - maybe add to unavailable? Or let LLM handle?
-                        # For now, let's assume the OrderTaker prompt should only return known items.
-                        # If it returns unknown items, maybe it's a hallucination or needs clarification.
-                        # Let's add it to unavailable for now.
-                        unavailable_items.append({"item": item_name, "reason": "Item not found on menu."})
-
-                    elif available_quantity == 0:
-                        print(f"Stock Check: Item '{item_name}' is out of stock.")
-                        unavailable_items.append({"item": item_name, "reason": "Out of stock."})
-
-                    elif available_quantity < item_quantity_requested:
-                         print(f"Stock Check: Insufficient stock for '{item_name}'. Requested: {item_quantity_requested}, Available: {available_quantity}")
-                         # Add to unavailable, maybe suggest ordering the available amount?
-                         unavailable_items.append({
-                             "item": item_name,
-                             "reason": f"Insufficient stock. Only {available_quantity} available."
-                         })
-                         # Option: Add the available quantity to the order instead?
-                         # item_details['quantity'] = available_quantity
-                         # validated_order.append(item_details)
-                         # For now, just report as unavailable.
-
-                    else:
-                        # Item is in stock and quantity is sufficient
-                        validated_order.append(item_details)
-
-                # Replace the original order with the validated one
-                order_data["order"] = validated_order
-                # Add information about unavailable items
-                if unavailable_items:
-                    order_data["unavailable_items"] = unavailable_items
+            await run_blocking(check_order_stock, order_data)
             # --- End Stock Check ---
-
-            return order_data
-        except json.JSONDecodeError as json_e:
-            print(f"JSON Decode Error: {json_e}")
-            # Try to find JSON within potential ```json ... ``` block if model wraps it
-            if "```json" in result_str:
-                try:
-                    json_block = result_str.split("```json")[1].split("```")[0].strip()
-                    order_data = json.loads(json_block)
-                    order_data["raw_response"] = result_str # Still include original raw
-                    return order_data
-                except Exception as inner_e:
-                     print(f"Failed to extract/parse JSON block: {inner_e}")
-                     return {"error": f"Failed to parse order JSON: {json_e}", "raw_response": result_str}
-            else:
-                return {"error": f"Failed to parse order JSON: {json_e}", "raw_response": result_str}
-        except Exception as e:
-            print(f"Error processing kernel result: {e}")
-            return {"error": f"An unexpected error occurred: {str(e)}", "raw_response": result_str}
+        return order_data
 
     except Exception as e:
         print(f"Error interacting with Semantic Kernel: {e}")
         return {"error": str(e)}
 
+# --- Streaming OrderTaker ---
+# The sidebar used to wait for the whole OrderTaker completion before showing
+# anything. In streaming mode the response is parsed as tokens arrive, and each
+# add/remove action is yielded (already stock-checked) as soon as its JSON
+# object closes. Actions are held back until the response's "status" is known
+# to be "success", so a clarification or error never touches the order.
+# The stream runs under ORDER_TAKER_POLICY too: if no token arrives within the
+# hedge delay, it is dropped for the hedged unstreamed request, whose answer
+# is parsed the same way in one chunk.
+
+async def _stream_response_text(arguments) -> AsyncIterator[str]:
+    """Yields the OrderTaker response text chunk by chunk as the model generates it."""
+    async for chunk in get_kernel().invoke_stream(get_prompt_function("OrderTaker"), arguments=arguments):
+        # Each streamed item is a list of message chunks (one per choice)
+        if isinstance(chunk, list) and chunk:
+            text = str(chunk[0])
+        else:
+            text = str(chunk or "")
+        if text:
+            yield text
+
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
+async def stream_order_from_text_async(text_input: str) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming version of get_order_from_text_async.
+
+    Yields:
+        {"type": "action", "action": {...}, "elapsed_ms": ...} for each validated
+        add/remove action, in order, as soon as it is complete; then exactly one
+        {"type": "result", "result": {...}} with the full response in the same shape
+        get_order_from_text_async returns. Its "actions" are exactly the ones yielded.
+    """
+    started = time.perf_counter()
+
+    def action_event(action: Dict[str, Any]) -> Dict[str, Any]:
+        return {"type": "action", "action": action, "elapsed_ms": (time.perf_counter() - started) * 1000}
+
+    fast_result = await run_blocking(try_fast_path, text_input)
+    if fast_result is not None:
+        for action in fast_result.get("actions", []):
+            yield action_event(action)
+        yield {"type": "result", "result": fast_result}
+        return
+
+    order_taker_func = get_prompt_function("OrderTaker")
+
+    if not order_taker_func:
+        yield {"type": "result", "result": {"error": "Order Taker function not loaded properly."}}
+        return
+
+    try:
+        # Stock is checked against the snapshot the prompt was rendered from, so
+        # validating an action mid-stream needs no database round trip.
+        snapshot = await run_blocking(get_menu_snapshot)
+        formatted_menu = snapshot.menu_prompt
+        remaining = {name: item['quantity'] for name, item in snapshot.by_name.items()}
+
+        cache_key = make_cache_key("OrderTaker", text_input, formatted_menu) if USE_RESPONSE_CACHE else None
+        cached = await run_blocking(response_cache.get, cache_key) if cache_key else None
+        if cached is not None:
+            print("OrderTaker response served from cache.")
+            chunks = _single_chunk(cached)
+        else:
+            primary_settings = _service_settings(order_taker_func, policy_service_id)
+
+            async def unstreamed(policy: RequestPolicy) -> str:
+                return str(await invoke_with_policy(order_taker_func, policy, input=text_input, menu=formatted_menu))
+
+            chunks = stream_with_fallback(
+                lambda: _stream_response_text(kernel_arguments(settings=primary_settings, input=text_input, menu=formatted_menu)),
+                unstreamed, ORDER_TAKER_POLICY, order_taker_stats,
+            )
+
+        parser = IncrementalActionParser()
+        validated_actions: List[Dict[str, Any]] = []
+        unavailable_items: List[Dict[str, Any]] = []
+        pending: List[Dict[str, Any]] = [] # Complete actions waiting for the status
+        first_action_ms = None
+
+        def accept(action: Dict[str, Any]) -> bool:
+            if not isinstance(action, dict):
+                print(f"Warning: Skipping malformed order line: {action}")
+                return False
+            if action.get("action") == "add" and not validate_order_line(action, remaining, unavailable_items):
+                return False
+            validated_actions.append(action)
+            return True
+
+        async for text in chunks:
+            pending.extend(parser.feed(text))
+            if parser.status is None:
+                continue
+            for action in pending:
+                if accept(action) and parser.status == "success":
+                    if first_action_ms is None:
+                        first_action_ms = (time.perf_counter() - started) * 1000
+                    yield action_event(action)
+            pending = []
+        for action in pending:
+            accept(action) # Status never arrived: validate, but don't apply mid-stream
+
+        result_str = parser.text
+        total_ms = (time.perf_counter() - started) * 1000
+        if cached is None:
+            record_llm_latency(total_ms / 1000)
+            if cache_key:
+                try:
+                    json.loads(result_str)
+                    await run_blocking(response_cache.put, cache_key, result_str)
+                except json.JSONDecodeError:
+                    pass
+        print(f"Semantic Kernel Response Content: {result_str}") # Debugging
+
+        order_data = load_order_json(result_str)
+        if "error" not in order_data:
+            actions = order_data.pop("actions", None)
+            await run_blocking(check_order_stock, order_data) # Any legacy "order" list
+            if isinstance(actions, list):
+                order_data["actions"] = validated_actions
+            if unavailable_items:
+                order_data["unavailable_items"] = order_data.get("unavailable_items", []) + unavailable_items
+            order_data["stream_stats"] = {"first_action_ms": first_action_ms, "total_ms": total_ms}
+        yield {"type": "result", "result": order_data}
+
+    except Exception as e:
+        print(f"Error streaming from Semantic Kernel: {e}")
+        yield {"type": "result", "result": {"error": str(e)}}
+
+# --- Voice Orders ---
+# A recording is first shrunk locally (silence trimmed, mono, 16 kHz; see
+# audio_preprocessing.py), then split into utterances at silences; each is
+# transcribed concurrently and fed to the streaming OrderTaker as soon as its
+# transcript is back (see voice_pipeline.py). Swap transcription_backend for a
+# StubTranscriptionBackend to run without the audio API.
+PREPROCESS_AUDIO = True
+COMPRESS_AUDIO_UPLOADS = False # FLAC uploads; needs the optional soundfile package
+
+def _load_audio_preprocessing():
+    """Returns preprocess_wav, importing it (NumPy, and scipy if installed) on first use."""
+    from src.ai_drive_thru.audio_preprocessing import preprocess_wav
+    return preprocess_wav
+
+def prepare_audio_upload(wav_bytes: bytes) -> tuple:
+    """Compresses one utterance for upload when COMPRESS_AUDIO_UPLOADS is set; returns (bytes, file name)."""
+    if not COMPRESS_AUDIO_UPLOADS:
+        return wav_bytes, "utterance.wav"
+    processed = _load_audio_preprocessing()(wav_bytes, trim=False, compress=True)
+    return processed.data, f"utterance.{processed.format}"
+
+transcription_backend: Optional[TranscriptionBackend] = None # Built by get_transcription_backend()
+
+def get_transcription_backend() -> TranscriptionBackend:
+    """Returns the transcription backend, defaulting to the OpenAI audio API on ai_logic's client."""
+    global transcription_backend
+    if transcription_backend is None:
+        with _init_lock:
+            if transcription_backend is None:
+                transcription_backend = OpenAITranscriptionBackend(
+                    get_openai_client(), model="whisper-1", prepare_upload=prepare_audio_upload,
+                )
+    return transcription_backend
+
+MAX_CONCURRENT_TRANSCRIPTIONS = 4
+
+async def stream_voice_order_async(wav_bytes: bytes, backend: Optional[TranscriptionBackend] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Transcribes a WAV recording utterance by utterance and streams the order events for each.
+
+    Yields, in utterance order and tagged with "utterance": a {"type": "transcript", "text": ...}
+    event, then that utterance's stream_order_from_text_async events (or an "error" event).
+    """
+    if PREPROCESS_AUDIO:
+        processed = await run_blocking(_load_audio_preprocessing(), wav_bytes)
+        print(f"Audio preprocessed: {processed.original_bytes:,} -> {processed.processed_bytes:,} bytes "
+              f"({processed.original_seconds:.1f}s -> {processed.seconds:.1f}s).")
+        wav_bytes = processed.data
+    utterances = await run_blocking(split_wav_utterances, wav_bytes)
+    print(f"Voice order split into {len(utterances)} utterance(s).")
+    async for event in stream_utterance_pipeline(
+        utterances,
+        backend or get_transcription_backend(),
+        stream_order_from_text_async,
+        max_concurrency=MAX_CONCURRENT_TRANSCRIPTIONS,
+    ):
+        yield event
+
+# Confirmations are rendered locally from a template. Set to True to have the
+# Confirmer LLM polish the wording instead; its answers are memoized per order.
+USE_LLM_CONFIRMATION = False
+confirmation_cache = ResponseCache(db_path=None, max_entries=256) # Memory-only; keyed by canonical order JSON
+
 async def get_confirmation_message_async(order_list: list) -> dict:
-    """Generates a confirmation message using Semantic Kernel and Confirmer prompt.
+    """Generates a confirmation message for the current order.
+
+    Rendered locally unless USE_LLM_CONFIRMATION is set, in which case the
+    Confirmer prompt is used (memoized by the canonical order JSON) and the
+    local rendering is the fallback.
 
     Args:
         order_list: The current order list (list of dictionaries).
@@ -230,116 +722,229 @@ async def get_confirmation_message_async(order_list: list) -> dict:
     Returns:
         A dictionary containing the confirmation message or an error.
     """
+    local_message = render_confirmation(order_list)
+    if not USE_LLM_CONFIRMATION:
+        return {"confirmation": local_message, "raw_response": local_message}
+
+    confirmer_func = get_prompt_function("Confirmer")
+
     if not confirmer_func:
-         return {"error": "Confirmer function not loaded properly."}
+        print("Warning: Confirmer function not loaded properly; using local confirmation.")
+        return {"confirmation": local_message, "raw_response": local_message}
     try:
-        order_json = json.dumps(order_list)
+        order_json = canonical_order_json(order_list)
+        cached = confirmation_cache.get(order_json)
+        if cached is not None:
+            return {"confirmation": cached, "raw_response": cached}
+
         # Invoke the confirmer function loaded from YAML
-        # Use the alias for KernelArguments
-        result = await kernel.invoke(confirmer_func, sk_functions.KernelArguments(order_json=order_json))
+        result = await get_kernel().invoke(confirmer_func, kernel_arguments(order_json=order_json))
         confirmation_message = str(result).strip()
 
         # Basic check if the message seems empty or too short
         if not confirmation_message or len(confirmation_message) < 10:
             print(f"Warning: Confirmation message seems short/empty: {confirmation_message}")
-            # Provide a fallback message
-            fallback_message = "Okay, just confirming your order. Does everything look right?"
-            return {"confirmation": fallback_message, "raw_response": confirmation_message}
+            # Fall back to the local rendering
+            return {"confirmation": local_message, "raw_response": confirmation_message}
 
+        confirmation_cache.put(order_json, confirmation_message)
         return {"confirmation": confirmation_message, "raw_response": confirmation_message}
 
     except Exception as e:
-        print(f"Error interacting with Semantic Kernel for confirmation: {e}")
-        return {"error": str(e)}
+        print(f"Error interacting with Semantic Kernel for confirmation, using local confirmation: {e}")
+        return {"confirmation": local_message, "raw_response": local_message}
 
-# Synchronous wrapper for Streamlit compatibility (Streamlit doesn't directly support async)
-# This uses asyncio.run which might not be ideal in a long-running server,
-# but is often sufficient for Streamlit apps. Consider alternatives if needed.
-import asyncio
+# Synchronous wrappers for Streamlit compatibility (Streamlit doesn't directly support async).
+# They submit to the long-lived background loop rather than calling asyncio.run(),
+# which would build and tear down a loop (and the HTTP connection pool) per call.
 
 def get_order_from_text(text_input: str) -> dict:
-    return asyncio.run(get_order_from_text_async(text_input))
+    return run_sync(get_order_from_text_async(text_input))
 
 def get_confirmation_message(order_list: list) -> dict:
-    return asyncio.run(get_confirmation_message_async(order_list))
+    return run_sync(get_confirmation_message_async(order_list))
+
+def iterate_sync(async_events: AsyncIterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Synchronous generator over an async event stream.
+
+    The stream runs on the background loop; events are handed over through a
+    queue so the caller can update the UI as each one arrives.
+    """
+    events: "queue.Queue" = queue.Queue()
+    finished = object()
+
+    async def pump():
+        try:
+            async for event in async_events:
+                events.put(event)
+        finally:
+            events.put(finished)
+
+    background_loop.submit(pump())
+    while True:
+        event = events.get()
+        if event is finished:
+            return
+        yield event
+
+def stream_order_from_text(text_input: str) -> Iterator[Dict[str, Any]]:
+    return iterate_sync(stream_order_from_text_async(text_input))
+
+def stream_voice_order(wav_bytes: bytes, backend: Optional[TranscriptionBackend] = None) -> Iterator[Dict[str, Any]]:
+    return iterate_sync(stream_voice_order_async(wav_bytes, backend))
 
 # --- Admin Manager AI Logic ---
+# Simple stock queries and reorders ("how many fries do we have", "order 20
+# fries") are parsed locally (see fast_parser.parse_admin_command_fast); only
+# the rest goes to the AdminManager LLM.
+USE_FAST_ADMIN_PARSER = True
+
+def try_admin_fast_path(text_input: str) -> Optional[Dict[str, Any]]:
+    """Parses the command with the local admin grammar, or returns None to use the LLM."""
+    if not USE_FAST_ADMIN_PARSER:
+        return None
+    try:
+        fast_result = parse_admin_command_fast(text_input, get_menu_snapshot())
+    except Exception as e:
+        print(f"Admin fast-path parser failed, falling back to LLM: {e}")
+        return None
+    if fast_result is not None:
+        print(f"Admin fast-path parse: {fast_result}") # Debugging
+    return fast_result
+
+def _admin_order_quantity(action: dict, raw_response: Optional[str]) -> Optional[int]:
+    """Validates an 'order' action's item and quantity; marks the action as an error and returns None if invalid."""
+    item_name = action.get("item_name")
+    quantity_str = action.get("quantity_ordered")
+
+    if not item_name or quantity_str is None:
+        action["action"] = "error"
+        action["message"] = "Error: LLM requested an order but did not specify item name or quantity."
+        action["error_details"] = "Missing item_name or quantity_ordered in LLM response."
+        print(f"Admin Action Error: Missing item/quantity for order. LLM Response: {raw_response}")
+        return None
+
+    try:
+        quantity_ordered = int(quantity_str)
+        if quantity_ordered <= 0:
+             raise ValueError("Quantity must be positive.")
+        return quantity_ordered
+    except (ValueError, TypeError) as e:
+         action["action"] = "error"
+         action["message"] = f"Error: Invalid quantity '{quantity_str}' specified by LLM for ordering {item_name}."
+         action["error_details"] = f"Invalid quantity format: {e}"
+         print(f"Admin Action Error: Invalid quantity '{quantity_str}' for order. LLM Response: {raw_response}")
+         return None
+
+async def apply_admin_actions(response_data: dict) -> dict:
+    """Performs the database updates for the 'order' actions and records the outcome of each.
+
+    response_data is either a single action or carries a list of them under
+    "actions" (a batch such as "add 50 fries, 30 buns, 20 shakes"). All valid
+    orders are applied in one db_utils transaction; one failing item doesn't
+    stop the others. A single action keeps its fields at the top level as
+    before; a batch becomes {"action": "batch", "actions": [...], "message"}
+    with one result line per item.
+    """
+    raw_response = response_data.get("raw_response")
+    actions = response_data.get("actions")
+    is_batch = isinstance(actions, list)
+    if not is_batch:
+        actions = [response_data]
+    actions = [action for action in actions if isinstance(action, dict)]
+
+    orders = [] # (action, quantity) for every valid order
+    for action in actions:
+        action["update_triggered"] = False # Initialize flag
+        if action.get("action") == "order":
+            quantity_ordered = _admin_order_quantity(action, raw_response)
+            if quantity_ordered is not None:
+                orders.append((action, quantity_ordered))
+
+    if orders:
+        # Call the DB update function once for all items (positive values for ordering more)
+        changes = [(action["item_name"], quantity) for action, quantity in orders]
+        print(f"Attempting to update DB for {', '.join(f'{item_name} +{quantity}' for item_name, quantity in changes)}")
+        new_quantities = await run_blocking(update_item_quantities, changes)
+        for (action, _), new_quantity in zip(orders, new_quantities):
+            if new_quantity is not None:
+                action["update_triggered"] = True
+                action["new_quantity"] = new_quantity
+            else:
+                # Update failed (db_utils should print details)
+                action["action"] = "error"
+                action["message"] = f"Failed to update inventory for {action['item_name']}. Check logs for details."
+                action["error_details"] = "update_item_quantities returned None for this item."
+
+    if not is_batch:
+        return response_data
+    if len(actions) == 1:
+        # A one-item list reads like a single command
+        single = actions[0]
+        if single.get("action") != "error" and response_data.get("message"):
+            single["message"] = response_data["message"]
+        single["raw_response"] = raw_response
+        return single
+    response_data["action"] = "batch"
+    response_data["actions"] = actions
+    response_data["update_triggered"] = any(action["update_triggered"] for action in actions)
+    summary = response_data.get("message") or f"Processed {len(actions)} commands."
+    response_data["message"] = "\n".join([summary] + [_admin_result_line(action) for action in actions])
+    return response_data
+
+def _admin_result_line(action: dict) -> str:
+    """One line of a batch's per-item results."""
+    if action.get("action") == "order" and action.get("update_triggered"):
+        return f"- {action['item_name']}: +{int(action['quantity_ordered'])}, now {action['new_quantity']} in stock."
+    if action.get("action") == "error":
+        return f"- {action.get('item_name') or 'Error'}: {action.get('message', '')}"
+    return f"- {action.get('message', '')}"
+
 async def process_admin_command_async(text_input: str) -> dict:
     """Processes the admin's text command using Semantic Kernel and AdminManager prompt.
 
+    Common stock queries and reorders are answered by the local admin grammar
+    without a network call.
+
     Args:
         text_input: The raw text command from the admin.
 
     Returns:
         A dictionary containing the AI's response, action taken, and whether a DB update occurred.
     """
+    fast_result = await run_blocking(try_admin_fast_path, text_input)
+    if fast_result is not None:
+        return await apply_admin_actions(fast_result)
+
+    admin_manager_func = get_prompt_function("AdminManager")
     if not admin_manager_func:
         return {"action": "error", "message": "Admin Manager function not loaded properly.", "error_details": "Prompt file missing or invalid."}
 
     try:
         # Format the current inventory from DB
-        formatted_inventory = format_inventory_for_prompt()
+        formatted_inventory = await run_blocking(format_inventory_for_prompt)
 
         # Prepare arguments
-        arguments = sk_functions.KernelArguments(input=text_input, inventory_list=formatted_inventory)
+        arguments = kernel_arguments(input=text_input, inventory_list=formatted_inventory)
 
-        # Invoke the Admin Manager function
-        result = await kernel.invoke(
+        # Invoke the Admin Manager function (cached per input and inventory levels)
+        result_str, _ = await invoke_with_cache(
             admin_manager_func,
-            arguments=arguments
+            "AdminManager",
+            text_input,
+            formatted_inventory,
+            arguments
         )
 
-        result_str = str(result)
         print(f"Admin Manager SK Response: {result_str}") # Debugging
 
         # Parse the JSON string result
         try:
             response_data = json.loads(result_str)
             response_data["raw_response"] = result_str # Include raw for debugging
-            response_data["update_triggered"] = False # Initialize flag
 
-            # --- Perform Database Update if Action is 'order' ---
-            if response_data.get("action") == "order":
-                item_name = response_data.get("item_name")
-                quantity_str = response_data.get("quantity_ordered")
-
-                if not item_name or quantity_str is None:
-                    response_data["action"] = "error"
-                    response_data["message"] = "Error: LLM requested an order but did not specify item name or quantity."
-                    response_data["error_details"] = "Missing item_name or quantity_ordered in LLM response."
-                    print(f"Admin Action Error: Missing item/quantity for order. LLM Response: {result_str}")
-                    return response_data # Return early
-
-                try:
-                    quantity_ordered = int(quantity_str)
-                    if quantity_ordered <= 0:
-                         raise ValueError("Quantity must be positive.")
-
-                    # Call the DB update function (use positive value for ordering more)
-                    print(f"Attempting to update DB for {item_name} by +{quantity_ordered}")
-                    success = update_item_quantity(item_name, quantity_ordered)
-
-                    if success:
-                        response_data["update_triggered"] = True
-                        # Optionally refine the message based on success, or let the LLM's original message stand
-                        # response_data["message"] = f"Successfully ordered {quantity_ordered} of {item_name}. Inventory updated."
-                        print(f"DB Update successful for {item_name}")
-                    else:
-                        # Update failed (db_utils should print details)
-                        response_data["action"] = "error"
-                        response_data["message"] = f"Failed to update inventory for {item_name}. Check logs for details."
-                        response_data["error_details"] = "update_item_quantity returned False."
-                        print(f"DB Update failed for {item_name}")
-
-                except (ValueError, TypeError) as e:
-                     response_data["action"] = "error"
-                     response_data["message"] = f"Error: Invalid quantity '{quantity_str}' specified by LLM for ordering {item_name}."
-                     response_data["error_details"] = f"Invalid quantity format: {e}"
-                     print(f"Admin Action Error: Invalid quantity '{quantity_str}' for order. LLM Response: {result_str}")
-
-            # --- End Database Update Logic ---
-
-            return response_data
+            # --- Perform Database Updates for the 'order' actions ---
+            return await apply_admin_actions(response_data)
 
         except json.JSONDecodeError as json_e:
             print(f"Admin Manager JSON Decode Error: {json_e}. Raw: {result_str}")
@@ -355,57 +960,89 @@ async def process_admin_command_async(text_input: str) -> dict:
 
 # Synchronous wrapper for Streamlit
 def process_admin_command(text_input: str) -> dict:
-    return asyncio.run(process_admin_command_async(text_input))
+    return run_sync(process_admin_command_async(text_input))
+
+# --- AI Chef ---
+# The manager's question goes out with a compact, token-budgeted summary of the
+# menu, stock and sales (see chef_context.py), cached until the data changes.
+# The context comes first and the question last, so the long stable prefix is
+# the same across questions. The reply is streamed token by token.
+CHEF_MODEL_ID = os.getenv("CHEF_MODEL_ID", "gpt-3.5-turbo")
+CHEF_SYSTEM_MESSAGE = (
+    "You are an AI Chef assistant for a drive-thru restaurant. "
+    "Your goal is to help the manager refine the menu based on creative ideas, potential ingredient availability (represented by stock in the data), sales trends, and user requests. "
+    "Be creative but practical for a drive-thru setting. Provide concise and actionable suggestions or answers."
+)
+
+async def stream_chef_reply_async(request: str) -> AsyncIterator[str]:
+    """Streams the AI Chef's reply to the manager's request as text chunks.
+
+    Errors are yielded as an apology in the reply rather than raised, so a
+    caller that is already displaying the stream can simply finish it.
+    """
+    try:
+        context = await run_blocking(get_chef_context)
+        stream = await get_openai_client().chat.completions.create(
+            model=CHEF_MODEL_ID,
+            messages=[
+                {"role": "system", "content": f"{CHEF_SYSTEM_MESSAGE}\n\nCurrent restaurant data:\n{context.text}"},
+                {"role": "user", "content": request},
+            ],
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        print(f"Error communicating with AI Chef: {e}")
+        yield f"Sorry, an error occurred while contacting the AI Chef: {e}"
+
+def stream_chef_reply(request: str) -> Iterator[str]:
+    return iterate_sync(stream_chef_reply_async(request))
 
 # --- Autonomous Inventory Management Logic ---
 
-# Define thresholds and reorder amounts (could be moved to config later)
+# Reorder point and amount for items without enough sales history to forecast;
+# the others get their own from demand_forecast.compute_reorder_rules().
 LOW_STOCK_THRESHOLD = 10
 REORDER_QUANTITY = 50
 
+# The check runs in the background every INVENTORY_CHECK_INTERVAL_SECONDS (plus
+# up to INVENTORY_CHECK_JITTER_SECONDS) once start_inventory_scheduler() has
+# been called; see scheduler.py for how overlapping runs are avoided. service.py
+# always runs it; the Streamlit app only with RUN_INVENTORY_SCHEDULER=1, since
+# every Streamlit process would otherwise start one. Either way a lock file
+# next to the database keeps it to one process per database.
+RUN_INVENTORY_SCHEDULER = os.getenv("RUN_INVENTORY_SCHEDULER", "0") == "1"
+INVENTORY_CHECK_INTERVAL_SECONDS = float(os.getenv("INVENTORY_CHECK_INTERVAL_SECONDS", "300"))
+INVENTORY_CHECK_JITTER_SECONDS = float(os.getenv("INVENTORY_CHECK_JITTER_SECONDS", "30"))
+INVENTORY_CHECK_TIMEOUT_SECONDS = 60
+
 async def run_autonomous_inventory_check_async() -> List[Dict[str, Any]]:
     """Checks inventory levels and automatically reorders items below threshold.
 
+    Reorder points and quantities are forecast per item from recorded sales
+    (see demand_forecast.py); items with too little history use
+    LOW_STOCK_THRESHOLD and REORDER_QUANTITY. The threshold check, the restock
+    and reading back the new quantities are one UPDATE ... RETURNING statement
+    in one transaction (see reorder_low_stock).
+
     Returns:
         A list of dictionaries, where each dictionary represents an item
         that was automatically reordered.
         Example: [{"item_name": "Fries", "ordered_quantity": 50, "new_quantity": 58}]
     """
+    from src.ai_drive_thru.demand_forecast import compute_reorder_rules # Imports NumPy; loaded on first use
+
     print("Running autonomous inventory check...")
-    items_reordered = []
     try:
-        inventory = get_menu_items() # Fetch current state
-        if not inventory:
-            print("Autonomous check: No inventory found.")
-            return []
-
-        for item in inventory:
-            item_name = item['name']
-            current_quantity = item['quantity']
-
-            if current_quantity < LOW_STOCK_THRESHOLD:
-                print(f"Autonomous check: Item '{item_name}' is low (Qty: {current_quantity}). Threshold: {LOW_STOCK_THRESHOLD}. Ordering {REORDER_QUANTITY}.")
-                # Call update_item_quantity to ADD the reorder amount
-                success = update_item_quantity(item_name, REORDER_QUANTITY)
-
-                if success:
-                    # Fetch the new quantity after the update for reporting
-                    new_quantity = get_item_quantity(item_name)
-                    items_reordered.append({
-                        "item_name": item_name,
-                        "ordered_quantity": REORDER_QUANTITY,
-                        "new_quantity": new_quantity if new_quantity is not None else (current_quantity + REORDER_QUANTITY) # Estimate if fetch fails
-                    })
-                    print(f"Autonomous check: Successfully reordered {REORDER_QUANTITY} of '{item_name}'. New quantity: {new_quantity}")
-                else:
-                    # Log the failure, but don't stop checking other items
-                    print(f"Autonomous check: FAILED to reorder '{item_name}'. Check db_utils logs.")
-            # else: # Optional: Log items that are okay
-                # print(f"Autonomous check: Item '{item_name}' stock is OK (Qty: {current_quantity}).")
-
+        rules = await run_blocking(compute_reorder_rules)
     except Exception as e:
-        print(f"Autonomous check: An error occurred during the check: {e}")
-        # Depending on requirements, you might want to return an error indicator
+        print(f"Demand forecast failed, using the default reorder rule for every item: {e!r}")
+        rules = {}
+    items_reordered = await run_blocking(reorder_low_stock, LOW_STOCK_THRESHOLD, REORDER_QUANTITY, rules)
+    for item in items_reordered:
+        print(f"Autonomous check: Reordered {item['ordered_quantity']} of '{item['item_name']}'. New quantity: {item['new_quantity']}")
 
     if items_reordered:
         print(f"Autonomous check completed. Reordered {len(items_reordered)} items.")
@@ -414,9 +1051,35 @@ async def run_autonomous_inventory_check_async() -> List[Dict[str, Any]]:
 
     return items_reordered
 
-# Synchronous wrapper for Streamlit
+inventory_check_task = PeriodicTask(
+    "inventory-check",
+    run_autonomous_inventory_check_async,
+    interval_seconds=INVENTORY_CHECK_INTERVAL_SECONDS,
+    jitter_seconds=INVENTORY_CHECK_JITTER_SECONDS,
+    timeout_seconds=INVENTORY_CHECK_TIMEOUT_SECONDS,
+)
+_inventory_scheduler: Optional[concurrent.futures.Future] = None
+
+def inventory_scheduler_lock() -> ProcessLock:
+    """The lock that elects the one process per database running the scheduled check."""
+    return ProcessLock(os.path.abspath(db_utils.DB_FILE) + ".scheduler.lock")
+
+def start_inventory_scheduler() -> concurrent.futures.Future:
+    """Starts the periodic inventory check on the background loop, once per process.
+
+    It only runs while this process holds inventory_scheduler_lock(), so
+    several processes sharing the database restock once between them.
+    """
+    global _inventory_scheduler
+    with _init_lock:
+        if _inventory_scheduler is None or _inventory_scheduler.done():
+            _inventory_scheduler = background_loop.submit(inventory_check_task.run_forever(inventory_scheduler_lock()))
+    return _inventory_scheduler
+
+# Synchronous wrapper for Streamlit. Goes through the scheduled task so a manual
+# check never overlaps a scheduled one; returns [] if one was already running.
 def run_autonomous_inventory_check() -> List[Dict[str, Any]]:
-    return asyncio.run(run_autonomous_inventory_check_async())
+    return run_sync(inventory_check_task.run_once()) or []
 
 # Define asynchronous test functions
 async def run_tests_async():
@@ -453,12 +1116,12 @@ async def run_tests_async():
         {"item": "Fries", "quantity": 1}, # Assuming 'Fries' maps correctly
         {"item": "Soda", "quantity": 1, "details": "Coke"} # Assuming details handled okay
     ]
-    # Confirmer doesn't need async wrapper if get_confirmation_message is used
-    confirmation_result = get_confirmation_message(test_order_for_confirm)
+    # Already running on the background loop, so await the async version directly
+    confirmation_result = await get_confirmation_message_async(test_order_for_confirm)
     print(f"Confirmation Result: {confirmation_result}")
 
 
 # Example usage (for testing):
 if __name__ == '__main__':
     # Need to run the async test function
-    asyncio.run(run_tests_async()) 
\ No newline at end of file
+    run_sync(run_tests_async()) 
\ No newline at end of file
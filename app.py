@@ -1,73 +1,179 @@
 import streamlit as st
 # We will replace this import later with the kernel service
-from ai_logic import get_order_from_text, get_confirmation_message, process_admin_command, run_autonomous_inventory_check
-import json # Add json for parsing AI responses
-from src.ai_drive_thru.db_utils import get_menu_items, get_item_details, update_item_quantity
+from ai_logic import stream_order_from_text, stream_voice_order, get_confirmation_message, process_admin_command, stream_chef_reply, start_background_warm_up, start_inventory_scheduler, RUN_INVENTORY_SCHEDULER
+from src.ai_drive_thru.db_utils import reserve_order, commit_order, release_order
+from src.ai_drive_thru.menu_cache import get_menu_snapshot
+from src.ai_drive_thru.pricing import price_order, format_cents
+from src.ai_drive_thru.order_state import Order, apply_order_action as apply_action_to_order
+from src.ai_drive_thru.session_store import ChatHistory, archive_path_for
 from streamlit_mic_recorder import mic_recorder # Import the recorder
-import io # For handling audio bytes
-from openai import OpenAI # Import OpenAI
-import os # For environment variables
-
-# --- Initialize OpenAI Client ---
-# Ensure API key is set as an environment variable OPENAI_API_KEY
-try:
-    client = OpenAI()
-    # Test connection (optional, but good practice)
-    client.models.list()
-except Exception as e:
-    st.error(f"Failed to initialize OpenAI client. Ensure OPENAI_API_KEY is set. Error: {e}")
-    client = None # Set client to None to prevent further errors
-
-# --- Helper Function to Add Items ---
-def add_item_to_order(item_key, details=None):
-    """Adds or increments an item in the session state order list."""
-    if 'current_order_list' not in st.session_state:
-        st.session_state.current_order_list = []
-
-    found = False
-    for item in st.session_state.current_order_list:
-        # Check if item_key and details match (if details exist)
-        if item['item'] == item_key and item.get('details') == details:
-            item['quantity'] += 1
-            found = True
-            break
-
-    if not found:
-        new_item = {"item": item_key, "quantity": 1}
-        if details:
-            new_item["details"] = details
-        st.session_state.current_order_list.append(new_item)
-
-# --- Helper Function to Remove Items ---
+import uuid
+
+# Build the kernel, parse prompts and open an API connection off the render path
+start_background_warm_up()
+# Restock low items periodically in the background, if enabled for the app
+# (RUN_INVENTORY_SCHEDULER=1; service.py runs it otherwise)
+if RUN_INVENTORY_SCHEDULER:
+    start_inventory_scheduler()
+
+# --- Helper Functions to Change the Order ---
+# The order lives in st.session_state as an Order (see order_state.py), indexed
+# by (item, details), so each change is a lookup rather than a scan.
+def add_item_to_order(item_key, details=None, quantity=1):
+    """Adds an item to the session's order, or increases its quantity."""
+    st.session_state.current_order.add(item_key, details, quantity)
+
 def remove_item_from_order(item_key, quantity=1, details=None):
-    """Removes or decrements an item in the session state order list.
+    """Removes or decrements an item in the session's order.
+
+    Returns True if the item was found and quantity adjusted/removed, False otherwise.
+    """
+    return st.session_state.current_order.remove(item_key, quantity, details)
+
+def apply_order_action(action_data):
+    """Applies one add/remove action from the OrderTaker to the session's order.
+
+    Returns an (outcome, description) tuple; see order_state.apply_order_action.
+    """
+    return apply_action_to_order(st.session_state.current_order, action_data)
+
+# --- Helper Function to Show the Order While the AI Is Still Responding ---
+def render_order_preview(placeholder):
+    """Draws the current order list into a sidebar placeholder."""
+    with placeholder.container():
+        st.caption("Updating your order...")
+        for line in st.session_state.current_order:
+            detail_str = f" ({line.details})" if line.details else ''
+            st.write(f"{line.quantity}x {line.item}{detail_str}")
+
+# --- Helper Functions to Show an Order Exchange in the Chat ---
+def show_user_message(prompt, avatar, chat_container):
+    """Displays the customer's words in the chat and records them in history."""
+    with chat_container:
+         with st.chat_message("user", avatar=avatar):
+             st.markdown(prompt)
+    st.session_state.messages.append({"role": "user", "content": prompt})
+
+def show_order_response(ai_response, applied_actions, chat_container):
+    """Builds and displays the assistant's reply to one OrderTaker response.
 
     Args:
-        item_key: The key of the item to remove (e.g., 'Burger').
-        quantity: The number of items to remove (defaults to 1).
-        details: Specific details of the item to remove (e.g., 'Coke' for 'Soda').
+        ai_response: The final result of an ai_logic order stream.
+        applied_actions: (outcome, description) for each streamed action, already applied to the order.
+        chat_container: The container the chat is displayed in.
+
+    Returns:
+        True if the order changed and the sidebar needs to be redrawn.
     """
-    if 'current_order_list' not in st.session_state or not st.session_state.current_order_list:
-        return # Nothing to remove
-
-    items_to_remove_indices = []
-    found_item = None
-    for i, item in enumerate(st.session_state.current_order_list):
-        if item['item'] == item_key and item.get('details') == details:
-            found_item = item
-            # Decrease quantity
-            item['quantity'] -= quantity
-            # If quantity drops to 0 or below, mark for removal
-            if item['quantity'] <= 0:
-                items_to_remove_indices.append(i)
-            break # Assume only one matching entry per item/detail combo
-
-    # Remove items marked for removal (iterate in reverse to avoid index issues)
-    for index in sorted(items_to_remove_indices, reverse=True):
-        del st.session_state.current_order_list[index]
-
-    # Return True if the item was found and quantity adjusted/removed, False otherwise
-    return found_item is not None
+    # --- Process AI Response ---
+    # Initialize variables
+    ai_message_content = "" # Main response message
+    stock_message_content = "" # Separate message for stock issues
+    update_ui = False # Flag to indicate if we need to update UI state (e.g., sidebar)
+    show_error_in_chat = False
+
+    # 1. Check for explicit errors from ai_logic
+    if "error" in ai_response:
+        error_detail = ai_response.get('error', 'Unknown error from AI logic.')
+        # Include raw response if available for debugging
+        raw_resp_info = ai_response.get("raw_response", "")
+        if raw_resp_info:
+             error_detail += f"\nRaw AI Response:\n```\n{raw_resp_info}\n```"
+
+        ai_message_content = f"An error occurred: {error_detail}"
+        show_error_in_chat = True # Will display using st.error later
+
+    else:
+        # 2. Check for unavailable items (even if other parts succeeded)
+        unavailable_items = ai_response.get("unavailable_items")
+        if unavailable_items:
+            stock_messages = []
+            for item_info in unavailable_items:
+                item_name = item_info.get("item", "Unknown item")
+                reason = item_info.get("reason", "unavailable")
+                stock_messages.append(f"{item_name} ({reason})")
+            if stock_messages:
+                stock_message_content = f"Sorry, there were issues with some items: {'; '.join(stock_messages)}."
+
+        # 3. Process the main status and actions
+        status = ai_response.get("status", "unknown") # Default to 'unknown' if status missing
+
+        if status == "success":
+            if applied_actions:
+                # The actions were applied to the order while streaming
+                items_added = [desc for outcome, desc in applied_actions if outcome == "added"]
+                items_removed = [desc for outcome, desc in applied_actions if outcome == "removed"]
+                items_not_found_for_removal = [desc for outcome, desc in applied_actions if outcome == "not_found"]
+                update_ui = bool(items_added or items_removed)
+
+                # Construct confirmation message based on performed actions
+                message_parts = []
+                if items_added:
+                    message_parts.append(f"Added {', '.join(items_added)}")
+                if items_removed:
+                    message_parts.append(f"Removed {', '.join(items_removed)}")
+
+                ai_generated_message = ai_response.get("message")
+                if ai_generated_message and (items_added or items_removed):
+                    ai_message_content = ai_generated_message
+                elif message_parts:
+                    ai_message_content = f"Okay, I've {', '.join(message_parts)}."
+                else:
+                    if items_not_found_for_removal:
+                         ai_message_content = f"I tried to remove {', '.join(items_not_found_for_removal)}, but I couldn't find those items in your order."
+                    else:
+                         # Success status but no actions? Maybe just acknowledgment. Use AI message if present.
+                         ai_message_content = ai_response.get("message", "Okay.") # Fallback if no message/actions
+
+            else:
+                 # Status is success, but actions list is empty
+                 # This might happen if the user asks "Do you have Fries?" and they are in stock.
+                 ai_message_content = ai_response.get("message", "Okay, understood.") # Use AI message or a default
+
+        elif status == "clarification":
+            ai_message_content = ai_response.get("message", "Could you please provide more details?") # Use AI message or fallback
+            # Optionally add clarification details if structured differently
+            # e.g., list options if "clarification_options" key exists
+
+        elif status == "not_an_order":
+            ai_message_content = ai_response.get("message", "How can I help you with your order?") # Use AI message or fallback
+
+        # ADDED: Explicit handling for item_unavailable status
+        elif status == "item_unavailable":
+            ai_message_content = ai_response.get("message", "Sorry, the requested item is unavailable.") # Use AI message or fallback
+            # Note: The stock_message_content check before this might have already caught specifics
+            # if our db_utils check found it first, but this handles cases where the LLM returns the status directly.
+
+        elif status == "unknown":
+             ai_message_content = "Sorry, I didn't quite understand that. Can you please rephrase?"
+             # Log the raw response if status is unknown for debugging
+             print(f"Unknown status from ai_logic. Raw response: {ai_response.get('raw_response')}")
+
+        else: # Handle any other unexpected statuses
+             ai_message_content = f"Sorry, I encountered an unexpected situation (status: {status})."
+             print(f"Unexpected status '{status}' from ai_logic. Raw response: {ai_response.get('raw_response')}")
+
+
+    # --- Display Assistant Messages (Stock + Main Response) ---
+    with chat_container:
+        # Display stock message first if there is one
+        if stock_message_content:
+            with st.chat_message("assistant", avatar="ℹ️"): # Info icon for stock notice
+                st.warning(stock_message_content) # Use warning styling for visibility
+            st.session_state.messages.append({"role": "assistant", "content": stock_message_content})
+
+        # Display the main AI response or error message
+        if show_error_in_chat:
+            with st.chat_message("assistant", avatar="🚨"): # Use an error avatar
+                st.error(ai_message_content) # Display the detailed error message
+            # Add simplified error to history
+            st.session_state.messages.append({"role": "assistant", "content": f"An error occurred: {ai_response.get('error', 'Unknown error')}"})
+        elif ai_message_content: # Only display if there's content (and not already handled by error)
+             with st.chat_message("assistant"):
+                 st.markdown(ai_message_content)
+             st.session_state.messages.append({"role": "assistant", "content": ai_message_content})
+
+    return update_ui
 
 # --- Streamlit App Layout ---
 st.set_page_config(layout="wide") # Use wider layout
@@ -83,21 +189,32 @@ view_mode = st.sidebar.radio(
     key="view_mode_selector"
 )
 st.sidebar.divider() # Add a visual separator
+# Filled while an order response is still streaming in; the full summary is drawn below
+live_order_placeholder = st.sidebar.empty()
 
 # --- Initialize Session State ---
+# Chat histories keep only their most recent messages in memory (older ones go
+# to CHAT_ARCHIVE_DIR if set; see session_store.py).
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+def new_chat_history(kind, greeting):
+    return ChatHistory(archive_path=archive_path_for(st.session_state.session_id, kind),
+                       messages=[{"role": "assistant", "content": greeting}])
+
 if 'messages' not in st.session_state:
-    st.session_state.messages = [{"role": "assistant", "content": "Welcome! Check out the menu or tell me your order."}]
-# Use a list to store order items matching the Confirmer prompt structure
-if 'current_order_list' not in st.session_state:
-    st.session_state.current_order_list = []
+    st.session_state.messages = new_chat_history("kiosk", "Welcome! Check out the menu or tell me your order.")
+# The order, indexed by (item, details); to_list() gives the Confirmer prompt structure
+if 'current_order' not in st.session_state:
+    st.session_state.current_order = Order()
 
 # Initialize admin chat history if it doesn't exist
 if 'admin_messages' not in st.session_state:
-    st.session_state.admin_messages = [{"role": "assistant", "content": "Hi Manager! How can I help with the inventory today?"}]
+    st.session_state.admin_messages = new_chat_history("admin", "Hi Manager! How can I help with the inventory today?")
 
 # Initialize AI Chef chat history if it doesn't exist
 if 'ai_chef_messages' not in st.session_state:
-    st.session_state.ai_chef_messages = [{"role": "assistant", "content": "Ask me about menu ideas, item removals, or other menu optimizations!"}]
+    st.session_state.ai_chef_messages = new_chat_history("chef", "Ask me about menu ideas, item removals, or other menu optimizations!")
 
 # --- Display based on selected view ---
 if view_mode == "Order Kiosk":
@@ -117,7 +234,6 @@ if view_mode == "Order Kiosk":
 
         # --- Combine Text and Voice Input Handling ---
         text_input = st.chat_input("Type your order or ask a question...")
-        voice_input = None # Placeholder for transcribed voice input
 
         st.write("Or record your order:")
         # Add the recorder widget
@@ -131,270 +247,150 @@ if view_mode == "Order Kiosk":
         )
 
         # Check if audio has been recorded
-        if audio_info and client: # Only proceed if recorder returned data AND client is initialized
+        voice_events = None
+        if audio_info: # Only proceed if recorder returned data
             audio_bytes = audio_info['bytes']
             # Add a check for empty audio data
             if not audio_bytes:
                 st.warning("Received empty audio recording. Please try again.")
             else:
-                audio_bio = io.BytesIO(audio_bytes)
-                audio_bio.name = 'audio.wav' # Required for OpenAI API
-
                 # Display audio player for debugging/confirmation (optional)
                 # st.audio(audio_bytes, format='audio/wav') # Update format if uncommenting
+                voice_events = stream_voice_order(audio_bytes)
+
+        if voice_events is not None:
+            # The recording is split at pauses; each utterance is transcribed
+            # concurrently and answered as soon as it has been parsed, so the
+            # first part of the order shows up before the rest is transcribed.
+            update_ui = False
+            heard_anything = False
+            applied_actions = []
+            with st.spinner("Transcribing audio..."):
+                for event in voice_events:
+                    if event["type"] == "transcript":
+                        applied_actions = [] # (outcome, description) per streamed action
+                        show_user_message(event["text"], "🎤", chat_container) # Use a mic icon for voice
+                    elif event["type"] == "action":
+                        applied_actions.append(apply_order_action(event["action"]))
+                        render_order_preview(live_order_placeholder)
+                    elif event["type"] == "result":
+                        update_ui = show_order_response(event["result"], applied_actions, chat_container) or update_ui
+                    elif event["type"] == "error":
+                        st.error(f"Error processing audio: {event['error']}")
+                    heard_anything = True
+            if not heard_anything:
+                st.warning("I couldn't hear anything in that recording. Please try again.")
 
-                with st.spinner("Transcribing voice..."):
-                    try:
-                        transcript = client.audio.transcriptions.create(
-                            model="whisper-1",
-                            file=audio_bio
-                        )
-                        voice_input = transcript.text
-                        st.success(f"Heard: {voice_input}") # Show transcription
-                    except Exception as e:
-                        st.error(f"Error transcribing audio: {e}")
-                        voice_input = None # Ensure it's None if transcription failed
-
-
-        # Determine the prompt to process (prioritize voice if available)
-        prompt = voice_input if voice_input else text_input
-
-        # Proceed only if there is a valid prompt (from text or voice)
-        if prompt:
-            # Add user message to state and display (inside container)
-            # Use a mic icon if it came from voice
-            user_avatar = "🎤" if voice_input else "👤"
-            with chat_container:
-                 with st.chat_message("user", avatar=user_avatar):
-                     st.markdown(prompt)
-            st.session_state.messages.append({"role": "user", "content": prompt})
-
-            # Process the input with AI using the updated ai_logic
-            with st.spinner("Processing order..."):
-                # Call the refactored function from ai_logic.py
-                ai_response = get_order_from_text(prompt) # ai_response is now a dict
-
-            # --- Process AI Response ---
-            # Initialize variables
-            ai_message_content = "" # Main response message
-            stock_message_content = "" # Separate message for stock issues
-            update_ui = False # Flag to indicate if we need to update UI state (e.g., sidebar)
-            show_error_in_chat = False
-
-            # 1. Check for explicit errors from ai_logic
-            if "error" in ai_response:
-                error_detail = ai_response.get('error', 'Unknown error from AI logic.')
-                # Include raw response if available for debugging
-                raw_resp_info = ai_response.get("raw_response", "")
-                if raw_resp_info:
-                     error_detail += f"\nRaw AI Response:\n```\n{raw_resp_info}\n```"
-
-                ai_message_content = f"An error occurred: {error_detail}"
-                show_error_in_chat = True # Will display using st.error later
+            # Trigger UI update if order changed
+            if update_ui:
+                st.rerun()
 
-            else:
-                # 2. Check for unavailable items (even if other parts succeeded)
-                unavailable_items = ai_response.get("unavailable_items")
-                if unavailable_items:
-                    stock_messages = []
-                    for item_info in unavailable_items:
-                        item_name = item_info.get("item", "Unknown item")
-                        reason = item_info.get("reason", "unavailable")
-                        stock_messages.append(f"{item_name} ({reason})")
-                    if stock_messages:
-                        stock_message_content = f"Sorry, there were issues with some items: {'; '.join(stock_messages)}."
-
-                # 3. Process the main status and actions
-                status = ai_response.get("status", "unknown") # Default to 'unknown' if status missing
-
-                if status == "success":
-                    actions = ai_response.get("actions", [])
-                    if actions:
-                        items_added = []
-                        items_removed = []
-                        items_not_found_for_removal = []
-
-                        for action_data in actions:
-                            action_type = action_data.get('action')
-                            item_key = action_data.get('item')
-                            details = action_data.get('details')
-                            try:
-                                quantity = int(action_data.get('quantity', 1))
-                            except (ValueError, TypeError):
-                                quantity = 1
-
-                            if not item_key or quantity <= 0:
-                                continue # Skip invalid actions
-
-                            detail_str = f' ({details})' if details else ''
-                            # Use the actual quantity processed by add/remove functions if needed, but for msg, use requested
-                            item_desc = f"{quantity}x {item_key}{detail_str}"
-
-                            if action_type == 'add':
-                                # We rely on ai_logic already filtering out items that *cannot* be added at all due to stock.
-                                # The add_item_to_order here just updates the UI state.
-                                add_item_to_order(item_key, details)
-                                items_added.append(item_desc)
-                                update_ui = True
-                            elif action_type == 'remove':
-                                removed = remove_item_from_order(item_key, quantity, details)
-                                if removed:
-                                    items_removed.append(item_desc)
-                                    update_ui = True
-                                else:
-                                    items_not_found_for_removal.append(item_desc)
-
-                        # Construct confirmation message based on performed actions
-                        message_parts = []
-                        if items_added:
-                            message_parts.append(f"Added {', '.join(items_added)}")
-                        if items_removed:
-                            message_parts.append(f"Removed {', '.join(items_removed)}")
-
-                        ai_generated_message = ai_response.get("message")
-                        if ai_generated_message and (items_added or items_removed):
-                            ai_message_content = ai_generated_message
-                        elif message_parts:
-                            ai_message_content = f"Okay, I've {', '.join(message_parts)}."
-                        else:
-                            if items_not_found_for_removal:
-                                 ai_message_content = f"I tried to remove {', '.join(items_not_found_for_removal)}, but I couldn't find those items in your order."
-                            else:
-                                 # Success status but no actions? Maybe just acknowledgment. Use AI message if present.
-                                 ai_message_content = ai_response.get("message", "Okay.") # Fallback if no message/actions
+        # Proceed only if there is a valid typed prompt
+        elif text_input:
+            prompt = text_input
+            show_user_message(prompt, "👤", chat_container)
 
+            # Process the input with AI, applying each action to the order as soon
+            # as it is streamed in rather than after the whole response
+            ai_response = {"error": "No response from AI logic."}
+            applied_actions = [] # (outcome, description) per streamed action
+            with st.spinner("Processing order..."):
+                for event in stream_order_from_text(prompt):
+                    if event["type"] == "action":
+                        applied_actions.append(apply_order_action(event["action"]))
+                        render_order_preview(live_order_placeholder)
                     else:
-                         # Status is success, but actions list is empty
-                         # This might happen if the user asks "Do you have Fries?" and they are in stock.
-                         ai_message_content = ai_response.get("message", "Okay, understood.") # Use AI message or a default
-
-                elif status == "clarification":
-                    ai_message_content = ai_response.get("message", "Could you please provide more details?") # Use AI message or fallback
-                    # Optionally add clarification details if structured differently
-                    # e.g., list options if "clarification_options" key exists
-
-                elif status == "not_an_order":
-                    ai_message_content = ai_response.get("message", "How can I help you with your order?") # Use AI message or fallback
-
-                # ADDED: Explicit handling for item_unavailable status
-                elif status == "item_unavailable":
-                    ai_message_content = ai_response.get("message", "Sorry, the requested item is unavailable.") # Use AI message or fallback
-                    # Note: The stock_message_content check before this might have already caught specifics
-                    # if our db_utils check found it first, but this handles cases where the LLM returns the status directly.
-
-                elif status == "unknown":
-                     ai_message_content = "Sorry, I didn't quite understand that. Can you please rephrase?"
-                     # Log the raw response if status is unknown for debugging
-                     print(f"Unknown status from ai_logic. Raw response: {ai_response.get('raw_response')}")
-
-                else: # Handle any other unexpected statuses
-                     ai_message_content = f"Sorry, I encountered an unexpected situation (status: {status})."
-                     print(f"Unexpected status '{status}' from ai_logic. Raw response: {ai_response.get('raw_response')}")
-
-
-            # --- Display Assistant Messages (Stock + Main Response) ---
-            with chat_container:
-                # Display stock message first if there is one
-                if stock_message_content:
-                    with st.chat_message("assistant", avatar="ℹ️"): # Info icon for stock notice
-                        st.warning(stock_message_content) # Use warning styling for visibility
-                    st.session_state.messages.append({"role": "assistant", "content": stock_message_content})
-
-                # Display the main AI response or error message
-                if show_error_in_chat:
-                    with st.chat_message("assistant", avatar="🚨"): # Use an error avatar
-                        st.error(ai_message_content) # Display the detailed error message
-                    # Add simplified error to history
-                    st.session_state.messages.append({"role": "assistant", "content": f"An error occurred: {ai_response.get('error', 'Unknown error')}"})
-                elif ai_message_content: # Only display if there's content (and not already handled by error)
-                     with st.chat_message("assistant"):
-                         st.markdown(ai_message_content)
-                     st.session_state.messages.append({"role": "assistant", "content": ai_message_content})
-
+                        ai_response = event["result"] # ai_response is a dict
 
             # Trigger UI update if order changed
-            if update_ui:
+            if show_order_response(ai_response, applied_actions, chat_container):
                 st.rerun()
 
     with col2:
         st.header("Menu")
-        # Fetch menu items from the database
-        menu_items_from_db = get_menu_items()
+        # Menu rows come from the shared snapshot; the DB is only re-read after a change
+        menu_snapshot = get_menu_snapshot()
 
-        if not menu_items_from_db:
+        if not menu_snapshot.items:
             st.write("Menu is currently unavailable.")
         else:
             # Display items directly, without categories for now
-            for item in menu_items_from_db:
-                if item['quantity'] > 0: # Only show items in stock
-                    # Use item details from DB
-                    item_name = item['name']
-                    item_price = item['price']
-                    # Add description as tooltip if available
-                    item_description = item.get('description', '') # Get description or empty string
-
-                    # Create a unique key for the button
-                    button_key = f"add_{item_name}".replace(" ", "_").replace("(", "").replace(")", "")
-                    button_label = f"Add {item_name} (${item_price:.2f})"
-
-                    if st.button(button_label, key=button_key, use_container_width=True, help=item_description):
-                        # Add item using its name (assuming name is the unique identifier for adding)
-                        # If we later need variations (like Soda flavors), this might need adjustment
-                        # based on how variations are stored and selected.
-                        add_item_to_order(item_name) # Pass item name as the key
-                        st.rerun() # Rerun to update the sidebar immediately
+            for item in menu_snapshot.in_stock_items: # Only show items in stock
+                # Use item details from DB
+                item_name = item['name']
+                item_price = item['price']
+                # Add description as tooltip if available
+                item_description = item.get('description', '') # Get description or empty string
+
+                # Create a unique key for the button
+                button_key = f"add_{item_name}".replace(" ", "_").replace("(", "").replace(")", "")
+                button_label = f"Add {item_name} (${item_price:.2f})"
+
+                if st.button(button_label, key=button_key, use_container_width=True, help=item_description):
+                    # Add item using its name (assuming name is the unique identifier for adding)
+                    # If we later need variations (like Soda flavors), this might need adjustment
+                    # based on how variations are stored and selected.
+                    add_item_to_order(item_name) # Pass item name as the key
+                    st.rerun() # Rerun to update the sidebar immediately
 
 
     # --- Sidebar: Order Summary ---
     st.sidebar.header("Your Current Order")
-    if st.session_state.current_order_list:
-        total_price = 0
-        for i, item_in_order in enumerate(st.session_state.current_order_list):
+    if st.session_state.current_order:
+        order_list = st.session_state.current_order.to_list()
+        # Price the whole order in one pass from the cached price index (integer cents)
+        priced_order = price_order(order_list)
+        for item_in_order in priced_order["lines"]:
             item_name = item_in_order['item']
-            item_details_from_db = get_item_details(item_name) # Fetch details from DB
-
-            if item_details_from_db:
-                item_price = item_details_from_db['price']
-                # If we stored icons in DB, fetch here: item_icon = item_details_from_db.get("icon", " ") + " "
+            if item_in_order['found']:
+                # If we stored icons in DB, fetch here
                 item_icon = "🍔 " # Placeholder icon, replace if DB has icons
-
             else:
                 # Handle case where item in order list is somehow not in DB (shouldn't happen ideally)
-                item_price = 0
                 item_icon = "❓ "
                 print(f"Warning: Item '{item_name}' from order list not found in DB for price lookup.")
 
-
             item_quantity = item_in_order['quantity']
-            item_total = item_quantity * item_price
-            total_price += item_total
+            item_total = format_cents(item_in_order['line_total_cents'])
 
             # Display name logic remains similar, using item_name from order list
             display_name = f"{item_name}{' (' + item_in_order['details'] + ')' if 'details' in item_in_order else ''}"
-            st.sidebar.write(f"{item_icon}{item_quantity}x {display_name} (${item_total:.2f})")
+            st.sidebar.write(f"{item_icon}{item_quantity}x {display_name} ({item_total})")
 
         st.sidebar.markdown("---") # Add a separator
-        st.sidebar.subheader(f"Total: ${total_price:.2f}")
+        st.sidebar.subheader(f"Total: {format_cents(priced_order['total_cents'])}")
         st.sidebar.markdown("---") # Add a separator
 
         if st.sidebar.button("Confirm Order", use_container_width=True):
-            # 1. Get confirmation message from AI
+            # 1. Take the whole order out of stock atomically (all lines or none)
+            reservation = reserve_order(order_list)
+            if not reservation["success"]:
+                failed_descriptions = [f"{line.get('item') or 'Unknown item'} ({line.get('reason')})" for line in reservation["failed_lines"]]
+                stock_error = f"Sorry, we can't confirm this order: {'; '.join(failed_descriptions)}."
+                st.sidebar.error(stock_error)
+                st.session_state.messages.append({"role": "assistant", "content": stock_error})
+                st.rerun() # Rerun to show the message in chat history
+
+            # 2. Get confirmation message from AI
             with st.spinner("Generating confirmation..."):
-                confirmation_response = get_confirmation_message(st.session_state.current_order_list)
+                confirmation_response = get_confirmation_message(order_list)
 
-            # 2. Display confirmation message (or error) in the chat
+            # 3. Display confirmation message (or error) in the chat
             if "error" in confirmation_response:
+                # Give the stock back; the customer has not confirmed anything yet
+                release_order(reservation["reservation_id"])
                 error_msg = confirmation_response.get("error", "Could not generate confirmation.")
                 st.sidebar.error(f"Error confirming order: {error_msg}") # Show error in sidebar
                 # Optionally add to chat history too
                 st.session_state.messages.append({"role": "assistant", "content": f"Sorry, there was an error generating the confirmation: {error_msg}"})
                 st.rerun() # Rerun to show the message in chat history
             else:
+                commit_order(reservation["reservation_id"], priced_order["lines"]) # Also records it in the order history
                 confirmation_text = confirmation_response.get("confirmation", "Please review your order.")
                 # Add AI confirmation message to chat history
                 st.session_state.messages.append({"role": "assistant", "content": confirmation_text})
 
-                # 3. Placeholder for actual confirmation logic (e.g., asking user Y/N)
+                # Placeholder for actual confirmation logic (e.g., asking user Y/N)
                 # For now, we'll just display the confirmation message and proceed
                 # TODO: Add user interaction step (e.g., buttons Yes/No in chat or sidebar)
 
@@ -402,16 +398,14 @@ if view_mode == "Order Kiosk":
                 st.balloons()
                 st.sidebar.success("Order Confirmed! Proceed to payment.") # Keep simple success message for now
 
-                # 5. Optionally clear order and messages for next customer
-                # Clear order after confirmation
-                # st.session_state.current_order_list = []
-                # st.session_state.messages = [{"role": "assistant", "content": "Order placed! How can I help the next customer?"}]
-                # st.rerun()
+                # 5. Clear the order: its stock has been taken, so confirming it
+                # again would take the stock a second time.
+                st.session_state.current_order.clear()
                 # Rerun needed to display the confirmation message added to chat history
                 st.rerun()
 
         if st.sidebar.button("Clear Order", type="secondary", use_container_width=True):
-            st.session_state.current_order_list = []
+            st.session_state.current_order.clear()
             # Add message to chat history about clearing order
             st.session_state.messages.append({"role": "assistant", "content": "Okay, I've cleared your current order."})
             st.rerun()
@@ -426,7 +420,7 @@ elif view_mode == "Admin Panel":
     # --- Restore Stock Display Section ---
     st.subheader("Current Stock Levels")
     try:
-        inventory_items = get_menu_items() # Fetch items including quantities
+        inventory_items = get_menu_snapshot().items # Items including quantities
         if inventory_items:
             # Display as a dataframe for a quick overview
             st.dataframe(inventory_items, use_container_width=True)
@@ -457,11 +451,12 @@ elif view_mode == "Admin Panel":
 
         with st.spinner("Processing command..."):
             response_data = process_admin_command(admin_prompt)
-            response_text = response_data.get("response", "Could not process the command.")
+            response_text = response_data.get("message") or "Could not process the command."
 
-            # Check if inventory might have changed and trigger rerun
-            if response_data.get("inventory_updated"): # Assumes process_admin_command returns this flag
-                 st.toast("Inventory possibly updated by command.")
+            # Check if inventory changed and trigger rerun
+            if response_data.get("update_triggered"): # Set when any order reached the database
+                 updated = sum(1 for action in response_data.get("actions", [response_data]) if action.get("update_triggered"))
+                 st.toast(f"Inventory updated for {updated} item(s).")
                  # Add assistant response *before* rerunning
                  st.session_state.admin_messages.append({"role": "assistant", "content": response_text})
                  st.rerun() # Rerun to refresh stock display
@@ -481,8 +476,8 @@ elif view_mode == "AI Chef": # <-- New view block
     # Option to view current menu within the Chef section
     with st.expander("View/Hide Current Menu"):
         try:
-            # Fetch fresh menu data directly here, ensures it's current for this view
-            menu_items_for_chef = get_menu_items()
+            # The snapshot is rebuilt whenever the menu changes, so this is always current
+            menu_items_for_chef = get_menu_snapshot().items
             if menu_items_for_chef:
                 st.dataframe(menu_items_for_chef) # Display as a table/dataframe
             else:
@@ -507,57 +502,13 @@ elif view_mode == "AI Chef": # <-- New view block
                 st.markdown(chef_prompt)
 
         # --- LLM Interaction ---
-        with st.spinner("AI Chef is thinking..."):
-            ai_chef_response = "Sorry, I couldn't process that request right now." # Default error message
-            if not client:
-                ai_chef_response = "Error: OpenAI client not initialized. Please check API key."
-                st.error(ai_chef_response)
-            else:
-                try:
-                    # Fetch menu again inside the interaction if necessary, or rely on the one fetched above
-                    # Re-fetching ensures latest data if menu could change rapidly, but uses more resources.
-                    # Using menu_items_for_chef fetched earlier should be sufficient for most cases.
-                    if not menu_items_for_chef and 'menu_items_for_chef' in locals(): # Check if fetch failed earlier
-                         menu_string_for_prompt = "Menu data could not be loaded."
-                    elif menu_items_for_chef:
-                         menu_string_for_prompt = json.dumps(menu_items_for_chef, indent=2)
-                    else:
-                         menu_string_for_prompt = "The menu is currently empty or could not be loaded."
-
-                    # Define System and User messages
-                    system_message = (
-                        "You are an AI Chef assistant for a drive-thru restaurant. "
-                        "Your goal is to help the manager refine the menu based on creative ideas, potential ingredient availability (represented by quantity in the data), sales trends (if provided), and user requests. "
-                        "Be creative but practical for a drive-thru setting. Provide concise and actionable suggestions or answers."
-                    )
-                    user_message_content = (
-                        f"Current Menu Data:\n"
-                        f"```json\n{menu_string_for_prompt}\n```\n\n"
-                        f"Manager's request: \"{chef_prompt}\"\n\n"
-                        f"Based on the current menu and the manager's request, provide suggestions, answer questions, or propose new menu items. "
-                        f"Consider item quantities if the request involves availability. Think step-by-step."
-                    )
-
-                    messages_for_api = [
-                        {"role": "system", "content": system_message},
-                        {"role": "user", "content": user_message_content}
-                    ]
-
-                    # Call OpenAI API
-                    completion = client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=messages_for_api
-                    )
-                    ai_chef_response = completion.choices[0].message.content
-
-                except NameError: # Handle case where menu_items_for_chef wasn't defined due to initial load error
-                    st.error("Error: Menu data not available for AI Chef context.")
-                    ai_chef_response = "Sorry, I cannot process the request without menu data."
-                except Exception as e:
-                    st.error(f"Error communicating with AI Chef: {e}")
-                    ai_chef_response = f"Sorry, an error occurred while contacting the AI Chef: {e}"
-
-        # Display AI Chef's response and add to state
+        # The reply streams in as it is generated; the context sent with it is a
+        # compact, cached summary of menu, stock and sales (see chef_context.py).
+        with chef_chat_container:
+            with st.chat_message("assistant"):
+                ai_chef_response = st.write_stream(stream_chef_reply(chef_prompt))
+
+        # Keep the streamed reply in the chat history
         st.session_state.ai_chef_messages.append({"role": "assistant", "content": ai_chef_response})
         # Rerun to display the new messages in the container immediately
         st.rerun()
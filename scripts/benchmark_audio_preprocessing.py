@@ -0,0 +1,108 @@
+"""Upload size and latency benchmark for the audio preprocessing stage.
+
+Runs each clip through the voice pipeline with and without preprocess_wav()
+(trim silence, downmix to mono, resample to 16 kHz) and reports the bytes
+uploaded and the time until the last transcript is back. Transcription uses
+StubTranscriptionBackend with a simulated shared uplink, so no API key is needed.
+
+Pass a directory of WAV recordings with --clips; without it, clips shaped like
+typical mic_recorder captures are synthesized (stereo 48/44.1 kHz, a second
+or two of silence around two spoken phrases).
+
+Usage: python scripts/benchmark_audio_preprocessing.py [--clips DIR] [--uplink-kbps 2000]
+"""
+import argparse
+import asyncio
+import contextlib
+import glob
+import io
+import math
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+os.environ.setdefault("OPENAI_API_KEY", "benchmark") # Any value works; ai_logic only needs one to build its client
+from src.ai_drive_thru import db_utils
+from src.ai_drive_thru.audio_preprocessing import preprocess_wav
+from src.ai_drive_thru.voice_pipeline import encode_wav, StubTranscriptionBackend
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), '..', 'menu.db')
+TRANSCRIPTS = ["two cheeseburgers", "and a coke please"] # Fast-path phrases, so no OrderTaker latency
+
+def synthesize_clip(sample_rate, channels, lead_seconds, tail_seconds, seed):
+    """Two tone bursts standing in for speech, with background noise around them."""
+    rng = random.Random(seed)
+    def noise(seconds):
+        return [rng.randint(-80, 80) for _ in range(int(sample_rate * seconds))]
+    def speech(seconds, frequency):
+        return [int(6000 * math.sin(2 * math.pi * frequency * i / sample_rate)) for i in range(int(sample_rate * seconds))]
+    mono = noise(lead_seconds) + speech(1.4, 200) + noise(0.7) + speech(1.1, 260) + noise(tail_seconds)
+    interleaved = [sample for sample in mono for _ in range(channels)]
+    return encode_wav(struct.pack(f"<{len(interleaved)}h", *interleaved), sample_rate, channels)
+
+def synthesized_clips():
+    return [
+        ("stereo 48 kHz", synthesize_clip(48000, 2, 1.5, 1.2, 1)),
+        ("stereo 44.1 kHz", synthesize_clip(44100, 2, 2.0, 1.0, 2)),
+        ("mono 48 kHz", synthesize_clip(48000, 1, 1.0, 1.5, 3)),
+    ]
+
+async def run_pipeline(ai_logic, wav_bytes, backend):
+    started = time.perf_counter()
+    async for _ in ai_logic.stream_voice_order_async(wav_bytes, backend):
+        pass
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clips', help='Directory of .wav recordings to use instead of synthesized clips.')
+    parser.add_argument('--uplink-kbps', type=float, default=2000.0, help='Simulated upload bandwidth (kilobits/sec).')
+    parser.add_argument('--transcribe-seconds', type=float, default=0.3, help='Fixed transcription latency per request.')
+    parser.add_argument('--seconds-per-audio-second', type=float, default=0.1, help='Transcription time per second of audio.')
+    args = parser.parse_args()
+
+    if args.clips:
+        clips = [(os.path.basename(path), open(path, 'rb').read()) for path in sorted(glob.glob(os.path.join(args.clips, '*.wav')))]
+    else:
+        clips = synthesized_clips()
+    uplink = args.uplink_kbps * 1000 / 8
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_utils.DB_FILE = os.path.join(tmp_dir, 'menu.db')
+        shutil.copyfile(SOURCE_DB, db_utils.DB_FILE)
+        import ai_logic
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai_logic.warm_up() # Parse prompts etc. before timing anything
+
+        print(f"Uplink {args.uplink_kbps:.0f} kbit/s, transcription {args.transcribe_seconds:.2f}s + {args.seconds_per_audio_second:.2f}s/audio-s")
+        totals = {False: [0, 0.0], True: [0, 0.0]}
+        for name, wav_bytes in clips:
+            started = time.perf_counter()
+            processed = preprocess_wav(wav_bytes)
+            preprocess_ms = (time.perf_counter() - started) * 1000
+            print(f"\n{name}: {processed.original_seconds:.1f}s -> {processed.seconds:.1f}s of audio, "
+                  f"{processed.original_bytes:,} -> {processed.processed_bytes:,} bytes "
+                  f"({processed.reduction:.0%} smaller), preprocessing {preprocess_ms:.1f} ms")
+            for preprocess in (False, True):
+                ai_logic.PREPROCESS_AUDIO = preprocess
+                backend = StubTranscriptionBackend(TRANSCRIPTS, args.transcribe_seconds, args.seconds_per_audio_second, uplink)
+                with contextlib.redirect_stdout(io.StringIO()): # ai_logic logs every step
+                    elapsed = asyncio.run(run_pipeline(ai_logic, wav_bytes, backend))
+                totals[preprocess][0] += backend.bytes_uploaded
+                totals[preprocess][1] += elapsed
+                label = "preprocessed" if preprocess else "as recorded"
+                print(f"  {label:13s} uploaded {backend.bytes_uploaded:>10,} bytes   end-to-end {elapsed * 1000:7.1f} ms")
+
+        raw, processed = totals[False], totals[True]
+        if raw[0] and raw[1]:
+            print(f"\nOverall: {1 - processed[0] / raw[0]:.0%} fewer bytes uploaded, "
+                  f"{1 - processed[1] / raw[1]:.0%} lower end-to-end latency")
+        db_utils.close_db_connections()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmarks db_utils read throughput with several drive-thru lanes at once.
+
+Compares the original connect-per-call access pattern against the pooled,
+WAL-tuned connections in db_utils. Runs against a scratch copy of menu.db so
+the real database is never modified.
+
+Usage: python scripts/benchmark_db.py [--lanes 8] [--seconds 3]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+from src.ai_drive_thru import db_utils
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), '..', 'menu.db')
+ITEM_NAMES = ['Cheeseburger', 'Fries', 'Soda', 'Milkshake', 'Salad']
+
+# --- Baseline: the original connect-per-call implementation ---
+def legacy_get_menu_items(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    items = [dict(row) for row in conn.execute("SELECT name, description, price, quantity FROM menu_items")]
+    conn.close()
+    return items
+
+def legacy_get_item_details(db_path, item_name):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT name, description, price, quantity FROM menu_items WHERE name = ? COLLATE NOCASE", (item_name,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def run_lanes(lanes, seconds, work):
+    """Runs `work(lane_index, i)` in a loop on each lane thread; returns total calls/sec."""
+    counts = [0] * lanes
+    stop_at = time.perf_counter() + seconds
+    start_barrier = threading.Barrier(lanes)
+
+    def lane(index):
+        start_barrier.wait()
+        i = 0
+        while time.perf_counter() < stop_at:
+            work(index, i)
+            i += 1
+        counts[index] = i
+
+    threads = [threading.Thread(target=lane, args=(n,)) for n in range(lanes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lanes', type=int, default=8, help='Concurrent lanes (threads) hitting the DB.')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each run.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'menu.db')
+        shutil.copyfile(SOURCE_DB, db_path)
+        db_utils.DB_FILE = db_path
+
+        # A "call" mirrors one request: a menu read plus one item lookup.
+        def legacy_call(lane, i):
+            legacy_get_menu_items(db_path)
+            legacy_get_item_details(db_path, ITEM_NAMES[i % len(ITEM_NAMES)])
+
+        def pooled_call(lane, i):
+            db_utils.get_menu_items()
+            db_utils.get_item_details(ITEM_NAMES[i % len(ITEM_NAMES)])
+
+        print(f"Lanes: {args.lanes}, duration: {args.seconds:.1f}s per run")
+        before = run_lanes(args.lanes, args.seconds, legacy_call)
+        print(f"Before (connect per call): {before:,.0f} calls/sec")
+        after = run_lanes(args.lanes, args.seconds, pooled_call)
+        print(f"After (pooled + WAL):      {after:,.0f} calls/sec")
+        print(f"Speedup: {after / before:.1f}x")
+        db_utils.close_db_connections()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark for the demand forecast behind the autonomous reorder.
+
+Fills a scratch database with --years of synthetic daily sales for --items
+items (a weekly pattern, a slow trend and noise), then times the full
+compute_reorder_rules() (reading sales_daily plus the forecast) and the NumPy
+part alone. Also prints how well the weekday profile was recovered.
+
+Usage: python scripts/benchmark_demand_forecast.py [--items 500] [--years 3] [--runs 10]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+from src.ai_drive_thru import db_utils
+from src.ai_drive_thru import demand_forecast
+
+WEEKLY_PATTERN = np.array([0.8, 0.8, 0.9, 1.0, 1.3, 1.4, 0.8]) # Monday first
+
+def synthetic_sales(items, days, today, seed):
+    """Returns (item_ids, days, units) arrays of daily sales with weekly seasonality."""
+    rng = np.random.default_rng(seed)
+    day_numbers = np.arange(today - days, today)
+    base = rng.uniform(2, 80, size=(items, 1))
+    trend = 1 + rng.uniform(-0.3, 0.3, size=(items, 1)) * np.linspace(0, 1, days)
+    season = WEEKLY_PATTERN[demand_forecast.weekday(day_numbers)] / WEEKLY_PATTERN.mean()
+    units = rng.poisson(base * trend * season)
+    item_ids, day_index = np.nonzero(units)
+    return item_ids + 1, day_numbers[day_index], units[item_ids, day_index]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=500, help='Menu items with sales history.')
+    parser.add_argument('--years', type=float, default=3.0, help='Years of daily sales per item.')
+    parser.add_argument('--runs', type=int, default=10, help='Timed runs per measurement.')
+    args = parser.parse_args()
+
+    today = db_utils.local_day()
+    item_ids, days, units = synthetic_sales(args.items, int(args.years * 365), today, seed=0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'menu.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE menu_items (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, "
+                     "description TEXT, price REAL NOT NULL, quantity INTEGER NOT NULL CHECK(quantity >= 0))")
+        conn.executemany("INSERT INTO menu_items (name, description, price, quantity) VALUES (?, '', 1.0, 100)",
+                         [(f"Item {index}",) for index in range(args.items)])
+        conn.commit()
+        conn.close()
+        db_utils.DB_FILE = db_path
+        conn = db_utils.get_db_connection() # Creates sales_daily
+        conn.executemany("INSERT INTO sales_daily (item_id, day, quantity) VALUES (?, ?, ?)",
+                         zip(item_ids.tolist(), days.tolist(), units.tolist()))
+        conn.commit()
+
+        print(f"{args.items} items x {args.years:g} years: {len(units):,} sales_daily rows, {args.runs} runs")
+        timings = {"read + forecast": [], "forecast only": []}
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            rules = demand_forecast.compute_reorder_rules()
+            timings["read + forecast"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            forecast = demand_forecast.forecast_demand(item_ids, days, units.astype(float), today)
+            demand_forecast.reorder_rules(forecast)
+            timings["forecast only"].append(time.perf_counter() - started)
+        db_utils.close_db_connections()
+
+    for name, values in timings.items():
+        print(f"  {name:16s} median {np.median(values) * 1000:7.1f} ms   max {max(values) * 1000:7.1f} ms")
+    expected = WEEKLY_PATTERN / WEEKLY_PATTERN.mean()
+    error = np.abs(forecast.weekday_factors - expected).mean()
+    print(f"  {len(rules)} items with rules; mean weekday-factor error {error:.3f}")
+
+if __name__ == "__main__":
+    main()
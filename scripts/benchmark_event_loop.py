@@ -0,0 +1,134 @@
+"""Measures per-request overhead of asyncio.run() versus ai_logic's background loop.
+
+Two measurements:
+1. Bare overhead of running a trivial coroutine from synchronous code.
+2. HTTP requests through one shared httpx.AsyncClient (as the kernel's OpenAI
+   client is) against a local keep-alive server that counts new connections.
+   Against api.openai.com every new connection is also a TLS handshake.
+
+Usage: python scripts/benchmark_event_loop.py [--requests 300]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+from src.ai_drive_thru.background_loop import BackgroundEventLoop
+
+class CountingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the OpenAI API
+    connections = 0
+    connections_lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Avoid Nagle/delayed-ACK stalls
+        with CountingHandler.connections_lock:
+            CountingHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"status": "not_an_order", "message": "Hello!"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass # Clients dropping connections from closed loops is expected here
+
+async def noop():
+    return None
+
+def bench_overhead(count, background):
+    started = time.perf_counter()
+    for _ in range(count):
+        asyncio.run(noop())
+    run_us = (time.perf_counter() - started) * 1e6 / count
+    started = time.perf_counter()
+    for _ in range(count):
+        background.run(noop())
+    background_us = (time.perf_counter() - started) * 1e6 / count
+    print(f"Loop overhead per call: asyncio.run {run_us:.0f} us, background loop {background_us:.0f} us")
+
+def bench_http(url, count, background):
+    results = {}
+
+    # Before, done safely: asyncio.run per call with a client created inside each loop
+    async def post_with_new_client():
+        async with httpx.AsyncClient() as client:
+            return await client.post(url, json={"input": "hi"})
+    CountingHandler.connections = 0
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        try:
+            asyncio.run(post_with_new_client())
+        except Exception:
+            errors += 1
+    results["asyncio.run, new client"] = ((time.perf_counter() - started) * 1000 / count, CountingHandler.connections, errors)
+
+    # Before, as ai_logic did it: asyncio.run per call with a shared client. Pooled connections belong
+    # to the loop that opened them, so each new loop has to open new ones (and
+    # errors when it touches a connection owned by a closed loop).
+    client = httpx.AsyncClient()
+    CountingHandler.connections = 0
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        try:
+            asyncio.run(client.post(url, json={"input": "hi"}))
+        except Exception:
+            errors += 1
+    results["asyncio.run, shared client"] = ((time.perf_counter() - started) * 1000 / count, CountingHandler.connections, errors)
+
+    # After: every call on the long-lived loop, so the keep-alive pool is reused
+    client = background.run(_make_client())
+    CountingHandler.connections = 0
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        try:
+            background.run(client.post(url, json={"input": "hi"}))
+        except Exception:
+            errors += 1
+    results["background loop"] = ((time.perf_counter() - started) * 1000 / count, CountingHandler.connections, errors)
+    background.run(client.aclose())
+
+    for mode, (ms, connections, errors) in results.items():
+        print(f"{mode:>28}: {ms:.2f} ms/request, {connections} new connections (TLS handshakes), {errors} errors")
+
+async def _make_client():
+    return httpx.AsyncClient()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300, help='Requests per mode.')
+    args = parser.parse_args()
+
+    server = QuietServer(("127.0.0.1", 0), CountingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+    background = BackgroundEventLoop(name="benchmark-loop")
+    bench_overhead(args.requests * 5, background)
+    bench_http(url, args.requests, background)
+    background.stop()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
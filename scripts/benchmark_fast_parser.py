@@ -0,0 +1,121 @@
+"""Measures the fast-path order parser's hit rate and the LLM latency it saves.
+
+Replays a corpus of typical drive-thru utterances through parse_order_fast()
+against a scratch copy of menu.db. Utterances the parser declines would go to
+the OrderTaker LLM; each hit saves roughly one LLM round trip (--llm-ms).
+With --admin, replays manager commands through parse_admin_command_fast()
+instead (misses go to the AdminManager LLM).
+
+Usage: python scripts/benchmark_fast_parser.py [--llm-ms 1500] [--admin]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+from src.ai_drive_thru import db_utils
+from src.ai_drive_thru.fast_parser import parse_order_fast, parse_admin_command_fast
+from src.ai_drive_thru.menu_cache import get_menu_snapshot
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), '..', 'menu.db')
+
+# Roughly the mix heard at a real window: mostly plain adds/removes, plus
+# questions, greetings and ambiguous requests that need the LLM.
+UTTERANCES = [
+    "two cheeseburgers and a fries",
+    "I'd like a cheeseburger please",
+    "can I get three fries",
+    "a veggie burger and a salad",
+    "gimme two coke",
+    "I'll have a chocolate shake",
+    "one vanilla milkshake and one strawberry milkshake",
+    "add another fries",
+    "remove the salad",
+    "no fries",
+    "actually take off the cheeseburger",
+    "two cheese burgers, two fries and two cokes please",
+    "let me get a sprite",
+    "and a salad too",
+    "can we get four cheeseburgers four fries and four orange sodas",
+    "cancel the veggie burger",
+    "one more cheeseburger",
+    "3 fries",
+    "a chicken sandwich",
+    "give me a cheeseburger and french fries",
+    "gimme a soda",
+    "remove the soda",
+    "hi there",
+    "what do you have",
+    "do you have onion rings?",
+    "can I get a large fries",
+    "a burger with no pickles",
+    "what's in the veggie burger",
+    "that's all",
+    "how much is a milkshake",
+]
+
+# Manager commands from the Admin Panel: mostly stock checks and single-item
+# reorders, plus batches and questions that need the LLM.
+ADMIN_COMMANDS = [
+    "order 20 fries",
+    "Order 20 more fries",
+    "how many cheeseburgers do we have?",
+    "how many fries are left",
+    "restock milkshakes by 30",
+    "add 15 to the salad stock",
+    "what's the stock of soda",
+    "fries stock",
+    "do we have any veggie burgers left?",
+    "can you order 50 chicken sandwiches please",
+    "reorder 12 french fries",
+    "check the soda inventory",
+    "order twenty shakes",
+    "How many burgers do we have?",
+    "need more stuff",
+    "add 50 fries, 30 salads, 20 shakes",
+    "order 10 pizzas",
+    "what sold best this week?",
+    "how many fries should I order for the weekend",
+    "remove the salad from the menu",
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--llm-ms', type=float, default=1500.0, help='Typical OrderTaker LLM round trip in ms.')
+    parser.add_argument('--repeat', type=int, default=200, help='Times to replay the corpus for timing.')
+    parser.add_argument('--admin', action='store_true', help='Replay Admin Panel commands through the admin parser.')
+    args = parser.parse_args()
+    corpus, parse, llm_name = (ADMIN_COMMANDS, parse_admin_command_fast, "AdminManager") if args.admin else (UTTERANCES, parse_order_fast, "OrderTaker")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'menu.db')
+        shutil.copyfile(SOURCE_DB, db_path)
+        db_utils.DB_FILE = db_path
+        snapshot = get_menu_snapshot()
+
+        hits = [utterance for utterance in corpus if parse(utterance, snapshot) is not None]
+        misses = [utterance for utterance in corpus if utterance not in hits]
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for utterance in corpus:
+                parse(utterance, snapshot)
+        parse_ms = (time.perf_counter() - started) * 1000 / (args.repeat * len(corpus))
+        db_utils.close_db_connections()
+
+    hit_rate = len(hits) / len(corpus)
+    baseline_ms = args.llm_ms
+    with_fast_path_ms = hit_rate * parse_ms + (1 - hit_rate) * (parse_ms + args.llm_ms)
+    print(f"Utterances: {len(corpus)}, fast-path hits: {len(hits)} ({hit_rate:.0%})")
+    print(f"Average parse time: {parse_ms * 1000:.1f} us")
+    print(f"Mean {llm_name} latency: {baseline_ms:.0f} ms -> {with_fast_path_ms:.0f} ms "
+          f"(saves {baseline_ms - with_fast_path_ms:.0f} ms per utterance at {args.llm_ms:.0f} ms/LLM call)")
+    print("\nSent to the LLM:")
+    for utterance in misses:
+        print(f"  - {utterance}")
+
+if __name__ == "__main__":
+    main()
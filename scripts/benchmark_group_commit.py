@@ -0,0 +1,120 @@
+"""Write-throughput benchmark for the group-commit inventory writer.
+
+N lanes (threads) confirm orders as fast as they can, each a reserve_order()
+plus commit_order(), i.e. a sale with its ledger rows. Runs once with a
+transaction per call on the calling thread's connection, as db_utils did
+before the writer, and once per group-commit window. Reports orders/sec,
+p50/p99 latency per call and the average batch size.
+
+--synchronous FULL fsyncs every commit (the durable setting), where the cost
+of a commit, and so the benefit of sharing one, is largest.
+
+Usage: python scripts/benchmark_group_commit.py [--lanes 16] [--seconds 5] [--windows 0,1,2] [--synchronous FULL]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+from src.ai_drive_thru import db_utils
+from src.ai_drive_thru.group_commit import GroupCommitWriter, RollbackWork
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), '..', 'menu.db')
+STARTING_STOCK = 10_000_000
+ORDER = [{"item": "Cheeseburger", "quantity": 2}, {"item": "Fries", "quantity": 1}, {"item": "Soda", "quantity": 2}]
+
+class PerCallWriter:
+    """One IMMEDIATE transaction per call on the caller's own connection: the old behaviour."""
+
+    def __init__(self):
+        self.stats = {"batches": 0, "work": 0}
+
+    def execute(self, work):
+        conn = db_utils.get_db_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(conn)
+        except RollbackWork as rollback:
+            conn.rollback()
+            return rollback.result
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        self.stats["batches"] += 1
+        self.stats["work"] += 1
+        return result
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+def lane(stop_at, latencies, errors):
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        reservation = db_utils.reserve_order(ORDER)
+        if not reservation["success"] or not db_utils.commit_order(reservation["reservation_id"]):
+            errors.append(reservation)
+        latencies.append(time.perf_counter() - started)
+
+def run(lanes, seconds):
+    latencies, errors = [], []
+    stop_at = time.perf_counter() + seconds
+    threads = [threading.Thread(target=lane, args=(stop_at, latencies, errors)) for _ in range(lanes)]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # db_utils logs failures
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return sorted(latencies), len(errors), time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lanes', type=int, default=16, help='Concurrent writer threads.')
+    parser.add_argument('--seconds', type=float, default=5.0, help='How long to run each configuration.')
+    parser.add_argument('--windows', default='0,1,2', help='Comma-separated group-commit windows in milliseconds.')
+    parser.add_argument('--synchronous', default='NORMAL', choices=['OFF', 'NORMAL', 'FULL'], help='SQLite synchronous pragma.')
+    args = parser.parse_args()
+
+    db_utils.SQLITE_PRAGMAS = tuple(
+        f"PRAGMA synchronous={args.synchronous}" if pragma.startswith("PRAGMA synchronous") else pragma
+        for pragma in db_utils.SQLITE_PRAGMAS
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_utils.DB_FILE = os.path.join(tmp_dir, 'menu.db')
+        shutil.copyfile(SOURCE_DB, db_utils.DB_FILE)
+        conn = sqlite3.connect(db_utils.DB_FILE)
+        conn.execute("UPDATE menu_items SET quantity = ?", (STARTING_STOCK,))
+        conn.commit()
+        conn.close()
+
+        writers = [("per call", PerCallWriter())]
+        for window in [float(value) for value in args.windows.split(',') if value.strip()]:
+            writers.append((f"group {window:g} ms", GroupCommitWriter(db_utils.get_db_connection, window_seconds=window / 1000)))
+
+        print(f"{args.lanes} lanes x {args.seconds:.0f}s, synchronous={args.synchronous}")
+        print(f"\n{'writer':>14} {'orders/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'txn/s':>8} {'per txn':>8} {'errors':>7}")
+        for name, writer in writers:
+            db_utils.inventory_writer = writer
+            latencies, errors, elapsed = run(args.lanes, args.seconds)
+            batches = writer.stats["batches"]
+            print(f"{name:>14} {len(latencies) / elapsed:>9.0f} {percentile(latencies, 50) * 1000:>8.2f} "
+                  f"{percentile(latencies, 99) * 1000:>8.2f} {batches / elapsed:>8.0f} "
+                  f"{writer.stats['work'] / max(batches, 1):>8.1f} {errors:>7}")
+            if isinstance(writer, GroupCommitWriter):
+                writer.stop()
+        mismatches = db_utils.reconcile_inventory()
+        print(f"\nLedger matches stock for every item: {not mismatches}")
+        db_utils.close_db_connections()
+
+if __name__ == "__main__":
+    main()
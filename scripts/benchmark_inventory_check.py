@@ -0,0 +1,84 @@
+"""Benchmark for the set-based autonomous reorder.
+
+Compares the old inventory check (read the whole menu, then one
+update_item_quantity and one get_item_quantity per low item) with
+reorder_low_stock() (one UPDATE ... RETURNING in one transaction) on a scratch
+menu of --items items, --low-share of them below the threshold. Reports
+wall time and transactions committed per check.
+
+Usage: python scripts/benchmark_inventory_check.py [--items 500] [--low-share 0.3] [--runs 20]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+from src.ai_drive_thru import db_utils
+
+THRESHOLD, REORDER_QUANTITY = 10, 50
+
+def old_check():
+    """The previous per-item loop from ai_logic.run_autonomous_inventory_check_async."""
+    reordered = []
+    for item in db_utils.get_menu_items():
+        if item['quantity'] < THRESHOLD:
+            if db_utils.update_item_quantity(item['name'], REORDER_QUANTITY):
+                reordered.append({"item_name": item['name'], "ordered_quantity": REORDER_QUANTITY,
+                                  "new_quantity": db_utils.get_item_quantity(item['name'])})
+    return reordered
+
+def new_check():
+    return db_utils.reorder_low_stock(THRESHOLD, REORDER_QUANTITY)
+
+def reset_stock(db_path, items, low_share, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.executemany("UPDATE menu_items SET quantity = ? WHERE id = ?",
+                     [(rng.randint(0, THRESHOLD - 1) if rng.random() < low_share else rng.randint(THRESHOLD, 200), item_id)
+                      for item_id in range(1, items + 1)])
+    conn.commit()
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=500, help='Menu items in the scratch database.')
+    parser.add_argument('--low-share', type=float, default=0.3, help='Share of items below the threshold.')
+    parser.add_argument('--runs', type=int, default=20, help='Checks per approach.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'menu.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE menu_items (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, "
+                     "description TEXT, price REAL NOT NULL, quantity INTEGER NOT NULL CHECK(quantity >= 0))")
+        conn.executemany("INSERT INTO menu_items (name, description, price, quantity) VALUES (?, '', 1.0, 100)",
+                         [(f"Item {index}",) for index in range(args.items)])
+        conn.commit()
+        conn.close()
+        db_utils.DB_FILE = db_path
+
+        print(f"{args.items} items, {args.low_share:.0%} below {THRESHOLD}, {args.runs} runs")
+        for name, check in (("per item", old_check), ("set-based", new_check)):
+            elapsed, commits, restocked = 0.0, 0, 0
+            for run in range(args.runs):
+                reset_stock(db_path, args.items, args.low_share, run)
+                counter = []
+                db_utils.get_db_connection().set_trace_callback(counter.append)
+                with contextlib.redirect_stdout(io.StringIO()): # db_utils logs every update
+                    started = time.perf_counter()
+                    restocked += len(check())
+                    elapsed += time.perf_counter() - started
+                db_utils.get_db_connection().set_trace_callback(None)
+                commits += counter.count("COMMIT")
+            print(f"  {name:10s} {elapsed / args.runs * 1000:8.2f} ms/check   {commits / args.runs:5.0f} commits/check   "
+                  f"{restocked / args.runs:5.0f} items restocked")
+        db_utils.close_db_connections()
+
+if __name__ == "__main__":
+    main()
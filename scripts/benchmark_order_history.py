@@ -0,0 +1,99 @@
+"""Benchmark for the order history rollups.
+
+Records --orders synthetic confirmed orders spread over --days days into a
+scratch copy of menu.db (through record_orders(), i.e. the same inserts and
+rollup upserts as commit_order), then times the aggregation API against the
+same questions answered by scanning order_lines.
+
+Usage: python scripts/benchmark_order_history.py [--orders 1000000] [--days 365] [--runs 20]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+from src.ai_drive_thru import db_utils
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), '..', 'menu.db')
+CHUNK = 5000 # Orders per record_orders() transaction while loading
+
+def synthetic_orders(count, days, item_names, seed):
+    """Yields orders of 1-4 lines, busiest around lunch and dinner, over the last `days` days."""
+    rng = random.Random(seed)
+    now = time.time()
+    popularity = [rng.uniform(0.2, 3.0) for _ in item_names]
+    for _ in range(count):
+        day_start = now - rng.randrange(days) * 86400
+        hour = rng.choice((11, 12, 12, 13, 17, 18, 18, 19, rng.randrange(6, 23)))
+        created_at = day_start - (day_start % 86400) + hour * 3600 + rng.randrange(3600)
+        items = rng.choices(item_names, weights=popularity, k=rng.randint(1, 4))
+        yield {"created_at": created_at, "lines": [{"item": item, "quantity": rng.randint(1, 3)} for item in set(items)]}
+
+def timed(func, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        result = func()
+    return (time.perf_counter() - started) / runs * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=1_000_000, help='Confirmed orders to record.')
+    parser.add_argument('--days', type=int, default=365, help='Days the orders are spread over.')
+    parser.add_argument('--runs', type=int, default=20, help='Timed runs per query.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_utils.DB_FILE = os.path.join(tmp_dir, 'menu.db')
+        shutil.copyfile(SOURCE_DB, db_utils.DB_FILE)
+        item_names = [item['name'] for item in db_utils.get_menu_items()]
+
+        started = time.perf_counter()
+        chunk = []
+        for order in synthetic_orders(args.orders, args.days, item_names, seed=0):
+            chunk.append(order)
+            if len(chunk) == CHUNK:
+                db_utils.record_orders(chunk)
+                chunk = []
+        if chunk:
+            db_utils.record_orders(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"Recorded {args.orders:,} orders over {args.days} days in {elapsed:.1f}s ({args.orders / elapsed:,.0f} orders/s)")
+
+        conn = db_utils.get_db_connection()
+        scans = {
+            "top sellers, 30 days": lambda: conn.execute(
+                "SELECT l.item_id, SUM(l.quantity) AS units FROM order_lines l JOIN orders o ON o.id = l.order_id "
+                "WHERE o.created_at >= ? GROUP BY l.item_id ORDER BY units DESC LIMIT 10",
+                (time.time() - 30 * 86400,)).fetchall(),
+            "hourly volume, 24 h": lambda: conn.execute(
+                "SELECT CAST(created_at / 3600 AS INTEGER) AS hour, COUNT(*) FROM orders WHERE created_at >= ? GROUP BY hour",
+                (time.time() - 24 * 3600,)).fetchall(),
+            "attach rates, 30 days": lambda: conn.execute(
+                "SELECT b.item_id, COUNT(*) FROM order_lines a JOIN orders o ON o.id = a.order_id "
+                "JOIN order_lines b ON b.order_id = a.order_id AND b.item_id != a.item_id "
+                "WHERE a.item_id = 1 AND o.created_at >= ? GROUP BY b.item_id",
+                (time.time() - 30 * 86400,)).fetchall(),
+            "top sellers, 365 days": lambda: conn.execute(
+                "SELECT item_id, SUM(quantity) AS units FROM order_lines GROUP BY item_id ORDER BY units DESC LIMIT 10").fetchall(),
+        }
+        rollups = {
+            "top sellers, 30 days": lambda: db_utils.get_top_sellers(days=30),
+            "hourly volume, 24 h": lambda: db_utils.get_hourly_volume(hours=24),
+            "attach rates, 30 days": lambda: db_utils.get_attach_rates(item_names[0], days=30),
+            "top sellers, 365 days": lambda: db_utils.get_top_sellers(days=365),
+        }
+        print(f"\n{'query':>24} {'scan ms':>9} {'rollup ms':>10}")
+        for name, rollup in rollups.items():
+            scan_ms, _ = timed(scans[name], max(1, args.runs // 10))
+            rollup_ms, _ = timed(rollup, args.runs)
+            print(f"{name:>24} {scan_ms:>9.1f} {rollup_ms:>10.2f}")
+        print(f"\nBusiest hour (last 28 days): {sorted(db_utils.get_volume_by_hour_of_day(), key=lambda row: -row['orders'])[0]}")
+        print(f"Top seller: {db_utils.get_top_sellers(days=30, limit=1)}")
+        db_utils.close_db_connections()
+
+if __name__ == "__main__":
+    main()
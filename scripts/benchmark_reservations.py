@@ -0,0 +1,121 @@
+"""Contention benchmark for order confirmation with many lanes in separate processes.
+
+Every lane process confirms random orders as fast as it can against a scratch
+copy of menu.db with a fixed amount of stock. Compares the old per-line
+update_item_quantity() calls against the atomic reserve_order()/commit_order()
+transaction and checks that stock is conserved: what left the shelves must
+equal what was sold, with no partially applied orders.
+
+Usage: python scripts/benchmark_reservations.py [--lanes 24] [--seconds 3]
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+from src.ai_drive_thru import db_utils
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), '..', 'menu.db')
+ITEM_NAMES = ['Cheeseburger', 'Veggie Burger', 'Fries', 'Soda', 'Milkshake', 'Salad']
+STARTING_STOCK = 20000 # Per item; low enough that busy runs drain some items
+
+def random_order(rng):
+    return [{"item": name, "quantity": rng.randint(1, 3)} for name in rng.sample(ITEM_NAMES, rng.randint(1, 4))]
+
+def legacy_confirm(order):
+    """The pre-reservation pattern: one check-then-update call per line."""
+    applied = [line for line in order if db_utils.update_item_quantity(line["item"], -line["quantity"])]
+    return applied
+
+def atomic_confirm(order):
+    result = db_utils.reserve_order(order)
+    if result["success"] and db_utils.commit_order(result["reservation_id"]):
+        return order
+    return []
+
+def lane_worker(args):
+    """Runs in its own process; returns (orders, fully applied, partially applied, units sold, latencies)."""
+    db_path, mode, seconds, seed, start_at = args
+    db_utils.DB_FILE = db_path
+    confirm = atomic_confirm if mode == "atomic" else legacy_confirm
+    rng = random.Random(seed)
+    latencies = []
+    full = partial = sold = 0
+    while time.time() < start_at: # Start every lane at the same moment
+        time.sleep(0.001)
+    stop_at = start_at + seconds
+    with contextlib.redirect_stdout(io.StringIO()): # db_utils logs every update
+        while time.time() < stop_at:
+            order = random_order(rng)
+            started = time.perf_counter()
+            applied = confirm(order)
+            latencies.append(time.perf_counter() - started)
+            sold += sum(line["quantity"] for line in applied)
+            if len(applied) == len(order):
+                full += 1
+            elif applied:
+                partial += 1
+    return len(latencies), full, partial, sold, latencies
+
+def prepare_db(tmp_dir, mode):
+    db_path = os.path.join(tmp_dir, f'menu_{mode}.db')
+    shutil.copyfile(SOURCE_DB, db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE menu_items SET quantity = ?", (STARTING_STOCK,))
+    conn.commit()
+    conn.close()
+    return db_path
+
+def total_stock(db_path):
+    conn = sqlite3.connect(db_path)
+    placeholders = ", ".join("?" * len(ITEM_NAMES))
+    total = conn.execute(f"SELECT SUM(quantity) FROM menu_items WHERE name IN ({placeholders})", ITEM_NAMES).fetchone()[0]
+    conn.close()
+    return total
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+def run_mode(tmp_dir, mode, lanes, seconds):
+    db_path = prepare_db(tmp_dir, mode)
+    before = total_stock(db_path)
+    start_at = time.time() + 1.0 # Leave time for every process to spawn
+    with multiprocessing.get_context("spawn").Pool(lanes) as pool:
+        results = pool.map(lane_worker, [(db_path, mode, seconds, seed, start_at) for seed in range(lanes)])
+    after = total_stock(db_path)
+
+    orders = sum(r[0] for r in results)
+    full = sum(r[1] for r in results)
+    partial = sum(r[2] for r in results)
+    sold = sum(r[3] for r in results)
+    latencies = sorted(lat for r in results for lat in r[4])
+    conserved = (before - after) == sold
+    print(f"\n[{mode}] {lanes} lanes x {seconds:.1f}s")
+    print(f"  Orders attempted:   {orders:,} ({orders / seconds:,.0f}/sec)")
+    print(f"  Fully confirmed:    {full:,} ({full / seconds:,.0f}/sec)")
+    print(f"  Partially applied:  {partial:,}")
+    print(f"  Latency p50/p99:    {percentile(latencies, 50) * 1000:.2f} ms / {percentile(latencies, 99) * 1000:.2f} ms")
+    print(f"  Stock conserved:    {'yes' if conserved else 'NO'} (removed {before - after:,}, sold {sold:,})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lanes', type=int, default=24, help='Concurrent lane processes.')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each run.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run_mode(tmp_dir, "legacy", args.lanes, args.seconds)
+        run_mode(tmp_dir, "atomic", args.lanes, args.seconds)
+
+if __name__ == "__main__":
+    main()
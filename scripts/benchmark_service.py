@@ -0,0 +1,148 @@
+"""Concurrency benchmark for the HTTP service (service.py).
+
+Starts the service with uvicorn on a scratch copy of menu.db and drives it
+with N concurrent lanes over HTTP, each replaying order scripts the way a
+speaker post would: open a session, send each utterance, confirm. A probe
+polls /health throughout; its latency shows whether anything is blocking the
+event loop. Reports orders/sec and request and probe p50/p95/p99 for each lane
+count.
+
+With --compare-inline, each lane count is also run with SQLite queries
+executed directly on the event loop instead of ai_logic's worker threads, to
+show what run_blocking() buys.
+
+Unless --base-url is given, a stub OpenAI server (scripts/stub_openai_server.py)
+is started in-process, so no API key or money is needed.
+
+Usage: python scripts/benchmark_service.py [--lanes 1,8,32,64] [--seconds 10] [--compare-inline]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+sys.path.insert(0, os.path.dirname(__file__)) # For the stub server and load generator
+from stub_openai_server import add_stub_arguments, backend_from_args, start_stub_server
+from load_generator import ORDER_SCRIPTS, percentile, prepare_db
+
+PROBE_INTERVAL = 0.05
+
+def start_service(app):
+    """Runs the ASGI app with uvicorn on its own thread and returns (server, base_url)."""
+    import uvicorn
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False, backlog=2048))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+async def lane(client, seed, stop_at, stats):
+    rng = random.Random(seed)
+
+    async def request(method, path, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, path, **kwargs)
+        stats["requests"].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            stats["errors"] += 1
+        return response
+
+    while time.perf_counter() < stop_at:
+        session_id = (await request("POST", "/sessions")).json()["session_id"]
+        for utterance in rng.choice(ORDER_SCRIPTS):
+            await request("POST", f"/sessions/{session_id}/text", json={"text": utterance})
+        if (await request("POST", f"/sessions/{session_id}/confirm")).status_code == 200:
+            stats["orders"] += 1
+        await request("DELETE", f"/sessions/{session_id}")
+
+async def probe(client, stop_at, stats):
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        await client.get("/health")
+        stats["probe"].append(time.perf_counter() - started)
+        await asyncio.sleep(PROBE_INTERVAL)
+
+async def run_load(base_url, lanes, seconds):
+    import httpx
+    stats = {"requests": [], "probe": [], "orders": 0, "errors": 0}
+    limits = httpx.Limits(max_connections=lanes + 4, max_keepalive_connections=lanes + 4)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        stop_at = time.perf_counter() + seconds
+        started = time.perf_counter()
+        await asyncio.gather(probe(client, stop_at, stats), *(lane(client, seed, stop_at, stats) for seed in range(lanes)))
+        stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+async def run_inline(func, *args):
+    """Stand-in for ai_logic.run_blocking that runs the call on the event loop itself."""
+    return func(*args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lanes', default='1,8,32,64', help='Comma-separated concurrent lane counts to run.')
+    parser.add_argument('--seconds', type=float, default=10.0, help='How long to run each lane count.')
+    parser.add_argument('--base-url', help='OpenAI-compatible endpoint to use instead of the in-process stub.')
+    parser.add_argument('--fast-path', action='store_true', help='Enable the local fast-path order parser.')
+    parser.add_argument('--compare-inline', action='store_true', help='Also run with SQLite on the event loop.')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    lane_counts = [int(value) for value in args.lanes.split(',') if value.strip()]
+
+    stub = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        stub, base_url = start_stub_server(backend=backend_from_args(args))
+        os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = base_url # Read when ai_logic builds its client
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        from src.ai_drive_thru import db_utils
+        db_utils.DB_FILE = prepare_db(tmp_dir)
+        import ai_logic
+        import service
+        ai_logic.USE_FAST_ORDER_PARSER = args.fast_path
+        ai_logic.USE_RESPONSE_CACHE = False # Every utterance should reach the LLM
+        with contextlib.redirect_stdout(io.StringIO()): # ai_logic and db_utils log every step
+            server, thread, service_url = start_service(service.app)
+
+        modes = [("worker threads", ai_logic.run_blocking)]
+        if args.compare_inline:
+            modes.append(("on event loop", run_inline))
+
+        print(f"Service at {service_url}, LLM at {base_url} (fast path {'on' if args.fast_path else 'off'}), "
+              f"{args.seconds:.0f}s per run")
+        print(f"\n{'sqlite':>14} {'lanes':>6} {'orders/s':>9} {'req/s':>7} {'req p50':>8} {'req p95':>8} "
+              f"{'req p99':>8} {'probe p50':>10} {'probe p99':>10} {'errors':>7}")
+        for mode, blocking in modes:
+            ai_logic.run_blocking = service.run_blocking = blocking
+            for lanes in lane_counts:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = asyncio.run(run_load(service_url, lanes, args.seconds))
+                requests, probes = sorted(stats["requests"]), sorted(stats["probe"])
+                elapsed = stats["elapsed"]
+                print(f"{mode:>14} {lanes:>6} {stats['orders'] / elapsed:>9.1f} {len(requests) / elapsed:>7.0f} "
+                      f"{percentile(requests, 50) * 1000:>8.1f} {percentile(requests, 95) * 1000:>8.1f} "
+                      f"{percentile(requests, 99) * 1000:>8.1f} {percentile(probes, 50) * 1000:>10.1f} "
+                      f"{percentile(probes, 99) * 1000:>10.1f} {stats['errors']:>7}")
+
+        server.should_exit = True
+        thread.join(timeout=10)
+        if stub is not None:
+            stub.shutdown()
+        db_utils.close_db_connections()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Memory and update-cost benchmark for the session store.
+
+Fills SessionStore with N sessions shaped like real drive-thru visits (a few
+order lines, a long chat) and measures the memory held per session with
+tracemalloc, against the previous representation: a list of line dicts plus
+unbounded lists of message dicts per session. Also times add/remove against
+orders of growing size, where the old list scan grew linearly.
+
+Usage: python scripts/benchmark_session_store.py [--sessions 5000] [--messages 200]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+from src.ai_drive_thru.order_state import Order
+from src.ai_drive_thru.session_store import SessionStore
+
+ITEMS = [("Cheeseburger", None), ("Fries", None), ("Soda", "Cola"), ("Milkshake", "Vanilla"), ("Salad", None)]
+MESSAGE = "Okay, I've added 2 Cheeseburgers and a Fries. Anything else?"
+
+def list_add(order_list, item_key, details, quantity):
+    """The old linear-scan add from app.py."""
+    for item in order_list:
+        if item['item'] == item_key and item.get('details') == details:
+            item['quantity'] += quantity
+            return
+    new_item = {"item": item_key, "quantity": quantity}
+    if details:
+        new_item["details"] = details
+    order_list.append(new_item)
+
+def build_old(sessions, messages):
+    store = {}
+    for index in range(sessions):
+        order = []
+        for item, details in ITEMS[:index % len(ITEMS) + 1]:
+            list_add(order, item, details, 1)
+        chat = [{"role": "user" if i % 2 else "assistant", "content": MESSAGE} for i in range(messages)]
+        store[f"{index:032x}"] = {"order": order, "messages": chat}
+    return store
+
+def build_new(sessions, messages):
+    store = SessionStore(max_sessions=sessions)
+    for index in range(sessions):
+        session = store.create()
+        for item, details in ITEMS[:index % len(ITEMS) + 1]:
+            session.order.add(item, details, 1)
+        for i in range(messages):
+            session.messages.append({"role": "user" if i % 2 else "assistant", "content": MESSAGE})
+    return store
+
+def measure(build, sessions, messages):
+    gc.collect()
+    tracemalloc.start()
+    store = build(sessions, messages)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return current
+
+def time_updates(lines, repeats=2000):
+    order_list, order = [], Order()
+    for index in range(lines):
+        list_add(order_list, f"Item {index}", None, 1)
+        order.add(f"Item {index}", None, 1)
+    target = f"Item {lines - 1}"
+    started = time.perf_counter()
+    for _ in range(repeats):
+        list_add(order_list, target, None, 1)
+    old = (time.perf_counter() - started) / repeats
+    started = time.perf_counter()
+    for _ in range(repeats):
+        order.add(target, None, 1)
+    new = (time.perf_counter() - started) / repeats
+    return old, new
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=5000, help='Concurrent sessions to hold.')
+    parser.add_argument('--messages', type=int, default=200, help='Chat messages per session.')
+    args = parser.parse_args()
+
+    print(f"{args.sessions:,} sessions x {args.messages} messages")
+    old = measure(build_old, args.sessions, args.messages)
+    new = measure(build_new, args.sessions, args.messages)
+    print(f"  lists of dicts  {old / 2**20:8.1f} MiB  ({old / args.sessions:8,.0f} bytes/session)")
+    print(f"  session store   {new / 2**20:8.1f} MiB  ({new / args.sessions:8,.0f} bytes/session, "
+          f"history capped at {SessionStore().history_limit} messages)")
+
+    print("\nAdding to the last line of an order")
+    for lines in (5, 50, 500):
+        old_add, new_add = time_updates(lines)
+        print(f"  {lines:>4} lines: list scan {old_add * 1e6:7.2f} us   indexed {new_add * 1e6:5.2f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Import-time and startup benchmark for ai_logic and the Streamlit app.
+
+Every measurement runs in a fresh interpreter, so nothing is already imported:
+1. import ai_logic (everything lazy).
+2. import ai_logic + warm_up(), i.e. what importing used to cost up front.
+3. The first order request with and without a finished warm-up, against the
+   local stub server (scripts/stub_openai_server.py) with a fixed latency.
+4. The first render of app.py, using Streamlit's AppTest harness.
+
+Usage: python scripts/benchmark_startup.py [--runs 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__)) # For the stub server
+from stub_openai_server import StubBackend, start_stub_server
+
+# Anything that touches the database works on a scratch copy of menu.db
+SCRATCH_DB = """
+import shutil, tempfile
+from src.ai_drive_thru import db_utils
+db_utils.DB_FILE = shutil.copy("menu.db", tempfile.mkdtemp())
+"""
+
+MEASUREMENTS = {
+    "import ai_logic": """
+import time
+started = time.perf_counter()
+import ai_logic
+print(time.perf_counter() - started)
+""",
+    "import + warm_up()": SCRATCH_DB + """
+import time
+started = time.perf_counter()
+import ai_logic
+ai_logic.warm_up()
+print(time.perf_counter() - started)
+""",
+    "first order, cold": SCRATCH_DB + """
+import time
+import ai_logic
+ai_logic.USE_FAST_ORDER_PARSER = False
+ai_logic.USE_RESPONSE_CACHE = False
+started = time.perf_counter()
+ai_logic.get_order_from_text("could I get a cheeseburger")
+print(time.perf_counter() - started)
+""",
+    "first order, warmed up": SCRATCH_DB + """
+import time
+import ai_logic
+ai_logic.USE_FAST_ORDER_PARSER = False
+ai_logic.USE_RESPONSE_CACHE = False
+ai_logic.warm_up(connect=True)
+started = time.perf_counter()
+ai_logic.get_order_from_text("could I get a cheeseburger")
+print(time.perf_counter() - started)
+""",
+    "app.py first render": SCRATCH_DB + """
+import time
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+AppTest.from_file("app.py", default_timeout=60).run()
+print(time.perf_counter() - started)
+""",
+}
+
+def run_measurement(code, env):
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, timeout=300)
+    lines = [line for line in result.stdout.strip().splitlines() if line.strip()]
+    try:
+        return float(lines[-1])
+    except (IndexError, ValueError):
+        print(f"    failed: {(result.stderr or result.stdout).strip().splitlines()[-1:]}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters per measurement.')
+    parser.add_argument('--llm-ms', type=float, default=300.0, help='Fixed stub latency for the order request.')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(backend=StubBackend({"OrderTaker": f"fixed:{args.llm_ms}"}))
+    env = dict(os.environ, OPENAI_BASE_URL=base_url, OPENAI_API_KEY="stub")
+    print(f"Stub server at {base_url} (OrderTaker {args.llm_ms:.0f} ms), {args.runs} runs each\n")
+    for name, code in MEASUREMENTS.items():
+        values = [value for value in (run_measurement(code, env) for _ in range(args.runs)) if value is not None]
+        if values:
+            print(f"  {name:24s} median {statistics.median(values) * 1000:8.1f} ms   min {min(values) * 1000:8.1f} ms")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
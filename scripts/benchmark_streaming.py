@@ -0,0 +1,107 @@
+"""Time-to-first-action benchmark for the streaming OrderTaker.
+
+Replays a canned OrderTaker response as a simulated token stream (a fixed
+delay per token, like a model generating at a steady rate) and compares when
+the first action reaches the caller with streaming against waiting for the
+whole completion, as get_order_from_text_async does.
+
+Needs no API key: the kernel is replaced with a local stand-in.
+
+Usage: python scripts/benchmark_streaming.py [--tokens-per-second 60] [--runs 5]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+os.environ.setdefault("OPENAI_API_KEY", "benchmark") # Any value works; ai_logic only needs one to build its client
+from src.ai_drive_thru import db_utils
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), '..', 'menu.db')
+RESPONSE = json.dumps({
+    "status": "success",
+    "actions": [
+        {"action": "add", "item": "Cheeseburger", "quantity": 2},
+        {"action": "add", "item": "Fries", "quantity": 1},
+        {"action": "add", "item": "Soda", "quantity": 2, "details": "Cola"},
+        {"action": "remove", "item": "Salad", "quantity": 1},
+    ],
+    "message": "Okay, I've added 2 Cheeseburgers, a Fries and 2 Cola Sodas, and removed the Salad.",
+})
+CHARS_PER_TOKEN = 4 # Rough average for JSON output
+
+class StreamedChunk:
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+class SimulatedKernel:
+    """Stands in for the Semantic Kernel, generating RESPONSE at a fixed token rate."""
+
+    def __init__(self, tokens_per_second):
+        self.delay = 1.0 / tokens_per_second
+
+    async def _generate(self):
+        for i in range(0, len(RESPONSE), CHARS_PER_TOKEN):
+            await asyncio.sleep(self.delay)
+            yield RESPONSE[i:i + CHARS_PER_TOKEN]
+
+    async def invoke_stream(self, function, arguments=None):
+        async for text in self._generate():
+            yield [StreamedChunk(text)]
+
+    async def invoke(self, function, arguments=None):
+        return "".join([text async for text in self._generate()])
+
+async def measure_streaming(ai_logic):
+    started = time.perf_counter()
+    first_action = None
+    async for event in ai_logic.stream_order_from_text_async("the usual for the whole car"):
+        if event["type"] == "action" and first_action is None:
+            first_action = time.perf_counter() - started
+    return first_action, time.perf_counter() - started
+
+async def measure_blocking(ai_logic):
+    started = time.perf_counter()
+    await ai_logic.get_order_from_text_async("the usual for the whole car")
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed # The first action arrives with everything else
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens-per-second', type=float, default=60.0, help='Simulated generation speed.')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per mode.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_utils.DB_FILE = os.path.join(tmp_dir, 'menu.db')
+        shutil.copyfile(SOURCE_DB, db_utils.DB_FILE)
+        import ai_logic
+        ai_logic.kernel = SimulatedKernel(args.tokens_per_second)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai_logic.warm_up() # Parse prompts etc. before timing anything
+        ai_logic.USE_RESPONSE_CACHE = False # Every run should pay for generation
+
+        print(f"{len(RESPONSE) // CHARS_PER_TOKEN} tokens at {args.tokens_per_second:.0f} tokens/sec, {args.runs} runs")
+        for name, measure in (("full completion", measure_blocking), ("streaming", measure_streaming)):
+            firsts, totals = [], []
+            for _ in range(args.runs):
+                with contextlib.redirect_stdout(io.StringIO()): # ai_logic logs every response
+                    first, total = asyncio.run(measure(ai_logic))
+                firsts.append(first)
+                totals.append(total)
+            print(f"  {name:16s} first action {sum(firsts) / len(firsts) * 1000:7.1f} ms   "
+                  f"complete {sum(totals) / len(totals) * 1000:7.1f} ms")
+        db_utils.close_db_connections()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Latency benchmark for the chunked, overlapped voice order pipeline.
+
+Synthesizes a recording of several spoken phrases separated by pauses and
+compares the old voice path (transcribe the whole file, then run the
+OrderTaker on the full transcript) with the pipeline (split at pauses,
+transcribe utterances concurrently, parse each as soon as it is back).
+
+Needs no API key: transcription uses StubTranscriptionBackend and the
+OrderTaker a simulated kernel, both with configurable latency.
+
+Usage: python scripts/benchmark_voice_pipeline.py [--utterances 3] [--llm-seconds 0.8]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+os.environ.setdefault("OPENAI_API_KEY", "benchmark") # Any value works; ai_logic only needs one to build its client
+from src.ai_drive_thru import db_utils
+from src.ai_drive_thru.voice_pipeline import encode_wav, StubTranscriptionBackend
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), '..', 'menu.db')
+SAMPLE_RATE = 16000
+PHRASES = ["I'd go with the cheeseburger thing", "and whatever fries you've got", "oh and a vanilla shake I guess"]
+ACTIONS = [
+    {"action": "add", "item": "Cheeseburger", "quantity": 1},
+    {"action": "add", "item": "Fries", "quantity": 1},
+    {"action": "add", "item": "Milkshake", "quantity": 1, "details": "Vanilla"},
+]
+
+def synthesize_recording(utterances, speech_seconds=1.5, pause_seconds=0.7):
+    """Tone bursts standing in for speech, separated by low background noise."""
+    rng = random.Random(7)
+    samples = []
+    for index in range(utterances):
+        samples += [rng.randint(-60, 60) for _ in range(int(SAMPLE_RATE * pause_seconds))]
+        frequency = 180 + 40 * index
+        samples += [int(6000 * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE)) for i in range(int(SAMPLE_RATE * speech_seconds))]
+    samples += [rng.randint(-60, 60) for _ in range(int(SAMPLE_RATE * pause_seconds))]
+    return encode_wav(struct.pack(f"<{len(samples)}h", *samples), SAMPLE_RATE, 1)
+
+class StreamedChunk:
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+class SimulatedKernel:
+    """Answers every OrderTaker call with the actions for the phrases it was given."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def _response(self, arguments):
+        text = str(arguments["input"])
+        actions = [action for phrase, action in zip(PHRASES, ACTIONS) if phrase in text]
+        return json.dumps({"status": "success", "actions": actions, "message": "Okay."})
+
+    async def invoke_stream(self, function, arguments=None):
+        response = self._response(arguments)
+        pieces = 10
+        step = max(1, len(response) // pieces)
+        for i in range(0, len(response), step):
+            await asyncio.sleep(self.seconds / pieces)
+            yield [StreamedChunk(response[i:i + step])]
+
+    async def invoke(self, function, arguments=None):
+        await asyncio.sleep(self.seconds)
+        return self._response(arguments)
+
+async def measure_sequential(ai_logic, wav_bytes, backend):
+    """The old path: one upload for the whole recording, then one OrderTaker call."""
+    started = time.perf_counter()
+    transcript = await backend.transcribe(wav_bytes)
+    await ai_logic.get_order_from_text_async(transcript)
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+async def measure_pipeline(ai_logic, wav_bytes, backend):
+    started = time.perf_counter()
+    first_action = None
+    async for event in ai_logic.stream_voice_order_async(wav_bytes, backend):
+        if event["type"] == "action" and first_action is None:
+            first_action = time.perf_counter() - started
+    return first_action, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--utterances', type=int, default=3, help='Phrases in the recording (up to 3).')
+    parser.add_argument('--transcribe-seconds', type=float, default=0.3, help='Fixed transcription latency per request.')
+    parser.add_argument('--seconds-per-audio-second', type=float, default=0.15, help='Transcription time per second of audio.')
+    parser.add_argument('--llm-seconds', type=float, default=0.8, help='Simulated OrderTaker latency.')
+    args = parser.parse_args()
+
+    utterances = max(1, min(args.utterances, len(PHRASES)))
+    wav_bytes = synthesize_recording(utterances)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_utils.DB_FILE = os.path.join(tmp_dir, 'menu.db')
+        shutil.copyfile(SOURCE_DB, db_utils.DB_FILE)
+        import ai_logic
+        ai_logic.kernel = SimulatedKernel(args.llm_seconds)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai_logic.warm_up() # Parse prompts etc. before timing anything
+        ai_logic.USE_RESPONSE_CACHE = False
+
+        print(f"{utterances} utterance(s), transcription {args.transcribe_seconds:.2f}s + "
+              f"{args.seconds_per_audio_second:.2f}s/audio-s, OrderTaker {args.llm_seconds:.2f}s")
+        for name, measure, transcripts in (
+            ("whole recording", measure_sequential, [" ".join(PHRASES[:utterances])]),
+            ("pipeline", measure_pipeline, PHRASES[:utterances]),
+        ):
+            backend = StubTranscriptionBackend(transcripts, args.transcribe_seconds, args.seconds_per_audio_second)
+            with contextlib.redirect_stdout(io.StringIO()): # ai_logic logs every response
+                first, total = asyncio.run(measure(ai_logic, wav_bytes, backend))
+            print(f"  {name:16s} first action {first * 1000:7.1f} ms   complete {total * 1000:7.1f} ms")
+        db_utils.close_db_connections()
+
+if __name__ == "__main__":
+    main()
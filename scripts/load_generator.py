@@ -0,0 +1,175 @@
+"""End-to-end load generator for the order flow, run against the local stub server.
+
+Each lane replays realistic order scripts (several utterances, then a
+confirmation) through ai_logic and db_utils exactly as the kiosk does:
+get_order_from_text_async per utterance, then reserve_order,
+get_confirmation_message_async and commit_order. Lanes run concurrently on
+ai_logic's background loop. Reports throughput and p50/p95/p99 per stage.
+
+Unless --base-url is given, a stub OpenAI server (scripts/stub_openai_server.py)
+is started in-process, so no API key or money is needed. The fast path and
+response cache are off by default so every utterance exercises the LLM path;
+turn them on to measure their effect.
+
+OrderTaker calls go through ai_logic's request policy (deadline, retries and a
+hedge to the fallback model); --no-hedge turns the hedge off to compare the
+p99 before and after. Give the stub a slow tail and a faster fallback model to
+see the difference, e.g. --latency OrderTaker=lognormal:900,0.6
+--model-latency gpt-4o-mini=lognormal:400,0.25.
+
+Usage: python scripts/load_generator.py [--lanes 16] [--seconds 20] [--fast-path] [--cache] [--no-hedge] [--hedge-delay-ms 1500]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+sys.path.insert(0, os.path.dirname(__file__)) # For the stub server
+from stub_openai_server import add_stub_arguments, backend_from_args, start_stub_server
+from src.ai_drive_thru.order_state import Order, apply_order_action
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), '..', 'menu.db')
+STARTING_STOCK = 1_000_000 # Per item, so stock never runs out mid-run
+
+# Utterances as customers actually say them: greetings, hesitation, corrections.
+ORDER_SCRIPTS = [
+    ["hi there", "can I get two cheeseburgers and a fries", "and a vanilla milkshake"],
+    ["hello", "I'll have a veggie burger please", "actually make that two veggie burgers", "and a salad"],
+    ["um let me get three cheeseburgers", "no wait remove one cheeseburger", "plus two fries"],
+    ["could I get a chicken sandwich and a soda", "oh and a fries too"],
+    ["two milkshakes", "what else do you have", "add a salad then"],
+    ["one cheeseburger", "that's it"],
+]
+
+STAGES = ["order_taker", "reserve", "confirmation", "commit", "session"]
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+async def lane(ai_logic, db_utils, seed, stop_at, timings, errors):
+    rng = random.Random(seed)
+
+    async def timed(stage, coro):
+        started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[stage].append(time.perf_counter() - started)
+
+    while time.perf_counter() < stop_at:
+        session_started = time.perf_counter()
+        order = Order()
+        for utterance in rng.choice(ORDER_SCRIPTS):
+            result = await timed("order_taker", ai_logic.get_order_from_text_async(utterance))
+            if "error" in result:
+                errors["order_taker"] += 1
+                continue
+            for action in result.get("actions", []):
+                apply_order_action(order, action) # As app.py does
+        if not order:
+            continue
+
+        reservation = await timed("reserve", asyncio.to_thread(db_utils.reserve_order, order.to_list()))
+        if not reservation["success"]:
+            errors["reserve"] += 1
+            continue
+        confirmation = await timed("confirmation", ai_logic.get_confirmation_message_async(order.to_list()))
+        if "error" in confirmation:
+            errors["confirmation"] += 1
+            await asyncio.to_thread(db_utils.release_order, reservation["reservation_id"])
+            continue
+        await timed("commit", asyncio.to_thread(db_utils.commit_order, reservation["reservation_id"]))
+        timings["session"].append(time.perf_counter() - session_started)
+
+async def run_lanes(ai_logic, db_utils, lanes, seconds):
+    timings = {stage: [] for stage in STAGES}
+    errors = {stage: 0 for stage in STAGES}
+    stop_at = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(lane(ai_logic, db_utils, seed, stop_at, timings, errors) for seed in range(lanes)))
+    return timings, errors, time.perf_counter() - started
+
+def prepare_db(tmp_dir):
+    db_path = os.path.join(tmp_dir, 'menu.db')
+    shutil.copyfile(SOURCE_DB, db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE menu_items SET quantity = ?", (STARTING_STOCK,))
+    conn.commit()
+    conn.close()
+    return db_path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lanes', type=int, default=16, help='Concurrent drive-thru lanes.')
+    parser.add_argument('--seconds', type=float, default=20.0, help='How long to generate load.')
+    parser.add_argument('--base-url', help='OpenAI-compatible endpoint to use instead of the in-process stub.')
+    parser.add_argument('--fast-path', action='store_true', help='Enable the local fast-path order parser.')
+    parser.add_argument('--cache', action='store_true', help='Enable the LLM response cache.')
+    parser.add_argument('--llm-confirmation', action='store_true', help='Have the Confirmer LLM write confirmations.')
+    parser.add_argument('--no-hedge', action='store_true', help='Don\'t hedge slow OrderTaker calls with the fallback model.')
+    parser.add_argument('--hedge-delay-ms', type=float, help='Hedge OrderTaker calls slower than this (default: LLM_HEDGE_DELAY_MS).')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        server, base_url = start_stub_server(backend=backend_from_args(args))
+        os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = base_url # Read when ai_logic builds its client
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        from src.ai_drive_thru import db_utils
+        db_utils.DB_FILE = prepare_db(tmp_dir)
+        import ai_logic
+        ai_logic.USE_FAST_ORDER_PARSER = args.fast_path
+        ai_logic.USE_RESPONSE_CACHE = args.cache
+        if args.cache:
+            ai_logic.response_cache = ai_logic.ResponseCache(db_path=None) # Don't touch the real cache file
+        ai_logic.USE_LLM_CONFIRMATION = args.llm_confirmation
+        ai_logic.USE_HEDGED_REQUESTS = not args.no_hedge
+        if args.hedge_delay_ms is not None:
+            ai_logic.ORDER_TAKER_POLICY = ai_logic.RequestPolicy(
+                deadline_seconds=ai_logic.ORDER_TAKER_POLICY.deadline_seconds,
+                hedge_delay_seconds=args.hedge_delay_ms / 1000,
+                max_retries=ai_logic.ORDER_TAKER_POLICY.max_retries,
+            )
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai_logic.warm_up(connect=True) # Lazy initialization shouldn't count against the first requests
+
+        print(f"{args.lanes} lanes x {args.seconds:.0f}s against {base_url} "
+              f"(fast path {'on' if args.fast_path else 'off'}, cache {'on' if args.cache else 'off'}, "
+              f"LLM confirmation {'on' if args.llm_confirmation else 'off'}, "
+              f"hedge {'off' if args.no_hedge else f'after {ai_logic.ORDER_TAKER_POLICY.hedge_delay_seconds * 1000:.0f} ms'})")
+        with contextlib.redirect_stdout(io.StringIO()): # ai_logic and db_utils log every step
+            timings, errors, elapsed = ai_logic.run_sync(run_lanes(ai_logic, db_utils, args.lanes, args.seconds))
+
+        print(f"\n{'stage':>13} {'count':>7} {'per sec':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for stage in STAGES:
+            values = sorted(timings[stage])
+            print(f"{stage:>13} {len(values):>7,} {len(values) / elapsed:>8.1f} "
+                  f"{percentile(values, 50) * 1000:>8.1f} {percentile(values, 95) * 1000:>8.1f} "
+                  f"{percentile(values, 99) * 1000:>8.1f} {errors[stage]:>7}")
+        policy_stats = ai_logic.get_order_taker_stats()
+        print(f"\nOrderTaker policy: {policy_stats['calls']} answered, hedged {policy_stats['hedge_rate']:.1%}, "
+              f"hedge won {policy_stats['hedge_win_rate']:.1%} of those, {policy_stats['retries']} retries, "
+              f"{policy_stats['timeouts']} timeouts, {policy_stats['failures']} failures, "
+              f"p50 {policy_stats['p50_ms']:.0f} ms, p99 {policy_stats['p99_ms']:.0f} ms")
+        if server is not None:
+            print(f"\nStub requests served: {server.RequestHandlerClass.backend.request_counts}")
+            server.shutdown()
+        db_utils.close_db_connections()
+
+if __name__ == "__main__":
+    main()
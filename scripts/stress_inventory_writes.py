@@ -0,0 +1,172 @@
+"""Multi-process stress test for the stock write path.
+
+Runs N worker processes against a scratch copy of menu.db (one process per
+Streamlit/service worker in production). Each worker drives its own inventory
+writer with change_item_quantity(): mostly sales of 1-3 units of a few hot
+items, with the odd restock, so items repeatedly run down to zero and the
+never-below-zero guard is exercised. With --lock-holder-ms, another process
+keeps taking the write lock for longer than the writers' busy_timeout, so
+the busy retry/backoff path is exercised too.
+
+Afterwards it checks that stock is conserved: every item's final quantity is
+its starting quantity plus the changes workers saw succeed, no quantity went
+negative, and the ledger still reconciles. It also reports throughput for each
+process count and fails if it drops below --min-throughput-ratio of the
+single-process rate. Exits non-zero on any violation.
+
+Usage: python scripts/stress_inventory_writes.py [--processes 1,2,4,8] [--ops 2000] [--lock-holder-ms 0]
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..')) # Repo root for src imports
+from src.ai_drive_thru import db_utils
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), '..', 'menu.db')
+HOT_ITEMS = ["Cheeseburger", "Fries", "Soda"]
+STARTING_STOCK = 200 # Low enough that items sell out during a run
+RESTOCK_PROBABILITY = 0.02
+RESTOCK_QUANTITY = 50
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+def worker(args):
+    """Performs `ops` stock changes; returns the applied changes per item, result codes, latencies, writer stats and finish time."""
+    db_file, ops, seed, start_at = args
+    db_utils.DB_FILE = db_file
+    rng = random.Random(seed)
+    applied = Counter()
+    results = Counter()
+    latencies = []
+    time.sleep(max(0.0, start_at - time.time())) # Start all workers together
+    with contextlib.redirect_stdout(io.StringIO()): # db_utils prints every failed change
+        for _ in range(ops):
+            item = rng.choice(HOT_ITEMS)
+            change = RESTOCK_QUANTITY if rng.random() < RESTOCK_PROBABILITY else -rng.randint(1, 3)
+            started = time.perf_counter()
+            update = db_utils.change_item_quantity(item, change, reason="sale" if change < 0 else "reorder",
+                                                   reference=f"stress:{os.getpid()}")
+            latencies.append(time.perf_counter() - started)
+            results[update.result] += 1
+            if update.ok:
+                applied[item] += change
+                if update.quantity < 0:
+                    results["negative"] += 1
+    finished_at = time.time()
+    stats = dict(db_utils.inventory_writer.stats)
+    db_utils.inventory_writer.stop()
+    db_utils.close_db_connections()
+    return applied, results, latencies, stats, finished_at
+
+def lock_holder(db_file, hold_ms, start_at, stop_at):
+    """Repeatedly holds the write lock for hold_ms, like a long transaction in another process."""
+    conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    time.sleep(max(0.0, start_at - time.time()))
+    while time.time() < stop_at:
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(hold_ms / 1000)
+        conn.execute("COMMIT")
+        time.sleep(hold_ms / 1000) # Let the writers through in between
+    conn.close()
+
+def run(processes, ops, lock_hold_ms, seed):
+    """One run with `processes` workers on a fresh scratch database; returns (ok, ops/s, summary line)."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'menu.db')
+        shutil.copyfile(SOURCE_DB, db_file)
+        db_utils.DB_FILE = db_file
+        with contextlib.redirect_stdout(io.StringIO()):
+            for item in HOT_ITEMS:
+                current = db_utils.get_item_quantity(item)
+                db_utils.change_item_quantity(item, STARTING_STOCK - current)
+        before = db_utils.get_item_quantities(HOT_ITEMS)
+        db_utils.inventory_writer.stop()
+        db_utils.close_db_connections()
+
+        context = multiprocessing.get_context("spawn")
+        start_at = time.time() + 1.0 + 0.2 * processes # Time for the workers to start up
+        holder = None
+        if lock_hold_ms:
+            holder = context.Process(target=lock_holder, args=(db_file, lock_hold_ms, start_at, start_at + 3600))
+            holder.start()
+        with context.Pool(processes) as pool:
+            outcome = pool.map_async(worker, [(db_file, ops, seed + index, start_at) for index in range(processes)])
+            results_per_worker = outcome.get()
+        if holder is not None:
+            holder.terminate()
+            holder.join()
+
+        applied, results, latencies, stats = Counter(), Counter(), [], Counter()
+        elapsed = max(finished_at for *_, finished_at in results_per_worker) - start_at
+        for worker_applied, worker_results, worker_latencies, worker_stats, _ in results_per_worker:
+            applied.update(worker_applied)
+            results.update(worker_results)
+            latencies.extend(worker_latencies)
+            stats.update(worker_stats)
+
+        after = db_utils.get_item_quantities(HOT_ITEMS)
+        problems = []
+        for item in HOT_ITEMS:
+            expected = before[item] + applied[item]
+            if after[item] != expected:
+                problems.append(f"{item}: {after[item]} in stock, expected {before[item]} + {applied[item]} = {expected}")
+            if after[item] < 0:
+                problems.append(f"{item}: negative stock {after[item]}")
+        if results["negative"]:
+            problems.append(f"{results['negative']} change(s) reported a negative quantity")
+        mismatches = db_utils.reconcile_inventory()
+        if mismatches:
+            problems.append(f"ledger does not reconcile: {mismatches}")
+        if results[db_utils.STOCK_ERROR]:
+            problems.append(f"{results[db_utils.STOCK_ERROR]} change(s) failed with a database error")
+        db_utils.close_db_connections()
+
+    latencies.sort()
+    total = processes * ops
+    summary = (f"{processes:>9} {total / elapsed:>8,.0f} {percentile(latencies, 50) * 1000:>8.2f} {percentile(latencies, 99) * 1000:>8.2f}"
+               f" {results[db_utils.STOCK_OK]:>7} {results[db_utils.STOCK_INSUFFICIENT]:>8} {results[db_utils.STOCK_BUSY]:>5}"
+               f" {stats['busy_retries']:>8} {stats['work'] / max(1, stats['batches']):>6.1f}")
+    for problem in problems:
+        summary += f"\n    FAIL {problem}"
+    return not problems, total / elapsed, summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', default='1,2,4,8', help='Comma-separated worker process counts to run.')
+    parser.add_argument('--ops', type=int, default=2000, help='Stock changes per worker process.')
+    parser.add_argument('--lock-holder-ms', type=int, default=0,
+                        help='Run a process that holds the write lock this long, repeatedly (try 1500 to exceed the busy_timeout).')
+    parser.add_argument('--min-throughput-ratio', type=float, default=0.5,
+                        help='Fail if a run is slower than this fraction of the single-process rate.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'processes':>9} {'ops/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'ok':>7} {'no stock':>8} {'busy':>5} {'retries':>8} {'batch':>6}")
+    passed = True
+    baseline = None
+    for processes in [int(count) for count in args.processes.split(',')]:
+        ok, rate, summary = run(processes, args.ops, args.lock_holder_ms, args.seed)
+        baseline = baseline or rate
+        if rate < baseline * args.min_throughput_ratio:
+            summary += f"\n    FAIL throughput {rate:,.0f} ops/s is below {args.min_throughput_ratio:.0%} of {baseline:,.0f} ops/s"
+            ok = False
+        print(summary)
+        passed = passed and ok
+    print("\nStock conserved in every run." if passed else "\nFAILED")
+    sys.exit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""Local OpenAI-compatible stand-in server for offline load tests and demos.
+
+Serves /v1/chat/completions (plain and streamed), /v1/audio/transcriptions and
+/v1/models. Each request is identified as OrderTaker, Confirmer,
+AdminManager or AIChef from the rendered prompt and answered with a canned response
+after a delay drawn from that stage's latency distribution.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1 (any
+OPENAI_API_KEY value works). ai_logic's kernel and app.py's client both honour it.
+
+--model-latency gives requests for one model (e.g. a hedge's fallback model)
+their own distribution for every stage, and --error-rate answers that share of
+chat completions with a 503, to exercise retries.
+
+Latency specs are in milliseconds: fixed:800, uniform:500,1200, normal:800,150
+or lognormal:800,0.35 (median, sigma). Canned responses can be overridden with
+a JSON file: {"OrderTaker": {"<regex on the user input>": {...response...}}, ...}.
+
+Usage: python scripts/stub_openai_server.py [--port 8765] [--latency OrderTaker=lognormal:900,0.35] [--responses FILE]
+       [--model-latency gpt-4o-mini=lognormal:400,0.25] [--error-rate 0.02]
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STAGES = ["OrderTaker", "Confirmer", "AdminManager", "AIChef", "transcription"]
+DEFAULT_LATENCIES = {
+    "OrderTaker": "lognormal:900,0.35",
+    "Confirmer": "lognormal:600,0.3",
+    "AdminManager": "lognormal:700,0.3",
+    "AIChef": "lognormal:1500,0.3",
+    "transcription": "lognormal:500,0.3",
+}
+FIRST_TOKEN_SHARE = 0.3 # Streamed responses: this share of the latency passes before the first token
+STREAM_CHUNK_CHARS = 8
+DEFAULT_TRANSCRIPTS = ["two cheeseburgers and a large fries", "and a vanilla milkshake please"]
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+
+class LatencyDistribution:
+    """Samples delays in seconds from a spec such as 'lognormal:800,0.35' (milliseconds)."""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        values = [float(value) for value in params.split(",") if value.strip()]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"Invalid latency spec '{spec}'. Use fixed:MS, uniform:LO,HI, normal:MEAN,SD or lognormal:MEDIAN,SIGMA.")
+        self.kind, self.values = kind, values
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                ms = self.values[0]
+            elif self.kind == "uniform":
+                ms = self._rng.uniform(*self.values)
+            elif self.kind == "normal":
+                ms = self._rng.gauss(*self.values)
+            else:
+                ms = self.values[0] * math.exp(self._rng.gauss(0.0, self.values[1]))
+        return max(ms, 0.0) / 1000
+
+class StubBackend:
+    """Canned answers and latencies for each stage, plus request counters."""
+
+    def __init__(self, latencies=None, responses=None, transcripts=None, model="gpt-4o", model_latencies=None, error_rate=0.0):
+        specs = dict(DEFAULT_LATENCIES, **(latencies or {}))
+        self.latencies = {stage: LatencyDistribution(spec) for stage, spec in specs.items()}
+        self.model_latencies = {name: LatencyDistribution(spec) for name, spec in (model_latencies or {}).items()}
+        self.error_rate = error_rate
+        self._error_rng = random.Random()
+        self.responses = responses or {}
+        self.model = model
+        self._transcripts = itertools.cycle(transcripts or DEFAULT_TRANSCRIPTS)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.request_counts = {stage: 0 for stage in STAGES}
+
+    def next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def count(self, stage: str) -> None:
+        with self._lock:
+            self.request_counts[stage] = self.request_counts.get(stage, 0) + 1
+
+    def delay_for(self, stage: str, model: str) -> float:
+        return (self.model_latencies.get(model) or self.latencies[stage]).sample()
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._error_rng.random() < self.error_rate
+
+    def next_transcript(self) -> str:
+        with self._lock:
+            return next(self._transcripts)
+
+    # --- Canned chat responses ---
+    @staticmethod
+    def identify_stage(prompt: str) -> str:
+        if "confirming a drive-thru order" in prompt:
+            return "Confirmer"
+        if "restaurant manager manage inventory" in prompt:
+            return "AdminManager"
+        if "AI Chef assistant" in prompt:
+            return "AIChef"
+        return "OrderTaker"
+
+    @staticmethod
+    def _section(prompt: str, start: str, end: str) -> str:
+        match = re.search(re.escape(start) + r"(.*?)" + re.escape(end), prompt, re.S)
+        return match.group(1).strip() if match else ""
+
+    def _override(self, stage: str, user_input: str):
+        for pattern, response in self.responses.get(stage, {}).items():
+            if re.search(pattern, user_input, re.I):
+                return response
+        return None
+
+    def respond(self, stage: str, prompt: str) -> str:
+        """Returns the response text for a rendered prompt."""
+        if stage == "OrderTaker":
+            user_input = self._section(prompt, "**User Request:**", "**Instructions:**")
+            response = self._override(stage, user_input) or self._order_taker(user_input, self._section(prompt, "**Menu:**", "**User Request:**"))
+        elif stage == "AdminManager":
+            user_input = self._section(prompt, "USER INPUT:", "RESPONSE FORMAT:")
+            response = self._override(stage, user_input) or self._admin_manager(user_input, self._section(prompt, "AVAILABLE INVENTORY:", "COMMANDS:"))
+        elif stage == "AIChef":
+            response = self._override(stage, prompt) or self._ai_chef(prompt)
+        else:
+            order_json = self._section(prompt, "```json", "```")
+            response = self._override(stage, order_json) or self._confirmer(order_json)
+        return response if isinstance(response, str) else json.dumps(response)
+
+    @staticmethod
+    def _menu_names(menu_text: str):
+        names = []
+        for line in menu_text.splitlines():
+            match = re.match(r"\s*-\s*(.+?):", line)
+            if match:
+                names.append(match.group(1).strip())
+        return names
+
+    @staticmethod
+    def _mentions(text: str, name: str):
+        """Returns the quantity if name (or its plural) appears in text, else None."""
+        match = re.search(r"(?:(\d+|" + "|".join(NUMBER_WORDS) + r")\s+)?(?:\w+\s+)?" + re.escape(name.lower()) + r"(?:e?s)?\b", text)
+        if not match:
+            return None
+        number = match.group(1)
+        return int(number) if number and number.isdigit() else NUMBER_WORDS.get(number, 1)
+
+    def _order_taker(self, user_input: str, menu_text: str):
+        text = user_input.lower()
+        action = "remove" if re.search(r"\b(remove|take off|cancel|no more)\b", text) else "add"
+        actions = []
+        for name in self._menu_names(menu_text):
+            quantity = self._mentions(text, name)
+            if quantity:
+                actions.append({"action": action, "item": name, "quantity": quantity})
+        if not actions:
+            return {"status": "not_an_order", "message": "Hello! What can I get started for you?"}
+        verb = "added" if action == "add" else "removed"
+        listed = ", ".join(f"{a['quantity']} {a['item']}" for a in actions)
+        return {"status": "success", "actions": actions, "message": f"Okay, I've {verb} {listed}."}
+
+    def _admin_manager(self, user_input: str, inventory_text: str):
+        names = self._menu_names(inventory_text) or re.findall(r"^\s*-\s*(.+?)\s*\(", inventory_text, re.M)
+        actions = []
+        for clause in re.split(r"\s*(?:,|;|\band\b)\s*", user_input.lower()):
+            for name in names:
+                if name.lower() in clause:
+                    quantity = re.search(r"\b(\d+)\b", clause)
+                    if quantity and (actions or re.search(r"\b(order|add|restock|buy)\b", clause)):
+                        actions.append({"action": "order", "item_name": name, "quantity_ordered": int(quantity.group(1)),
+                                        "message": f"Ordered {quantity.group(1)} more {name}."})
+                    else:
+                        actions.append({"action": "query_stock", "item_name": name, "message": f"Let me check the stock of {name}."})
+                    break
+        if not actions:
+            message = "Okay, which items do you need more of and how many?"
+            return {"actions": [{"action": "inform", "message": message}], "message": message}
+        ordered = [f"{a['quantity_ordered']} {a['item_name']}" for a in actions if a["action"] == "order"]
+        message = f"Okay, I've ordered {', '.join(ordered)}." if ordered else actions[0]["message"]
+        return {"actions": actions, "message": message}
+
+    @staticmethod
+    def _ai_chef(prompt: str) -> str:
+        top_sellers = re.search(r"^Top sellers \(units\): (.+)$", prompt, re.M)
+        best = top_sellers.group(1).split(",")[0].rsplit(" ", 1)[0] if top_sellers else "your best seller"
+        return (f"Build a combo around {best}: pair it with the item most often bought with it at a small discount, "
+                f"and feature it during the busiest hours. Restock anything listed as low stock before the next rush.")
+
+    @staticmethod
+    def _confirmer(order_json: str) -> str:
+        try:
+            lines = json.loads(order_json)
+            listed = ", ".join(f"{line.get('quantity', 1)} {line.get('item')}" for line in lines)
+        except (ValueError, TypeError, AttributeError):
+            listed = "your items"
+        return f"Okay, just to confirm, you have: {listed}. Does that look right?"
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the OpenAI API
+    backend: StubBackend = None # Set on the server-specific subclass
+
+    def setup(self):
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Avoid Nagle/delayed-ACK stalls
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json({"object": "list", "data": [{"id": self.backend.model, "object": "model", "owned_by": "stub"}]})
+        elif self.path.rstrip("/").endswith("/stats"):
+            self._send_json(self.backend.request_counts)
+        else:
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/audio/transcriptions"):
+            self.backend.count("transcription")
+            time.sleep(self.backend.latencies["transcription"].sample())
+            self._send_json({"text": self.backend.next_transcript()})
+        elif self.path.endswith("/chat/completions"):
+            self._chat_completion(json.loads(body or b"{}"))
+        else:
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+    def _chat_completion(self, request):
+        prompt = "\n".join(str(message.get("content") or "") for message in request.get("messages", []))
+        stage = self.backend.identify_stage(prompt)
+        self.backend.count(stage)
+        model = request.get("model") or self.backend.model
+        if self.backend.should_fail():
+            self._send_json({"error": {"message": "Stub: injected server error", "type": "server_error"}}, status=503)
+            return
+        content = self.backend.respond(stage, prompt)
+        delay = self.backend.delay_for(stage, model)
+        completion_id = f"chatcmpl-stub-{self.backend.next_id()}"
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                 "total_tokens": (len(prompt) + len(content)) // 4}
+
+        if not request.get("stream"):
+            time.sleep(delay)
+            self._send_json({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)] or [""]
+        time.sleep(delay * FIRST_TOKEN_SHARE)
+        per_piece = delay * (1 - FIRST_TOKEN_SHARE) / len(pieces)
+
+        def event(choices, **extra):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": choices, **extra}
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(per_piece)
+            delta = {"content": piece}
+            if index == 0:
+                delta["role"] = "assistant"
+            event([{"index": 0, "delta": delta, "finish_reason": None}])
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event([], usage=usage)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass # Load generators drop connections at shutdown
+
+def start_stub_server(host="127.0.0.1", port=0, backend=None):
+    """Starts the stub on a daemon thread and returns (server, base_url)."""
+    handler = type("BoundStubHandler", (StubHandler,), {"backend": backend or StubBackend()})
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="stub-openai-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def parse_latency_args(values):
+    latencies = {}
+    for value in values or []:
+        stage, _, spec = value.partition("=")
+        if stage not in STAGES:
+            raise SystemExit(f"Unknown stage '{stage}'; expected one of {', '.join(STAGES)}.")
+        LatencyDistribution(spec) # Validate early
+        latencies[stage] = spec
+    return latencies
+
+def add_stub_arguments(parser):
+    parser.add_argument('--latency', action='append', metavar='STAGE=SPEC',
+                        help=f"Latency per stage, e.g. OrderTaker=lognormal:900,0.35. Defaults: {DEFAULT_LATENCIES}")
+    parser.add_argument('--responses', help='JSON file of canned responses per stage, keyed by input regex.')
+    parser.add_argument('--transcript', action='append', help='Canned transcript(s) returned in turn for audio uploads.')
+    parser.add_argument('--model-latency', action='append', metavar='MODEL=SPEC',
+                        help='Latency for every request to MODEL, e.g. gpt-4o-mini=lognormal:400,0.25.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of chat completions answered with a 503.')
+
+def backend_from_args(args):
+    responses = None
+    if args.responses:
+        with open(args.responses) as responses_file:
+            responses = json.load(responses_file)
+    model_latencies = {}
+    for value in args.model_latency or []:
+        model, _, spec = value.partition("=")
+        LatencyDistribution(spec) # Validate early
+        model_latencies[model] = spec
+    return StubBackend(parse_latency_args(args.latency), responses, args.transcript,
+                       model_latencies=model_latencies, error_rate=args.error_rate)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.host, args.port, backend_from_args(args))
+    print(f"Stub OpenAI server listening on {base_url}")
+    print(f"  export OPENAI_BASE_URL={base_url} OPENAI_API_KEY=stub")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
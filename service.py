@@ -0,0 +1,270 @@
+"""HTTP API for the drive-thru, serving many lanes from one process.
+
+Each lane (kiosk, speaker post, headset) opens a session and sends it the
+customer's text or recorded audio; the service keeps that session's order and
+hands back the OrderTaker's response. Everything runs on one event loop:
+ai_logic's coroutines await the LLM and transcription calls, and every SQLite
+query or audio job goes to ai_logic's worker threads via run_blocking(), so a
+slow query on one lane never stalls the others.
+
+Run with: uvicorn service:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+    POST /sessions                   -> {"session_id": ...}
+    POST /sessions/{id}/text         {"text": ...}; add ?stream=true for NDJSON events
+    POST /sessions/{id}/audio        raw WAV body; add ?stream=true for NDJSON events
+    GET  /sessions/{id}/order        current order, priced
+    GET  /sessions/{id}/messages     recent chat history (older messages are archived or dropped)
+    POST /sessions/{id}/confirm      reserve stock, confirm and clear the order
+    DELETE /sessions/{id}            end the session
+    POST /admin/commands             {"command": ...}
+    POST /admin/inventory-check      run the autonomous restock check now (it also runs on a schedule)
+    GET  /health
+"""
+import asyncio
+import contextlib
+import json
+import os
+from typing import Any, AsyncIterator, Dict, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import ai_logic
+from ai_logic import run_blocking
+from src.ai_drive_thru.db_utils import reserve_order, commit_order, release_order, close_db_connections
+from src.ai_drive_thru.order_state import Order, apply_order_action
+from src.ai_drive_thru.session_store import Session, SessionStore
+from src.ai_drive_thru.pricing import price_order, format_cents
+
+SESSION_IDLE_SECONDS = 15 * 60 # Sessions untouched for this long are dropped
+MAX_SESSIONS = 10000 # Beyond this the least recently used sessions are dropped
+MAX_AUDIO_BYTES = 25 * 1024 * 1024 # The transcription API's upload limit
+ADMIN_TOKEN = os.getenv("ADMIN_API_TOKEN") # When set, admin endpoints require "Authorization: Bearer <token>"
+
+# --- Sessions ---
+
+class LaneSession(Session):
+    """A session plus a lock serializing its requests.
+
+    Requests for different sessions run concurrently; two requests for the same
+    session (e.g. a retried upload) apply their actions one after the other.
+    """
+
+    __slots__ = ("lock",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = asyncio.Lock()
+
+    def busy(self) -> bool:
+        return self.lock.locked()
+
+sessions = SessionStore(LaneSession, max_sessions=MAX_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS)
+
+def error_response(message: str, status_code: int, **extra) -> JSONResponse:
+    return JSONResponse(dict(extra, error=message), status_code=status_code)
+
+def get_session(request: Request) -> Optional[LaneSession]:
+    return sessions.get(request.path_params["session_id"])
+
+async def read_json(request: Request) -> Optional[Dict[str, Any]]:
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return body if isinstance(body, dict) else None
+
+def wants_stream(request: Request) -> bool:
+    return request.query_params.get("stream", "").lower() in ("1", "true", "yes")
+
+async def priced_order(order: Order) -> Dict[str, Any]:
+    """The order as returned by the API: its lines priced and totalled."""
+    priced = await run_blocking(price_order, order.to_list())
+    return {
+        "lines": priced["lines"],
+        "total_cents": priced["total_cents"],
+        "total": format_cents(priced["total_cents"]),
+        "unknown_items": priced["unknown_items"],
+    }
+
+# --- Order Events ---
+# Text and audio both produce ai_logic's order events. Each "action" event is
+# applied to the session's order the moment it arrives and annotated with its
+# outcome ("added", "removed", "not_found"), exactly as the kiosk does.
+
+async def apply_events(session: LaneSession, events: AsyncIterator[Dict[str, Any]], text: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    async with session.lock:
+        if text is not None:
+            session.messages.append({"role": "user", "content": text})
+        async for event in events:
+            if event["type"] == "action":
+                outcome, description = apply_order_action(session.order, event["action"])
+                event = dict(event, outcome=outcome, description=description)
+            elif event["type"] == "transcript":
+                session.messages.append({"role": "user", "content": event["text"]})
+            elif event["type"] == "result":
+                result = event["result"]
+                reply = result.get("message") or result.get("error")
+                if reply:
+                    session.messages.append({"role": "assistant", "content": reply})
+            yield event
+
+async def order_response(request: Request, session: LaneSession, events: AsyncIterator[Dict[str, Any]], text: Optional[str] = None) -> Response:
+    applied = apply_events(session, events, text)
+    if wants_stream(request):
+        async def ndjson() -> AsyncIterator[bytes]:
+            async for event in applied:
+                yield (json.dumps(event) + "\n").encode("utf-8")
+            yield (json.dumps({"type": "order", "order": await priced_order(session.order)}) + "\n").encode("utf-8")
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    results, applied_actions, transcripts, errors = [], [], [], []
+    async for event in applied:
+        if event["type"] == "action":
+            applied_actions.append({"outcome": event["outcome"], "description": event["description"]})
+        elif event["type"] == "result":
+            results.append(event["result"])
+        elif event["type"] == "transcript":
+            transcripts.append(event["text"])
+        elif event["type"] == "error":
+            errors.append(event["error"])
+    body = {"results": results, "applied_actions": applied_actions, "order": await priced_order(session.order)}
+    if transcripts or errors:
+        body.update(transcripts=transcripts, errors=errors)
+    return JSONResponse(body)
+
+# --- Endpoints ---
+
+async def create_session(request: Request) -> Response:
+    session = sessions.create() # Also drops idle sessions
+    return JSONResponse({"session_id": session.session_id}, status_code=201)
+
+async def end_session(request: Request) -> Response:
+    if not sessions.discard(request.path_params["session_id"]):
+        return error_response("Session not found.", 404)
+    return Response(status_code=204)
+
+async def submit_text(request: Request) -> Response:
+    session = get_session(request)
+    if session is None:
+        return error_response("Session not found.", 404)
+    body = await read_json(request)
+    text = body.get("text") if body else None
+    if not isinstance(text, str) or not text.strip():
+        return error_response('Expected a JSON body with a non-empty "text".', 400)
+    text = text.strip()
+    return await order_response(request, session, ai_logic.stream_order_from_text_async(text), text)
+
+async def submit_audio(request: Request) -> Response:
+    session = get_session(request)
+    if session is None:
+        return error_response("Session not found.", 404)
+    wav_bytes = await request.body()
+    if not wav_bytes:
+        return error_response("Expected a WAV recording as the request body.", 400)
+    if len(wav_bytes) > MAX_AUDIO_BYTES:
+        return error_response("Recording is too large.", 413)
+    return await order_response(request, session, ai_logic.stream_voice_order_async(wav_bytes))
+
+async def get_order(request: Request) -> Response:
+    session = get_session(request)
+    if session is None:
+        return error_response("Session not found.", 404)
+    return JSONResponse({"order": await priced_order(session.order)})
+
+async def get_messages(request: Request) -> Response:
+    session = get_session(request)
+    if session is None:
+        return error_response("Session not found.", 404)
+    return JSONResponse({"messages": list(session.messages), "archived": session.messages.archived})
+
+async def confirm_order(request: Request) -> Response:
+    """Reserves the order's stock, generates the confirmation and commits it, like the kiosk's Confirm button."""
+    session = get_session(request)
+    if session is None:
+        return error_response("Session not found.", 404)
+    async with session.lock:
+        if not session.order:
+            return error_response("The order is empty.", 400)
+
+        # 1. Take the stock first, so two lanes can never confirm the last item
+        reservation = await run_blocking(reserve_order, session.order.to_list())
+        if not reservation["success"]:
+            return error_response("Some items could not be reserved.", 409, failed_lines=reservation["failed_lines"])
+
+        # 2. Confirmation message; give the stock back if it fails
+        confirmation = await ai_logic.get_confirmation_message_async(session.order.to_list())
+        if "error" in confirmation:
+            await run_blocking(release_order, reservation["reservation_id"])
+            return error_response(confirmation["error"], 502)
+
+        # 3. Finalize, record it in the order history and start a fresh order
+        order = await priced_order(session.order)
+        await run_blocking(commit_order, reservation["reservation_id"], order["lines"])
+        session.order.clear()
+        session.messages.append({"role": "assistant", "content": confirmation.get("confirmation", "")})
+    return JSONResponse({
+        "confirmation": confirmation.get("confirmation"),
+        "reservation_id": reservation["reservation_id"],
+        "order": order,
+    })
+
+def admin_denied(request: Request) -> Optional[Response]:
+    if ADMIN_TOKEN and request.headers.get("authorization") != f"Bearer {ADMIN_TOKEN}":
+        return error_response("Admin token required.", 401)
+    return None
+
+async def admin_command(request: Request) -> Response:
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    body = await read_json(request)
+    command = body.get("command") if body else None
+    if not isinstance(command, str) or not command.strip():
+        return error_response('Expected a JSON body with a non-empty "command".', 400)
+    return JSONResponse(await ai_logic.process_admin_command_async(command.strip()))
+
+async def inventory_check(request: Request) -> Response:
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    restocked = await ai_logic.inventory_check_task.run_once() # Never overlaps a scheduled run
+    if restocked is None:
+        return error_response("An inventory check is already running or failed; see the logs.", 409)
+    return JSONResponse({"restocked": restocked})
+
+async def health(request: Request) -> Response:
+    return JSONResponse({"status": "ok", "sessions": len(sessions)})
+
+# --- Application ---
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    # Build the kernel, prompts and menu snapshot before taking traffic. The
+    # OpenAI connection pool is left to fill on this loop as requests arrive.
+    await run_blocking(ai_logic.warm_up)
+    # Periodic restock on this loop; with several workers only the one holding
+    # the scheduler lock runs it
+    scheduler = asyncio.create_task(ai_logic.inventory_check_task.run_forever(ai_logic.inventory_scheduler_lock()))
+    yield
+    scheduler.cancel()
+    sessions.clear()
+    await run_blocking(close_db_connections)
+
+routes = [
+    Route("/sessions", create_session, methods=["POST"]),
+    Route("/sessions/{session_id}", end_session, methods=["DELETE"]),
+    Route("/sessions/{session_id}/text", submit_text, methods=["POST"]),
+    Route("/sessions/{session_id}/audio", submit_audio, methods=["POST"]),
+    Route("/sessions/{session_id}/order", get_order, methods=["GET"]),
+    Route("/sessions/{session_id}/messages", get_messages, methods=["GET"]),
+    Route("/sessions/{session_id}/confirm", confirm_order, methods=["POST"]),
+    Route("/admin/commands", admin_command, methods=["POST"]),
+    Route("/admin/inventory-check", inventory_check, methods=["POST"]),
+    Route("/health", health, methods=["GET"]),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
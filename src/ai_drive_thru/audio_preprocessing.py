@@ -0,0 +1,176 @@
+import io
+import math
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.ai_drive_thru.voice_pipeline import decode_wav, encode_wav
+
+try:
+    import soundfile # Optional: only needed to compress uploads to FLAC
+except ImportError:
+    soundfile = None
+
+try:
+    from scipy import signal as scipy_signal # Optional: polyphase resampling
+except ImportError:
+    scipy_signal = None
+
+# --- Audio Preprocessing Before Transcription ---
+# mic_recorder hands over the recording as the browser captured it: often
+# stereo at 44.1 or 48 kHz, with a second or two of silence on either side.
+# Speech recognition works at 16 kHz mono, so most of those bytes are paid
+# for in upload time and then thrown away by the service. This stage trims
+# leading/trailing silence, downmixes to mono and resamples to 16 kHz before
+# anything is uploaded.
+#
+# The int16 samples are a view of the WAV buffer (np.frombuffer), trimming is
+# a slice rather than a copy, and every step is a whole-array NumPy operation.
+#
+# Silence is judged against the noise floor at the edges of the recording (the
+# customer hasn't started, or has finished, talking there), not against the
+# quietest frames overall, so a recording that is nearly all speech doesn't
+# have its softer words trimmed; the threshold is also capped so loud
+# background noise keeps too much audio rather than too little. Downsampling
+# low-pass filters below the new Nyquist frequency first so higher frequencies
+# don't alias into the speech band: scipy's polyphase resampler when scipy is
+# installed, otherwise a windowed-sinc filter followed by decimation or
+# linear interpolation.
+
+TARGET_SAMPLE_RATE = 16000
+TRIM_FRAME_MS = 20
+TRIM_PADDING_MS = 150 # Silence kept around the speech so word edges aren't clipped
+TRIM_MIN_RMS = 300.0 # On the 16-bit scale; quieter frames always count as silence
+TRIM_NOISE_RATIO = 3.0 # Speech is this many times louder than the noise floor
+TRIM_NOISE_MS = 200 # Leading/trailing audio the noise floor is measured on
+TRIM_MAX_RMS = 1000.0 # Cap on the threshold; frames this loud always count as speech
+RESAMPLE_FILTER_TAPS = 101 # Length of the windowed-sinc low-pass used without scipy
+RESAMPLE_CUTOFF = 0.9 # Low-pass cutoff as a fraction of the new Nyquist frequency
+
+@dataclass(frozen=True)
+class PreprocessedAudio:
+    """The result of preprocess_wav, with before/after sizes for reporting."""
+    data: bytes
+    format: str # "wav", or "flac" when compressed
+    original_bytes: int
+    original_seconds: float
+    seconds: float
+    sample_rate: int
+
+    @property
+    def processed_bytes(self) -> int:
+        return len(self.data)
+
+    @property
+    def reduction(self) -> float:
+        """Fraction of the original size saved, e.g. 0.9 for a 10x smaller upload."""
+        return 1.0 - self.processed_bytes / self.original_bytes if self.original_bytes else 0.0
+
+def trim_bounds(mono: np.ndarray, sample_rate: int) -> Tuple[int, int]:
+    """Returns (start, end) sample indices of the speech in a mono signal, with padding.
+
+    Frame energies are computed in one vectorized pass. The noise floor is the
+    quieter of the median energies of the leading and trailing TRIM_NOISE_MS.
+    Returns (0, 0) if the whole signal is silence.
+    """
+    frame = max(1, sample_rate * TRIM_FRAME_MS // 1000)
+    frames = len(mono) // frame
+    if frames == 0:
+        return 0, len(mono)
+    blocks = mono[:frames * frame].reshape(frames, frame).astype(np.float32)
+    rms = np.sqrt(np.mean(blocks * blocks, axis=1))
+    edge = max(1, min(frames, TRIM_NOISE_MS // TRIM_FRAME_MS))
+    noise_floor = min(float(np.median(rms[:edge])), float(np.median(rms[-edge:])))
+    threshold = min(TRIM_MAX_RMS, max(TRIM_MIN_RMS, noise_floor * TRIM_NOISE_RATIO))
+    speech = np.flatnonzero(rms >= threshold)
+    if speech.size == 0:
+        return 0, 0
+    padding = TRIM_PADDING_MS // TRIM_FRAME_MS
+    start = max(0, int(speech[0]) - padding) * frame
+    end = min(frames, int(speech[-1]) + 1 + padding) * frame
+    if end >= frames * frame:
+        end = len(mono) # Keep the partial frame at the very end
+    return start, end
+
+def downmix(samples: np.ndarray, channels: int) -> np.ndarray:
+    """Averages interleaved int16 channels into one float32 channel."""
+    if channels == 1:
+        return samples.astype(np.float32)
+    usable = len(samples) - len(samples) % channels
+    return samples[:usable].reshape(-1, channels).mean(axis=1, dtype=np.float32)
+
+def lowpass_filter(cutoff: float, taps: int = RESAMPLE_FILTER_TAPS) -> np.ndarray:
+    """A Hamming-windowed sinc low-pass FIR with unit gain; cutoff is a fraction of the sample rate (below 0.5)."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+def resample(mono: np.ndarray, source_rate: int, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Downsamples a float32 signal, low-pass filtering it first.
+
+    Uses scipy.signal.resample_poly when scipy is installed. Otherwise the
+    signal goes through lowpass_filter() and is then decimated (whole-number
+    ratios such as 48 kHz -> 16 kHz) or linearly interpolated (44.1 kHz).
+    Upsampling is left to the service.
+    """
+    if source_rate <= target_rate or len(mono) == 0:
+        return mono
+    if scipy_signal is not None:
+        divisor = math.gcd(source_rate, target_rate)
+        return scipy_signal.resample_poly(mono, target_rate // divisor, source_rate // divisor).astype(np.float32)
+    filtered = np.convolve(mono, lowpass_filter(RESAMPLE_CUTOFF * target_rate / (2 * source_rate)), mode="same")
+    if source_rate % target_rate == 0:
+        return filtered[::source_rate // target_rate]
+    target_length = int(len(mono) * target_rate / source_rate)
+    positions = np.arange(target_length, dtype=np.float64) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(mono)), filtered).astype(np.float32)
+
+def to_int16(signal: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(signal), -32768, 32767).astype("<i2")
+
+def compress_audio(pcm: np.ndarray, sample_rate: int) -> Optional[bytes]:
+    """Encodes mono int16 samples as FLAC, or returns None if soundfile isn't installed."""
+    if soundfile is None:
+        return None
+    buffer = io.BytesIO()
+    soundfile.write(buffer, pcm, sample_rate, format="FLAC", subtype="PCM_16")
+    return buffer.getvalue()
+
+def preprocess_wav(wav_bytes: bytes, target_rate: int = TARGET_SAMPLE_RATE,
+                   trim: bool = True, compress: bool = False) -> PreprocessedAudio:
+    """Trims silence, downmixes to mono and resamples a WAV recording for transcription.
+
+    Args:
+        wav_bytes: The recording as returned by mic_recorder.
+        target_rate: Sample rate to resample to (speech models use 16 kHz).
+        trim: Remove leading and trailing silence.
+        compress: Encode the result as FLAC (needs the optional soundfile package;
+            falls back to WAV without it).
+
+    Returns:
+        A PreprocessedAudio. Audio this stage can't read (not 16-bit PCM WAV)
+        is returned unchanged so it is still transcribed as before.
+    """
+    audio = decode_wav(wav_bytes)
+    if audio is None or audio["sample_width"] != 2 or not audio["sample_rate"]:
+        return PreprocessedAudio(wav_bytes, "wav", len(wav_bytes), 0.0, 0.0, 0)
+    rate, channels = audio["sample_rate"], audio["channels"]
+    samples = np.frombuffer(audio["pcm"], dtype="<i2") # A view of the WAV buffer, no copy
+    original_seconds = len(samples) / channels / rate
+
+    mono = downmix(samples, channels)
+    if trim:
+        start, end = trim_bounds(mono, rate)
+        mono = mono[start:end] # A view
+    pcm = to_int16(resample(mono, rate, target_rate))
+    output_rate = min(rate, target_rate)
+    seconds = len(pcm) / output_rate
+
+    if compress:
+        compressed = compress_audio(pcm, output_rate)
+        if compressed is not None:
+            return PreprocessedAudio(compressed, "flac", len(wav_bytes), original_seconds, seconds, output_rate)
+        print("Warning: soundfile is not installed; uploading uncompressed WAV.")
+    data = encode_wav(pcm.tobytes(), output_rate, 1)
+    return PreprocessedAudio(data, "wav", len(wav_bytes), original_seconds, seconds, output_rate)
@@ -0,0 +1,80 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Any, Awaitable, Optional
+
+# --- Persistent Background Event Loop ---
+# Streamlit scripts are synchronous, so ai_logic used to wrap every coroutine in
+# asyncio.run(). That creates and tears down an event loop per request, and with
+# it every pooled HTTP connection of the OpenAI client (each one a fresh TCP +
+# TLS handshake). Instead, one loop runs forever on a daemon thread and the sync
+# wrappers submit coroutines to it, so the client's keep-alive pool survives
+# across requests.
+
+class BackgroundEventLoop:
+    """An asyncio event loop running on its own daemon thread, started on first use."""
+
+    def __init__(self, name: str = "background-event-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Returns the running loop, starting the thread if needed."""
+        loop = self._loop
+        if loop is not None and self._pid == os.getpid() and not loop.is_closed():
+            return loop
+        with self._lock:
+            # A loop inherited across fork() has no thread behind it; start a new one
+            if self._loop is None or self._pid != os.getpid() or self._loop.is_closed():
+                self._start()
+            return self._loop
+
+    def _start(self) -> None:
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run_forever():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        thread = threading.Thread(target=run_forever, name=self.name, daemon=True)
+        thread.start()
+        ready.wait()
+        self._loop, self._thread, self._pid = loop, thread, os.getpid()
+
+    def in_loop_thread(self) -> bool:
+        """True when called from the loop's own thread."""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """Schedules a coroutine on the loop and returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Runs a coroutine on the loop and blocks the calling thread for its result.
+
+        Raises RuntimeError if called from the loop thread itself, which would deadlock;
+        code already running on the loop should await the coroutine instead.
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError(f"{self.name}: run() called from the loop thread; await the coroutine instead.")
+        return self.submit(coro).result(timeout)
+
+    def stop(self) -> None:
+        """Stops the loop and waits for its thread to exit."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = self._pid = None
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+            loop.close()
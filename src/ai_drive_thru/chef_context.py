@@ -0,0 +1,156 @@
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.ai_drive_thru import db_utils
+from src.ai_drive_thru.menu_cache import MenuSnapshot, get_menu_snapshot, price_to_cents
+from src.ai_drive_thru.pricing import format_cents
+
+try:
+    import tiktoken # Optional: exact token counts; without it tokens are estimated from length
+except ImportError:
+    tiktoken = None
+
+# --- AI Chef Context ---
+# The AI Chef used to receive the whole menu as pretty-printed JSON, long
+# descriptions included, so every request cost more as the menu grew. The
+# context below is a compact text summary of the menu, stock and recent sales,
+# capped at CHEF_CONTEXT_TOKEN_BUDGET tokens. When the menu doesn't fit,
+# descriptions go first, then the least relevant items, which are summarized
+# in one line. Items are ranked as follows: out of stock or low stock first,
+# then best sellers, then the rest. The rendered context is cached per menu
+# version, latest order and day, so repeated questions don't rebuild it.
+
+CHEF_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHEF_CONTEXT_TOKEN_BUDGET", "1500"))
+CHEF_SALES_DAYS = 7 # Window for the sales figures
+CHEF_LOW_STOCK = 10 # Items below this are listed first
+CHEF_TOP_SELLERS = 5
+CHEF_BUSIEST_HOURS = 3
+CHEF_ATTACHED_ITEMS = 3
+DESCRIPTION_CHARS = 60 # Descriptions are cut to this length
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """Tokens in text for the chat models (cl100k_base), or ~4 characters per token without tiktoken."""
+    global _encoding
+    if tiktoken is None:
+        return math.ceil(len(text) / 4)
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode(text))
+
+@dataclass(frozen=True)
+class ChefContext:
+    """A rendered AI Chef context and what went into it."""
+    text: str
+    tokens: int
+    items_listed: int
+    items_total: int
+    descriptions: bool # Whether item lines carry (shortened) descriptions
+
+def _short(text: Optional[str], limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+def render_sales_lines(days: int = CHEF_SALES_DAYS) -> List[str]:
+    """Recent sales in a few lines: totals, best sellers, busiest hours and what sells with the best seller."""
+    top = db_utils.get_top_sellers(days=days, limit=CHEF_TOP_SELLERS)
+    if not top:
+        return [f"Sales (last {days} days): no orders recorded."]
+    volume = db_utils.get_hourly_volume(hours=days * 24)
+    orders = sum(row["orders"] for row in volume)
+    revenue = sum(row["revenue_cents"] for row in volume)
+    lines = [
+        f"Sales (last {days} days): {orders} orders, {format_cents(revenue)}.",
+        "Top sellers (units): " + ", ".join(f"{row['item_name']} {row['units']}" for row in top),
+    ]
+    hours = sorted(db_utils.get_volume_by_hour_of_day(days=days), key=lambda row: -row["orders"])[:CHEF_BUSIEST_HOURS]
+    hours = [row for row in hours if row["orders"] > 0]
+    if hours:
+        lines.append("Busiest hours (orders/day): " + ", ".join(f"{row['hour_of_day']:02d}:00 {row['orders']:.0f}" for row in hours))
+    attach = db_utils.get_attach_rates(top[0]["item_name"], days=days, limit=CHEF_ATTACHED_ITEMS)
+    if attach["attached"]:
+        lines.append(f"Bought with {attach['item_name']}: " + ", ".join(
+            f"{row['item_name']} {row['rate']:.0%}" for row in attach["attached"]))
+    return lines
+
+def _rank_items(items: List[Dict[str, Any]], units_sold: Dict[str, int]) -> List[Dict[str, Any]]:
+    return sorted(items, key=lambda item: (
+        item["quantity"] >= CHEF_LOW_STOCK, # Out of stock / low stock first
+        -units_sold.get(item["name"], 0),
+        item["name"].lower(),
+    ))
+
+def _item_line(item: Dict[str, Any], units_sold: Dict[str, int], descriptions: bool) -> str:
+    line = f"{item['name']}|{format_cents(price_to_cents(item['price']))}|{item['quantity']}|{units_sold.get(item['name'], 0)}"
+    if descriptions and item.get("description"):
+        line += "|" + _short(item["description"], DESCRIPTION_CHARS)
+    return line
+
+def _omitted_line(items: List[Dict[str, Any]]) -> str:
+    prices = [price_to_cents(item["price"]) for item in items]
+    out_of_stock = sum(1 for item in items if item["quantity"] <= 0)
+    return (f"...and {len(items)} more items ({format_cents(min(prices))}-{format_cents(max(prices))}, "
+            f"{out_of_stock} out of stock) not listed.")
+
+def render_chef_context(snapshot: MenuSnapshot, sales_lines: List[str], units_sold: Dict[str, int],
+                        token_budget: int = CHEF_CONTEXT_TOKEN_BUDGET, count: Callable[[str], int] = count_tokens) -> ChefContext:
+    """Renders the context from a menu snapshot and sales figures, within token_budget tokens."""
+    items = _rank_items(snapshot.items, units_sold)
+    out_of_stock = sum(1 for item in items if item["quantity"] <= 0)
+    header = [
+        f"Menu: {len(items)} items, {out_of_stock} out of stock.",
+        *sales_lines,
+        f"Items (name|price|stock|units sold in {CHEF_SALES_DAYS} days|description), low stock first:",
+    ]
+    used = sum(count(line) + 1 for line in header)
+    # Room kept for the one-line summary of whatever doesn't fit
+    reserve = count(_omitted_line(items)) + 1 if items else 0
+
+    def fill(descriptions: bool) -> Tuple[List[str], int]:
+        lines, tokens = [], used
+        for item in items:
+            line = _item_line(item, units_sold, descriptions)
+            line_tokens = count(line) + 1
+            if tokens + line_tokens + reserve > token_budget:
+                break
+            lines.append(line)
+            tokens += line_tokens
+        return lines, tokens
+
+    descriptions = True
+    lines, tokens = fill(descriptions)
+    if len(lines) < len(items):
+        descriptions = False
+        lines, tokens = fill(descriptions)
+    listed = len(lines)
+    if listed < len(items):
+        omitted = _omitted_line(items[listed:])
+        lines.append(omitted)
+        tokens += count(omitted) + 1
+    return ChefContext(text="\n".join(header + lines), tokens=tokens, items_listed=listed,
+                       items_total=len(items), descriptions=descriptions)
+
+_cached: Optional[Tuple[Tuple[Any, ...], ChefContext]] = None # (cache key, context)
+_rebuild_lock = threading.Lock()
+
+def get_chef_context(token_budget: int = CHEF_CONTEXT_TOKEN_BUDGET) -> ChefContext:
+    """Returns the AI Chef context, rebuilding it only when the menu, stock, orders or day changed."""
+    global _cached
+    snapshot = get_menu_snapshot()
+    key = (db_utils.DB_FILE, snapshot.version, db_utils.get_sales_version(), db_utils.local_day(), token_budget)
+    cached = _cached
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with _rebuild_lock:
+        cached = _cached
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        units_sold = {row["item_name"]: row["units"] for row in db_utils.get_top_sellers(days=CHEF_SALES_DAYS, limit=len(snapshot.items) or 1)}
+        context = render_chef_context(snapshot, render_sales_lines(), units_sold, token_budget)
+        _cached = (key, context)
+        return context
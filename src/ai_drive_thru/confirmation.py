@@ -0,0 +1,43 @@
+import json
+from typing import Dict, Any, List
+
+from src.ai_drive_thru.fast_parser import join_phrases, pluralize
+
+# --- Local Order Confirmation ---
+# Turning a short order list into "Okay, just to confirm, you have: ..." does not
+# need an LLM round trip while the customer waits at the window. These helpers
+# render the same kind of sentence as Confirmer.prompty in microseconds; ai_logic
+# only calls the LLM when asked to polish the wording.
+
+def describe_order_line(line: Dict[str, Any]) -> str:
+    """Renders one order line, e.g. {"item": "Milkshake", "quantity": 2, "details": "Chocolate"} -> '2 Chocolate Milkshakes'."""
+    item_name = str(line.get("item") or "item")
+    try:
+        quantity = int(line.get("quantity", 1))
+    except (ValueError, TypeError):
+        quantity = 1
+    details = line.get("details")
+    if quantity != 1 and not item_name.lower().endswith("s"):
+        item_name = pluralize(item_name)
+    if details and str(details).lower() not in item_name.lower():
+        item_name = f"{details} {item_name}"
+    return f"{quantity} {item_name}"
+
+def render_confirmation(order_list: List[Dict[str, Any]]) -> str:
+    """Builds the customer-facing confirmation sentence for an order."""
+    lines = [describe_order_line(line) for line in order_list if isinstance(line, dict) and line.get("item")]
+    if not lines:
+        return "Your order is currently empty. What can I get for you?"
+    return f"Okay, just to confirm, you have: {join_phrases(lines)}. Does that look right?"
+
+def canonical_order_json(order_list: List[Dict[str, Any]]) -> str:
+    """Serializes an order so that equivalent orders produce identical strings.
+
+    Line order and key order do not matter; used to memoize polished confirmations.
+    """
+    lines = [
+        {"item": line.get("item"), "quantity": line.get("quantity", 1), "details": line.get("details")}
+        for line in order_list if isinstance(line, dict)
+    ]
+    lines.sort(key=lambda line: (str(line["item"]), str(line["details"]), str(line["quantity"])))
+    return json.dumps(lines, sort_keys=True, separators=(",", ":"))
@@ -1,31 +1,289 @@
 import sqlite3
 import os
-from typing import Optional, Dict, Any, List
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple
+
+from src.ai_drive_thru.group_commit import GroupCommitWriter, RollbackWork, is_busy_error
 
 DB_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'menu.db') # Assumes db is in root
 
-def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_FILE)
+# --- Connection Management ---
+# Opening a fresh connection for every query was the dominant cost of a DB call
+# (file open, schema parse, page cache starting cold). Instead we keep one
+# long-lived connection per thread and per process. Coroutines in ai_logic call
+# these helpers from their event loop's thread, so per-thread reuse also covers
+# per-event-loop reuse. Connections are keyed on the resolved DB path so that
+# pointing DB_FILE at another database (e.g. a scratch copy for benchmarks)
+# transparently opens a new connection.
+
+# Pragmas applied to every new connection. WAL lets readers proceed while a
+# writer commits; synchronous=NORMAL is durable enough under WAL and avoids an
+# fsync per commit; busy_timeout makes concurrent writers wait instead of
+# failing immediately with "database is locked".
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",  # ~8 MB page cache per connection
+    "PRAGMA foreign_keys=ON",
+)
+
+_thread_local = threading.local()
+_open_connections: List[sqlite3.Connection] = []
+_open_connections_lock = threading.Lock()
+_pool_generation = 0 # Bumped by close_db_connections() to retire cached connections
+
+# --- Schema Upkeep ---
+# Additive schema objects db_utils relies on beyond the menu_items table created
+# by scripts/initialize_db.py. They are applied once per database per process,
+# so existing menu.db files pick them up without a separate migration step.
+SCHEMA_STATEMENTS = (
+    # Single-row counter bumped by triggers on every change to menu_items. Unlike
+    # PRAGMA data_version (which is per-connection and ignores the connection's
+    # own commits) it is comparable across threads and processes, so caches can
+    # use it to detect that the menu actually changed.
+    """
+    CREATE TABLE IF NOT EXISTS menu_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO menu_version (id, version) VALUES (1, 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS menu_items_version_insert AFTER INSERT ON menu_items
+    BEGIN UPDATE menu_version SET version = version + 1 WHERE id = 1; END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menu_items_version_update AFTER UPDATE ON menu_items
+    BEGIN UPDATE menu_version SET version = version + 1 WHERE id = 1; END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menu_items_version_delete AFTER DELETE ON menu_items
+    BEGIN UPDATE menu_version SET version = version + 1 WHERE id = 1; END
+    """,
+    # Stock held for a customer order between reserve_order() and
+    # commit_order()/release_order(). The stock itself is already taken out of
+    # menu_items; this table records what to give back if the order is released.
+    """
+    CREATE TABLE IF NOT EXISTS order_reservations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        status TEXT NOT NULL CHECK(status IN ('reserved', 'committed', 'released')),
+        lines TEXT NOT NULL, -- JSON list of {"item": ..., "quantity": ...}, one per item
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    # Append-only history of every stock change (see Inventory Ledger below).
+    # item_id is menu_items.id; there is deliberately no foreign key, so the
+    # history outlives items removed from the menu.
+    """
+    CREATE TABLE IF NOT EXISTS inventory_ledger (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_id INTEGER NOT NULL,
+        change INTEGER NOT NULL,
+        reason TEXT NOT NULL CHECK(reason IN ('opening', 'sale', 'release', 'reorder', 'adjustment')),
+        reference TEXT, -- e.g. 'reservation:42'
+        quantity_after INTEGER NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS inventory_ledger_item ON inventory_ledger (item_id, id)",
+    # Opening balances: for items that predate the ledger, and for every new item
+    """
+    INSERT INTO inventory_ledger (item_id, change, reason, quantity_after, created_at)
+    SELECT id, quantity, 'opening', quantity, (julianday('now') - 2440587.5) * 86400.0 FROM menu_items
+    WHERE id NOT IN (SELECT item_id FROM inventory_ledger)
+    """,
+    # Net units sold per item per local calendar day (sales minus releases),
+    # maintained with each sale so demand forecasting reads one row per item
+    # and day instead of scanning the ledger. day is days since 1970-01-01 in
+    # local time (see local_day()); it leads the key so reading recent days is
+    # a range scan however many years the table holds.
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        item_id INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        PRIMARY KEY (day, item_id)
+    ) WITHOUT ROWID
+    """,
+    # Backfill from the ledger the first time (sales_daily is only empty before any sale)
+    """
+    INSERT INTO sales_daily (item_id, day, quantity)
+    SELECT item_id, CAST(julianday(created_at, 'unixepoch', 'localtime') - 2440587.5 AS INTEGER) AS day, -SUM(change)
+    FROM inventory_ledger WHERE reason IN ('sale', 'release') AND NOT EXISTS (SELECT 1 FROM sales_daily)
+    GROUP BY item_id, day
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menu_items_ledger_opening AFTER INSERT ON menu_items
+    BEGIN
+        INSERT INTO inventory_ledger (item_id, change, reason, quantity_after, created_at)
+        VALUES (NEW.id, NEW.quantity, 'opening', NEW.quantity, (julianday('now') - 2440587.5) * 86400.0);
+    END
+    """,
+    # Confirmed orders and their lines (see Order History below). item_id is
+    # menu_items.id, without a foreign key for the same reason as the ledger.
+    """
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        reservation_id INTEGER UNIQUE,
+        created_at REAL NOT NULL,
+        total_cents INTEGER NOT NULL,
+        units INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS orders_created ON orders (created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS order_lines (
+        order_id INTEGER NOT NULL REFERENCES orders (id),
+        line_no INTEGER NOT NULL,
+        item_id INTEGER, -- NULL if the item was no longer on the menu
+        item_name TEXT NOT NULL,
+        details TEXT,
+        quantity INTEGER NOT NULL,
+        unit_price_cents INTEGER NOT NULL,
+        PRIMARY KEY (order_id, line_no)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS order_lines_item ON order_lines (item_id, order_id)",
+    # Rollups of the confirmed orders, maintained in the same transaction as each
+    # order. hour and day count local hours/days since 1970-01-01 (see
+    # local_hour() and local_day()) and lead each key for range scans.
+    """
+    CREATE TABLE IF NOT EXISTS order_volume_hourly (
+        hour INTEGER PRIMARY KEY,
+        orders INTEGER NOT NULL,
+        units INTEGER NOT NULL,
+        revenue_cents INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS item_sales_rollup (
+        day INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        orders INTEGER NOT NULL, -- Orders containing the item
+        units INTEGER NOT NULL,
+        revenue_cents INTEGER NOT NULL,
+        PRIMARY KEY (day, item_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS item_pairs_rollup (
+        day INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        paired_item_id INTEGER NOT NULL,
+        orders INTEGER NOT NULL, -- Orders containing both items
+        PRIMARY KEY (day, item_id, paired_item_id)
+    ) WITHOUT ROWID
+    """,
+)
+
+_schema_ready_paths = set()
+
+def _configure_connection(conn: sqlite3.Connection) -> None:
+    """Applies the row factory and tuning pragmas to a new connection."""
     conn.row_factory = sqlite3.Row # Return rows as dictionary-like objects
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+
+def _ensure_schema(conn: sqlite3.Connection, db_path: str) -> None:
+    """Applies SCHEMA_STATEMENTS to the database the first time this process opens it."""
+    if db_path in _schema_ready_paths:
+        return
+    try:
+        with conn: # Commits on success, rolls back on error
+            for statement in SCHEMA_STATEMENTS:
+                conn.execute(statement)
+    except sqlite3.OperationalError as e:
+        # e.g. menu_items does not exist yet because initialize_db.py has not run
+        print(f"Warning: Could not apply schema upkeep to '{db_path}': {e}")
+        return
+    _schema_ready_paths.add(db_path)
+
+def get_db_connection() -> sqlite3.Connection:
+    """Returns this thread's long-lived connection to the SQLite database.
+
+    The connection is opened and configured on first use and then reused by
+    every later call on the same thread. Callers must not close it; use
+    close_db_connections() to release connections explicitly.
+    """
+    key = (os.path.abspath(DB_FILE), os.getpid(), _pool_generation)
+    cached = getattr(_thread_local, "connection", None)
+    # A connection inherited across fork(), opened for a different DB_FILE or
+    # retired by close_db_connections() must not be reused.
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    # check_same_thread=False only so close_db_connections() may close it from
+    # another thread; the connection itself is never shared between threads.
+    conn = sqlite3.connect(key[0], check_same_thread=False)
+    _configure_connection(conn)
+    _ensure_schema(conn, key[0])
+    _thread_local.connection = (key, conn)
+    with _open_connections_lock:
+        _open_connections.append(conn)
     return conn
 
+def close_db_connections() -> None:
+    """Closes every pooled connection opened by this process.
+
+    Threads that query again afterwards transparently open a new connection.
+    """
+    global _pool_generation
+    with _open_connections_lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+        _pool_generation += 1
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Error closing database connection: {e}")
+
 def get_menu_items() -> List[Dict[str, Any]]:
     """Fetches all items from the menu_items table."""
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT name, description, price, quantity FROM menu_items")
     items = [dict(row) for row in cursor.fetchall()]
-    conn.close()
     return items
 
+def get_menu_version() -> int:
+    """Returns the menu version counter, which changes whenever menu_items is modified."""
+    conn = get_db_connection()
+    row = conn.execute("SELECT version FROM menu_version WHERE id = 1").fetchone()
+    return row['version'] if row else 0
+
+def get_menu_items_with_version() -> Tuple[int, List[Dict[str, Any]]]:
+    """Fetches all menu items together with the menu version they correspond to.
+
+    Both reads happen in one read transaction so the version always describes
+    exactly the rows returned. If this thread's connection is already inside a
+    transaction, the reads join it and leave it open for its owner.
+    """
+    conn = get_db_connection()
+    owns_transaction = not conn.in_transaction
+    if owns_transaction:
+        conn.execute("BEGIN")
+    try:
+        row = conn.execute("SELECT version FROM menu_version WHERE id = 1").fetchone()
+        cursor = conn.execute("SELECT name, description, price, quantity FROM menu_items")
+        items = [dict(item) for item in cursor.fetchall()]
+    finally:
+        if owns_transaction:
+            conn.commit() # Ends the read transaction
+    return (row['version'] if row else 0), items
+
 def get_item_details(item_name: str) -> Optional[Dict[str, Any]]:
     """Fetches details for a specific item by name."""
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT name, description, price, quantity FROM menu_items WHERE name = ? COLLATE NOCASE", (item_name,))
     item = cursor.fetchone()
-    conn.close()
     return dict(item) if item else None
 
 def get_item_quantity(item_name: str) -> Optional[int]:
@@ -33,52 +291,699 @@ def get_item_quantity(item_name: str) -> Optional[int]:
     item = get_item_details(item_name)
     return item['quantity'] if item else None
 
+# SQLite caps the number of bound parameters per statement (999 on older builds),
+# so very large IN (...) lists are resolved in chunks of this size.
+MAX_IN_CLAUSE_PARAMS = 500
 
-def update_item_quantity(item_name: str, quantity_change: int) -> bool:
+def get_item_quantities(item_names: List[str]) -> Dict[str, Optional[int]]:
+    """Fetches current quantities for many items in one query.
+
+    Names are matched case-insensitively, like get_item_quantity().
+    Returns a dict keyed by each requested name; items not on the menu map to None.
+    """
+    unique_names = list(dict.fromkeys(name for name in item_names if name))
+    if not unique_names:
+        return {}
+
+    conn = get_db_connection()
+    found: Dict[str, int] = {}
+    for start in range(0, len(unique_names), MAX_IN_CLAUSE_PARAMS):
+        chunk = unique_names[start:start + MAX_IN_CLAUSE_PARAMS]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor = conn.execute(
+            f"SELECT name, quantity FROM menu_items WHERE name COLLATE NOCASE IN ({placeholders})",
+            chunk,
+        )
+        for row in cursor.fetchall():
+            found[row['name'].lower()] = row['quantity']
+
+    return {name: found.get(name.lower()) for name in unique_names}
+
+# --- Inventory Ledger ---
+# Every stock change appends a row to inventory_ledger (sale, release, reorder
+# or adjustment, with a reference such as the reservation id), giving a full
+# audit trail. menu_items.quantity remains the materialized current stock,
+# updated in the same transaction as its ledger row, so reading stock stays a
+# single-row lookup and the sum of an item's ledger changes always equals it
+# (see reconcile_inventory). All stock writes go through inventory_writer,
+# which commits the work of concurrent lanes in shared transactions (see
+# group_commit.py).
+
+# Extra milliseconds the writer waits to grow a batch. The default of 0 batches
+# whatever queued during the previous commit; a window helps on disks where a
+# commit (fsync) is slow.
+GROUP_COMMIT_WINDOW_SECONDS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "0")) / 1000
+
+# Several processes (Streamlit workers, service.py) write the same file. The
+# writer waits WRITE_BUSY_TIMEOUT_MS for the write lock, then backs off and
+# retries the batch (see group_commit.py), so a worker stuck behind a long
+# transaction elsewhere gets WRITE_MAX_ATTEMPTS chances instead of failing
+# with "database is locked" after a single busy_timeout.
+# If the database is still locked after the last attempt, nothing was written.
+# change_item_quantity() reports that as STOCK_BUSY (other errors as
+# STOCK_ERROR); the other write helpers return their usual failure value
+# (False, [], a list of None, or a reservation whose failed lines say
+# "Database busy") and log "Database busy" rather than "Database error", so a
+# caller can retry a busy write instead of treating it as a bad request.
+WRITE_BUSY_TIMEOUT_MS = int(os.getenv("WRITE_BUSY_TIMEOUT_MS", "1000"))
+WRITE_MAX_ATTEMPTS = int(os.getenv("WRITE_MAX_ATTEMPTS", "5"))
+
+def _write_failure(error: sqlite3.Error) -> str:
+    """How a failed write is described: "Database busy" if it was still locked after every retry, else "Database error"."""
+    return "Database busy" if is_busy_error(error) else "Database error"
+
+def _get_writer_connection() -> sqlite3.Connection:
+    conn = get_db_connection()
+    conn.execute(f"PRAGMA busy_timeout={WRITE_BUSY_TIMEOUT_MS}")
+    return conn
+
+inventory_writer = GroupCommitWriter(_get_writer_connection, window_seconds=GROUP_COMMIT_WINDOW_SECONDS,
+                                     name="inventory-writer", max_attempts=WRITE_MAX_ATTEMPTS)
+
+# Result codes of change_item_quantity()
+STOCK_OK = "ok"
+STOCK_NOT_FOUND = "not_found"
+STOCK_INSUFFICIENT = "insufficient_stock"
+STOCK_BUSY = "busy" # Still locked by another writer after every retry; nothing was changed
+STOCK_ERROR = "error" # Any other database error; nothing was changed
+
+@dataclass(frozen=True)
+class StockUpdate:
+    """The outcome of a stock change: a STOCK_* result code and the item's quantity (new, or current on failure)."""
+    result: str
+    quantity: Optional[int] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.result == STOCK_OK
+
+LedgerEntry = Tuple[int, int, str, Optional[str], int] # item_id, change, reason, reference, quantity_after
+
+def _record_ledger(conn: sqlite3.Connection, entries: List[LedgerEntry]) -> None:
+    now = time.time()
+    conn.executemany(
+        "INSERT INTO inventory_ledger (item_id, change, reason, reference, quantity_after, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [entry + (now,) for entry in entries],
+    )
+
+def _change_stock(conn: sqlite3.Connection, item_name: str, quantity_change: int, reason: str, reference: Optional[str]) -> Optional[int]:
+    """Applies one change if it leaves the stock non-negative and records it; returns the new quantity or None."""
+    row = conn.execute(
+        "UPDATE menu_items SET quantity = quantity + ? WHERE name = ? COLLATE NOCASE AND quantity + ? >= 0 RETURNING id, quantity",
+        (quantity_change, item_name, quantity_change),
+    ).fetchone()
+    if row is None:
+        return None
+    _record_ledger(conn, [(row["id"], quantity_change, reason, reference, row["quantity"])])
+    return row["quantity"]
+
+def local_day(timestamp: Optional[float] = None) -> int:
+    """Days since 1970-01-01 in local time, the day key of sales_daily."""
+    timestamp = time.time() if timestamp is None else timestamp
+    return int((timestamp + time.localtime(timestamp).tm_gmtoff) // 86400)
+
+def _record_sales(conn: sqlite3.Connection, sales: List[Tuple[int, int]], day: Optional[int] = None) -> None:
+    """Adds (item_id, units) to a day's sales_daily rows (today by default); units are negative for releases."""
+    day = local_day() if day is None else day
+    conn.executemany(
+        "INSERT INTO sales_daily (item_id, day, quantity) VALUES (?, ?, ?) "
+        "ON CONFLICT (day, item_id) DO UPDATE SET quantity = quantity + excluded.quantity",
+        [(item_id, day, units) for item_id, units in sales],
+    )
+
+def get_daily_sales(since_day: int) -> List[Tuple[int, int, int]]:
+    """Returns (item_id, day, units sold) for every item and day from since_day on."""
+    cursor = get_db_connection().cursor()
+    cursor.row_factory = None # Plain tuples; this can be hundreds of thousands of rows
+    return cursor.execute("SELECT item_id, day, quantity FROM sales_daily WHERE day >= ?", (since_day,)).fetchall()
+
+def get_item_ids() -> Dict[str, int]:
+    """Maps each menu item's name to its id."""
+    conn = get_db_connection()
+    return {row["name"]: row["id"] for row in conn.execute("SELECT id, name FROM menu_items").fetchall()}
+
+def change_item_quantity(item_name: str, quantity_change: int, reason: str = "adjustment", reference: Optional[str] = None) -> StockUpdate:
+    """Changes an item's stock by quantity_change unless that would take it below zero.
+
+    The change is a single conditional UPDATE (see _change_stock) plus its
+    ledger row, committed by the inventory writer, which retries with backoff
+    while another process holds the database.
+
+    Returns:
+        A StockUpdate with STOCK_OK and the new quantity; STOCK_INSUFFICIENT
+        and the quantity that was available; STOCK_NOT_FOUND; or STOCK_BUSY /
+        STOCK_ERROR if the transaction couldn't be committed.
+    """
+    def work(conn: sqlite3.Connection) -> StockUpdate:
+        new_quantity = _change_stock(conn, item_name, quantity_change, reason, reference)
+        if new_quantity is not None:
+            return StockUpdate(STOCK_OK, new_quantity)
+        # Why it failed, read in the same transaction so it can't be stale
+        row = conn.execute("SELECT quantity FROM menu_items WHERE name = ? COLLATE NOCASE", (item_name,)).fetchone()
+        return StockUpdate(STOCK_NOT_FOUND) if row is None else StockUpdate(STOCK_INSUFFICIENT, row["quantity"])
+
+    try:
+        return inventory_writer.execute(work)
+    except sqlite3.Error as e:
+        print(f"{_write_failure(e)} updating quantity for '{item_name}': {e}")
+        return StockUpdate(STOCK_BUSY if is_busy_error(e) else STOCK_ERROR)
+
+def update_item_quantity(item_name: str, quantity_change: int, reason: str = "adjustment", reference: Optional[str] = None) -> bool:
     """
     Updates the quantity of a specific item.
     Decreases quantity if quantity_change is negative, increases if positive.
-    Ensures quantity does not go below zero.
+    Ensures quantity does not go below zero. The change is recorded in the
+    inventory ledger with the given reason and reference.
     Returns True if update was successful, False otherwise (e.g., item not found or insufficient stock for decrease).
+    Use change_item_quantity() for the reason of a failure.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    update = change_item_quantity(item_name, quantity_change, reason, reference)
+    if update.result == STOCK_NOT_FOUND:
+        print(f"Error: Item '{item_name}' not found for quantity update.")
+    elif update.result == STOCK_INSUFFICIENT:
+        print(f"Error: Insufficient stock for '{item_name}'. Requested: {abs(quantity_change)}, Available: {update.quantity}")
+    elif update.ok:
+        print(f"Successfully updated quantity for '{item_name}' by {quantity_change}.")
+    return update.ok
+
+def update_item_quantities(changes: List[Tuple[str, int]], reason: str = "adjustment", reference: Optional[str] = None) -> List[Optional[int]]:
+    """Applies several (item_name, quantity_change) changes in one transaction.
+
+    Each change is applied like update_item_quantity (never below zero, one
+    ledger row each). A change that can't be applied is skipped without
+    affecting the others, e.g. a delivery with one unknown item still books
+    the rest.
+
+    Returns:
+        The new quantity for each change, in input order; None where the
+        item was not found or had insufficient stock (or for every change if
+        the transaction failed).
+    """
+    if not changes:
+        return []
+
+    def work(conn: sqlite3.Connection) -> List[Optional[int]]:
+        return [_change_stock(conn, item_name, quantity_change, reason, reference) for item_name, quantity_change in changes]
+
     try:
-        # Check current quantity first if decreasing
-        if quantity_change < 0:
-            cursor.execute("SELECT quantity FROM menu_items WHERE name = ? COLLATE NOCASE", (item_name,))
-            current_item = cursor.fetchone()
-            if not current_item:
-                print(f"Error: Item '{item_name}' not found for quantity update.")
-                return False
-            if current_item['quantity'] < abs(quantity_change):
-                print(f"Error: Insufficient stock for '{item_name}'. Requested: {abs(quantity_change)}, Available: {current_item['quantity']}")
-                return False
-
-        # Perform the update
-        cursor.execute("""
+        new_quantities = inventory_writer.execute(work)
+    except sqlite3.Error as e:
+        print(f"{_write_failure(e)} updating quantities for {len(changes)} item(s): {e}")
+        return [None] * len(changes)
+    failed = [item_name for (item_name, _), new_quantity in zip(changes, new_quantities) if new_quantity is None]
+    if failed:
+        print(f"Error: Could not update quantity for {', '.join(repr(name) for name in failed)} (not found or insufficient stock).")
+    print(f"Updated quantities for {len(changes) - len(failed)} of {len(changes)} item(s) in one transaction.")
+    return new_quantities
+
+def get_inventory_ledger(item_name: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """Returns the most recent ledger entries, newest first, optionally for one item."""
+    conn = get_db_connection()
+    query = (
+        "SELECT l.id, l.item_id, m.name AS item, l.change, l.reason, l.reference, l.quantity_after, l.created_at "
+        "FROM inventory_ledger l LEFT JOIN menu_items m ON m.id = l.item_id"
+    )
+    if item_name:
+        rows = conn.execute(
+            query + " WHERE l.item_id = (SELECT id FROM menu_items WHERE name = ? COLLATE NOCASE) ORDER BY l.id DESC LIMIT ?",
+            (item_name, limit),
+        ).fetchall()
+    else:
+        rows = conn.execute(query + " ORDER BY l.id DESC LIMIT ?", (limit,)).fetchall()
+    return [dict(row) for row in rows]
+
+def reconcile_inventory() -> List[Dict[str, Any]]:
+    """Lists items whose stock does not equal the sum of their ledger changes.
+
+    Only writes that bypass db_utils (e.g. a manual UPDATE) can cause this.
+    """
+    conn = get_db_connection()
+    rows = conn.execute(
+        """
+        SELECT m.name AS item, m.quantity, COALESCE(SUM(l.change), 0) AS ledger_total
+        FROM menu_items m LEFT JOIN inventory_ledger l ON l.item_id = m.id
+        GROUP BY m.id HAVING m.quantity != ledger_total
+        """
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+# --- Bulk Reorder ---
+# The autonomous inventory check used to read the whole menu, then update and
+# re-read every low item separately. The threshold rule is now one conditional
+# UPDATE whose RETURNING clause reports the new quantities, so the check, the
+# restock and the read-back are a single statement (plus the ledger rows it
+# produces), and two checks running at once cannot both restock the same item.
+
+def reorder_low_stock(threshold: int, reorder_quantity: int, rules: Optional[Dict[int, Tuple[int, int]]] = None) -> List[Dict[str, Any]]:
+    """Adds the reorder quantity to every item whose quantity is below its reorder point.
+
+    Args:
+        threshold: Reorder point for items without a rule.
+        reorder_quantity: Quantity ordered for items without a rule.
+        rules: Optional per-item {item_id: (reorder_point, reorder_quantity)},
+            e.g. from demand_forecast.compute_reorder_rules().
+
+    Returns:
+        One {"item_name", "ordered_quantity", "new_quantity"} dictionary per
+        restocked item, in menu order; an empty list if nothing was low or the
+        update failed.
+    """
+    rules = rules or {}
+
+    def work(conn: sqlite3.Connection) -> List[sqlite3.Row]:
+        # The rules go into a temp table so the update stays one statement
+        # however many items have their own rule.
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS reorder_rules (item_id INTEGER PRIMARY KEY, point INTEGER NOT NULL, quantity INTEGER NOT NULL)")
+        conn.execute("DELETE FROM temp.reorder_rules")
+        conn.executemany("INSERT INTO temp.reorder_rules (item_id, point, quantity) VALUES (?, ?, ?)",
+                         [(item_id, point, quantity) for item_id, (point, quantity) in rules.items()])
+        rows = conn.execute(
+            """
             UPDATE menu_items
-            SET quantity = quantity + ?
-            WHERE name = ? COLLATE NOCASE
-        """, (quantity_change, item_name))
+            SET quantity = quantity + COALESCE((SELECT r.quantity FROM temp.reorder_rules r WHERE r.item_id = menu_items.id), ?)
+            WHERE quantity < COALESCE((SELECT r.point FROM temp.reorder_rules r WHERE r.item_id = menu_items.id), ?)
+            RETURNING id, name, quantity
+            """,
+            (reorder_quantity, threshold),
+        ).fetchall()
+        _record_ledger(conn, [(row["id"], rules.get(row["id"], (threshold, reorder_quantity))[1], "reorder", None, row["quantity"]) for row in rows])
+        return rows
+
+    try:
+        rows = inventory_writer.execute(work)
+    except sqlite3.Error as e:
+        print(f"{_write_failure(e)} reordering low stock: {e}")
+        return []
+    return [
+        {"item_name": row["name"], "ordered_quantity": rules.get(row["id"], (threshold, reorder_quantity))[1], "new_quantity": row["quantity"]}
+        for row in sorted(rows, key=lambda row: row["id"]) # RETURNING order is unspecified
+    ]
 
-        if cursor.rowcount == 0:
-             # This case should ideally be caught by the check above if quantity_change < 0
-             # but handles cases where the item disappears between check and update or item_name is wrong
-             print(f"Error: Item '{item_name}' not found during update or no change needed.")
-             conn.rollback() # Rollback any potential partial changes if transaction semantics were more complex
-             return False
+# --- Order Reservation ---
+# Confirming an order takes every line out of stock in one IMMEDIATE transaction
+# (shared with other lanes' writes by the group-commit writer, each order under
+# its own savepoint).
+# Each decrement is a conditional UPDATE (... AND quantity >= ?), so the check and
+# the write are a single statement and concurrent lanes cannot oversell. If any
+# line cannot be fulfilled the whole transaction is rolled back (all or nothing).
 
+def _aggregate_order_lines(order_lines: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+    """Sums quantities per item (case-insensitively) across order lines.
 
-        conn.commit()
-        print(f"Successfully updated quantity for '{item_name}' by {quantity_change}.")
+    Returns (totals keyed by lower-cased item name, invalid lines). Lines for the
+    same item with different details (e.g. two soda flavors) share one stock count.
+    """
+    totals: Dict[str, Dict[str, Any]] = {}
+    invalid_lines = []
+    for line in order_lines:
+        if not isinstance(line, dict):
+            line = {}
+        item_name = line.get("item")
+        try:
+            quantity = int(line.get("quantity", 1))
+        except (ValueError, TypeError):
+            quantity = 0
+        if not item_name or quantity <= 0:
+            invalid_lines.append({"item": item_name, "quantity": line.get("quantity"), "reason": "Invalid item or quantity."})
+            continue
+        entry = totals.setdefault(item_name.lower(), {"item": item_name, "quantity": 0})
+        entry["quantity"] += quantity
+    return totals, invalid_lines
+
+def reserve_order(order_lines: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Atomically takes every line of an order out of stock.
+
+    Args:
+        order_lines: Order lines as kept in the kiosk, e.g. [{"item": "Fries", "quantity": 2}].
+
+    Returns:
+        A dictionary with "success", "reservation_id" (None on failure) and
+        "failed_lines", a list of {"item", "quantity", "reason"} entries. On
+        failure nothing is taken out of stock.
+    """
+    totals, invalid_lines = _aggregate_order_lines(order_lines)
+    if invalid_lines:
+        return {"success": False, "reservation_id": None, "failed_lines": invalid_lines}
+    if not totals:
+        return {"success": False, "reservation_id": None,
+                "failed_lines": [{"item": None, "quantity": 0, "reason": "Order is empty."}]}
+
+    def work(conn: sqlite3.Connection) -> Dict[str, Any]:
+        failed_keys = []
+        changes = []
+        for key, entry in totals.items():
+            row = conn.execute(
+                "UPDATE menu_items SET quantity = quantity - ? WHERE name = ? COLLATE NOCASE AND quantity >= ? RETURNING id, quantity",
+                (entry["quantity"], entry["item"], entry["quantity"]),
+            ).fetchone()
+            if row is None:
+                failed_keys.append(key)
+            else:
+                changes.append((row["id"], -entry["quantity"], row["quantity"]))
+        if failed_keys:
+            raise RollbackWork({"failed_keys": failed_keys}) # Undoes this order's decrements only
+
+        now = time.time()
+        cursor = conn.execute(
+            "INSERT INTO order_reservations (status, lines, created_at, updated_at) VALUES ('reserved', ?, ?, ?)",
+            (json.dumps(list(totals.values())), now, now),
+        )
+        reference = f"reservation:{cursor.lastrowid}"
+        _record_ledger(conn, [(item_id, change, "sale", reference, quantity_after) for item_id, change, quantity_after in changes])
+        _record_sales(conn, [(item_id, -change) for item_id, change, _ in changes])
+        return {"reservation_id": cursor.lastrowid}
+
+    try:
+        # Runs in the inventory writer's next IMMEDIATE transaction, under its
+        # own savepoint, so a failed line rolls back this order alone.
+        outcome = inventory_writer.execute(work)
+    except sqlite3.Error as e:
+        print(f"{_write_failure(e)} reserving order: {e}")
+        return {
+            "success": False,
+            "reservation_id": None,
+            "failed_lines": [dict(entry, reason=f"{_write_failure(e)}: {e}") for entry in totals.values()],
+        }
+    if "reservation_id" in outcome:
+        return {"success": True, "reservation_id": outcome["reservation_id"], "failed_lines": []}
+    failed_keys = outcome["failed_keys"]
+
+    # Work out why each failed line failed, outside the write transaction
+    available = get_item_quantities([totals[key]["item"] for key in failed_keys])
+    failed_lines = []
+    for key in failed_keys:
+        entry = totals[key]
+        available_quantity = available.get(entry["item"])
+        if available_quantity is None:
+            reason = "Item not found on menu."
+        elif available_quantity == 0:
+            reason = "Out of stock."
+        else:
+            reason = f"Insufficient stock. Only {available_quantity} available."
+        failed_lines.append(dict(entry, reason=reason))
+    print(f"Reservation failed for {len(failed_lines)} item(s): {failed_lines}")
+    return {"success": False, "reservation_id": None, "failed_lines": failed_lines}
+
+def commit_order(reservation_id: int, order_lines: Optional[List[Dict[str, Any]]] = None) -> bool:
+    """Finalizes a reservation and records the confirmed order; the stock stays taken.
+
+    Args:
+        reservation_id: The reservation from reserve_order().
+        order_lines: The order as confirmed, ideally priced lines from
+            pricing.price_order() so the history keeps details and the prices
+            the customer saw. Defaults to the reservation's lines at menu prices.
+
+    Returns True if the reservation existed and was still pending.
+    """
+    def work(conn: sqlite3.Connection) -> bool:
+        now = time.time()
+        row = conn.execute(
+            "UPDATE order_reservations SET status = 'committed', updated_at = ? WHERE id = ? AND status = 'reserved' RETURNING lines",
+            (now, reservation_id),
+        ).fetchone()
+        if row is None:
+            return False
+        _record_order(conn, reservation_id, order_lines if order_lines is not None else json.loads(row["lines"]), now)
         return True
+
+    try:
+        committed = inventory_writer.execute(work)
     except sqlite3.Error as e:
-        print(f"Database error updating quantity for '{item_name}': {e}")
-        conn.rollback()
+        print(f"{_write_failure(e)} committing reservation {reservation_id}: {e}")
         return False
-    finally:
-        conn.close()
+    if not committed:
+        print(f"Error: Reservation {reservation_id} not found or no longer pending.")
+    return committed
+
+def release_order(reservation_id: int) -> bool:
+    """Cancels a pending reservation and puts its stock back, in one transaction.
+
+    Returns True if the reservation existed and was still pending.
+    """
+    def work(conn: sqlite3.Connection) -> bool:
+        row = conn.execute(
+            "SELECT lines, created_at FROM order_reservations WHERE id = ? AND status = 'reserved'", (reservation_id,)
+        ).fetchone()
+        if not row:
+            return False
+        reference = f"reservation:{reservation_id}"
+        entries = []
+        for line in json.loads(row["lines"]):
+            restored = conn.execute(
+                "UPDATE menu_items SET quantity = quantity + ? WHERE name = ? COLLATE NOCASE RETURNING id, quantity",
+                (line["quantity"], line["item"]),
+            ).fetchone()
+            if restored is not None:
+                entries.append((restored["id"], line["quantity"], "release", reference, restored["quantity"]))
+        _record_ledger(conn, entries)
+        # Take the units back off the day they were sold
+        _record_sales(conn, [(item_id, -units) for item_id, units, _, _, _ in entries], local_day(row["created_at"]))
+        conn.execute(
+            "UPDATE order_reservations SET status = 'released', updated_at = ? WHERE id = ?",
+            (time.time(), reservation_id),
+        )
+        return True
+
+    try:
+        released = inventory_writer.execute(work)
+    except sqlite3.Error as e:
+        print(f"{_write_failure(e)} releasing reservation {reservation_id}: {e}")
+        return False
+    if not released:
+        print(f"Error: Reservation {reservation_id} not found or no longer pending.")
+    return released
+
+# --- Order History ---
+# Every confirmed order is written to orders/order_lines by commit_order(), in
+# the same transaction as the commit, and folded into three rollups: volume per
+# hour, units/revenue per item per day and item pairs per day. The lines of an
+# order go in with executemany, and the inventory writer commits the orders of
+# concurrent lanes together. The aggregation queries below read only the
+# rollups, so their cost depends on the number of days and items in the range,
+# not on the number of orders.
+
+TOP_SELLERS_ORDER_BY = {"units": "units", "revenue": "revenue_cents", "orders": "orders"}
+
+def local_hour(timestamp: Optional[float] = None) -> int:
+    """Hours since 1970-01-01 00:00 in local time, the hour key of order_volume_hourly."""
+    timestamp = time.time() if timestamp is None else timestamp
+    return int((timestamp + time.localtime(timestamp).tm_gmtoff) // 3600)
+
+def _local_hour_label(hour: int) -> str:
+    """Formats a local_hour() key as local wall-clock time, e.g. '2025-05-02 13:00'."""
+    return time.strftime("%Y-%m-%d %H:00", time.gmtime(hour * 3600))
+
+def _record_order(conn: sqlite3.Connection, reservation_id: Optional[int], order_lines: List[Dict[str, Any]], created_at: float) -> int:
+    """Inserts one confirmed order with its lines and adds it to the rollups; returns the order id."""
+    names = list({(line.get("item") or "").lower() for line in order_lines})
+    menu = {
+        row["name"].lower(): row
+        for row in conn.execute(
+            f"SELECT id, name, CAST(ROUND(price * 100) AS INTEGER) AS price_cents FROM menu_items "
+            f"WHERE name COLLATE NOCASE IN ({', '.join('?' * len(names))})",
+            names,
+        )
+    } if names else {}
+
+    lines = []
+    for line in order_lines:
+        item_name = line.get("item") or ""
+        try:
+            quantity = int(line.get("quantity", 1))
+        except (ValueError, TypeError):
+            quantity = 1 # Same fallback as pricing.price_order
+        menu_row = menu.get(item_name.lower())
+        unit_price_cents = line.get("unit_price_cents")
+        if unit_price_cents is None:
+            unit_price_cents = menu_row["price_cents"] if menu_row else 0
+        lines.append((menu_row["id"] if menu_row else None, item_name, line.get("details"), quantity, int(unit_price_cents)))
+
+    total_cents = sum(quantity * price for _, _, _, quantity, price in lines)
+    units = sum(quantity for _, _, _, quantity, _ in lines)
+    order_id = conn.execute(
+        "INSERT INTO orders (reservation_id, created_at, total_cents, units) VALUES (?, ?, ?, ?)",
+        (reservation_id, created_at, total_cents, units),
+    ).lastrowid
+    conn.executemany(
+        "INSERT INTO order_lines (order_id, line_no, item_id, item_name, details, quantity, unit_price_cents) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(order_id, line_no) + line for line_no, line in enumerate(lines)],
+    )
+
+    conn.execute(
+        "INSERT INTO order_volume_hourly (hour, orders, units, revenue_cents) VALUES (?, 1, ?, ?) "
+        "ON CONFLICT (hour) DO UPDATE SET orders = orders + 1, units = units + excluded.units, "
+        "revenue_cents = revenue_cents + excluded.revenue_cents",
+        (local_hour(created_at), units, total_cents),
+    )
+    day = local_day(created_at)
+    per_item: Dict[int, List[int]] = {}
+    for item_id, _, _, quantity, price in lines:
+        if item_id is not None:
+            totals = per_item.setdefault(item_id, [0, 0])
+            totals[0] += quantity
+            totals[1] += quantity * price
+    conn.executemany(
+        "INSERT INTO item_sales_rollup (day, item_id, orders, units, revenue_cents) VALUES (?, ?, 1, ?, ?) "
+        "ON CONFLICT (day, item_id) DO UPDATE SET orders = orders + 1, units = units + excluded.units, "
+        "revenue_cents = revenue_cents + excluded.revenue_cents",
+        [(day, item_id, item_units, revenue) for item_id, (item_units, revenue) in per_item.items()],
+    )
+    conn.executemany(
+        "INSERT INTO item_pairs_rollup (day, item_id, paired_item_id, orders) VALUES (?, ?, ?, 1) "
+        "ON CONFLICT (day, item_id, paired_item_id) DO UPDATE SET orders = orders + 1",
+        [(day, item_id, paired_item_id) for item_id in per_item for paired_item_id in per_item if paired_item_id != item_id],
+    )
+    return order_id
+
+def record_orders(orders: List[Dict[str, Any]]) -> List[int]:
+    """Records already-confirmed orders (e.g. imported history) in one transaction.
+
+    Args:
+        orders: Dictionaries with "lines" (as for commit_order) and optionally
+            "created_at" (a timestamp; defaults to now).
+
+    Returns:
+        The new order ids, in input order; an empty list if the transaction
+        couldn't be committed (nothing is recorded then).
+    """
+    def work(conn: sqlite3.Connection) -> List[int]:
+        now = time.time()
+        return [_record_order(conn, None, order["lines"], order.get("created_at", now)) for order in orders]
+
+    try:
+        return inventory_writer.execute(work)
+    except sqlite3.Error as e:
+        print(f"{_write_failure(e)} recording {len(orders)} order(s): {e}")
+        return []
+
+def _day_range(days: int, until_day: Optional[int]) -> Tuple[int, int]:
+    last_day = local_day() if until_day is None else until_day
+    return last_day - max(days, 1) + 1, last_day
+
+def get_top_sellers(days: int = 7, limit: int = 10, by: str = "units", until_day: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Best-selling items over the `days` local days ending with until_day (today by default).
+
+    Args:
+        by: "units", "revenue" or "orders" (orders containing the item).
+
+    Returns:
+        Up to `limit` {"item_name", "orders", "units", "revenue_cents"} dictionaries, best first.
+    """
+    if by not in TOP_SELLERS_ORDER_BY:
+        raise ValueError(f"by must be one of {sorted(TOP_SELLERS_ORDER_BY)}")
+    first_day, last_day = _day_range(days, until_day)
+    conn = get_db_connection()
+    rows = conn.execute(
+        f"""
+        SELECT COALESCE(m.name, 'Item #' || r.item_id) AS item_name, r.orders, r.units, r.revenue_cents
+        FROM (
+            SELECT item_id, SUM(orders) AS orders, SUM(units) AS units, SUM(revenue_cents) AS revenue_cents
+            FROM item_sales_rollup WHERE day BETWEEN ? AND ? GROUP BY item_id
+        ) AS r LEFT JOIN menu_items m ON m.id = r.item_id
+        ORDER BY r.{TOP_SELLERS_ORDER_BY[by]} DESC, item_name LIMIT ?
+        """,
+        (first_day, last_day, limit),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+def get_hourly_volume(hours: int = 24, until_hour: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Orders, units and revenue per local hour for the `hours` hours ending with until_hour (the current hour by default).
+
+    Hours without orders are included with zeros, oldest first.
+    """
+    last_hour = local_hour() if until_hour is None else until_hour
+    first_hour = last_hour - max(hours, 1) + 1
+    conn = get_db_connection()
+    found = {
+        row["hour"]: row
+        for row in conn.execute(
+            "SELECT hour, orders, units, revenue_cents FROM order_volume_hourly WHERE hour BETWEEN ? AND ?",
+            (first_hour, last_hour),
+        )
+    }
+    volume = []
+    for hour in range(first_hour, last_hour + 1):
+        row = found.get(hour)
+        volume.append({
+            "hour": _local_hour_label(hour),
+            "orders": row["orders"] if row else 0,
+            "units": row["units"] if row else 0,
+            "revenue_cents": row["revenue_cents"] if row else 0,
+        })
+    return volume
+
+def get_volume_by_hour_of_day(days: int = 28, until_day: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Average orders, units and revenue per day for each local hour of the day (0-23) over `days` days."""
+    first_day, last_day = _day_range(days, until_day)
+    conn = get_db_connection()
+    found = {
+        row["hour_of_day"]: row
+        for row in conn.execute(
+            "SELECT hour % 24 AS hour_of_day, SUM(orders) AS orders, SUM(units) AS units, SUM(revenue_cents) AS revenue_cents "
+            "FROM order_volume_hourly WHERE hour BETWEEN ? AND ? GROUP BY hour_of_day",
+            (first_day * 24, last_day * 24 + 23),
+        )
+    }
+    span = last_day - first_day + 1
+    return [
+        {
+            "hour_of_day": hour_of_day,
+            "orders": found[hour_of_day]["orders"] / span if hour_of_day in found else 0.0,
+            "units": found[hour_of_day]["units"] / span if hour_of_day in found else 0.0,
+            "revenue_cents": found[hour_of_day]["revenue_cents"] / span if hour_of_day in found else 0.0,
+        }
+        for hour_of_day in range(24)
+    ]
+
+def get_attach_rates(item_name: str, days: int = 28, limit: int = 10, until_day: Optional[int] = None) -> Dict[str, Any]:
+    """How often other items are bought together with item_name.
+
+    Returns:
+        {"item_name", "orders" (orders containing the item) and "attached"}, where
+        attached lists up to `limit` {"item_name", "orders", "rate"} entries, rate
+        being the share of those orders that also contained the other item.
+    """
+    first_day, last_day = _day_range(days, until_day)
+    conn = get_db_connection()
+    item = conn.execute("SELECT id, name FROM menu_items WHERE name = ? COLLATE NOCASE", (item_name,)).fetchone()
+    if item is None:
+        return {"item_name": item_name, "orders": 0, "attached": []}
+    base_orders = conn.execute(
+        "SELECT COALESCE(SUM(orders), 0) FROM item_sales_rollup WHERE day BETWEEN ? AND ? AND item_id = ?",
+        (first_day, last_day, item["id"]),
+    ).fetchone()[0]
+    rows = conn.execute(
+        """
+        SELECT COALESCE(m.name, 'Item #' || p.paired_item_id) AS item_name, p.orders
+        FROM (
+            SELECT paired_item_id, SUM(orders) AS orders FROM item_pairs_rollup
+            WHERE day BETWEEN ? AND ? AND item_id = ? GROUP BY paired_item_id
+        ) AS p LEFT JOIN menu_items m ON m.id = p.paired_item_id
+        ORDER BY p.orders DESC, item_name LIMIT ?
+        """,
+        (first_day, last_day, item["id"], limit),
+    ).fetchall()
+    return {
+        "item_name": item["name"],
+        "orders": base_orders,
+        "attached": [
+            {"item_name": row["item_name"], "orders": row["orders"], "rate": row["orders"] / base_orders if base_orders else 0.0}
+            for row in rows
+        ],
+    }
+
+def get_sales_version() -> int:
+    """Id of the latest recorded order: changes whenever an order is recorded, so caches of sales figures can key on it."""
+    conn = get_db_connection()
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()[0]
+
+def get_order_lines(order_id: int) -> List[Dict[str, Any]]:
+    """Returns the recorded lines of one confirmed order."""
+    conn = get_db_connection()
+    return [dict(row) for row in conn.execute(
+        "SELECT item_id, item_name, details, quantity, unit_price_cents FROM order_lines WHERE order_id = ? ORDER BY line_no",
+        (order_id,),
+    )]
 
 # Example Usage (can be run directly for testing)
 # if __name__ == "__main__":
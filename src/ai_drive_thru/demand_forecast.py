@@ -0,0 +1,121 @@
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.ai_drive_thru.db_utils import get_daily_sales, local_day
+
+# --- Demand Forecasting ---
+# Per-item reorder points and quantities from recorded sales, replacing the one
+# LOW_STOCK_THRESHOLD / REORDER_QUANTITY rule for every item. Daily sales
+# (sales_daily) become an items x days matrix. Each item's demand is split into
+# a day-of-week profile and a deseasonalized level that is exponentially
+# smoothed. Every step is an array operation across all items and days at once,
+# so years of history for hundreds of items take milliseconds.
+#
+# Only the last HISTORY_DAYS are read: older days carry no weight in the
+# smoothed level (0.8 ** 182 is ~1e-18) and the weekday profile uses the same
+# recent weeks, so the cost stays flat as sales_daily grows over the years.
+#
+# Policy: reorder when stock falls below the demand expected over the restock
+# lead time plus safety stock (SERVICE_LEVEL_Z standard deviations of daily
+# demand, scaled to the lead time); then order COVERAGE_DAYS of expected demand.
+
+SMOOTHING_ALPHA = 0.2 # Weight of the most recent day in the smoothed level
+SEASONALITY_WEEKS = 26 # Recent weeks used for the day-of-week profile
+HISTORY_DAYS = SEASONALITY_WEEKS * 7 # Sales history read per forecast
+SEASONALITY_PRIOR_DAYS = 4.0 # Pulls sparse weekday profiles toward flat
+MIN_HISTORY_DAYS = 14 # Items sold for fewer days keep the global rule
+LEAD_TIME_DAYS = 1 # Days between ordering and the stock arriving
+COVERAGE_DAYS = 3 # Days of demand each reorder covers
+SERVICE_LEVEL_Z = 1.65 # ~95% chance of not running out during the lead time
+
+@dataclass
+class DemandForecast:
+    """Forecast for every item with enough history; arrays are aligned with item_ids."""
+    item_ids: np.ndarray
+    level: np.ndarray # Deseasonalized units per day
+    weekday_factors: np.ndarray # items x 7 (Monday first), averaging 1
+    daily_sd: np.ndarray # Standard deviation of daily demand
+    today: int # local_day() the forecast was made on
+
+    def expected_demand(self, start_offset: int, days: int) -> np.ndarray:
+        """Units expected per item over `days` days starting `start_offset` days after today."""
+        weekdays = weekday(self.today + start_offset + np.arange(days))
+        return self.level * self.weekday_factors[:, weekdays].sum(axis=1)
+
+def weekday(day):
+    """Monday = 0 for local_day() values (1970-01-01 was a Thursday)."""
+    return (day + 3) % 7
+
+def demand_matrix(item_ids: np.ndarray, days: np.ndarray, units: np.ndarray, first_day: int, last_day: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sums units into an items x days matrix; returns (unique item ids, matrix)."""
+    unique_ids, rows = np.unique(item_ids, return_inverse=True)
+    width = last_day - first_day + 1
+    in_range = (days >= first_day) & (days <= last_day)
+    flat = rows[in_range] * width + (days[in_range] - first_day)
+    matrix = np.bincount(flat, weights=units[in_range], minlength=len(unique_ids) * width)
+    return unique_ids, np.maximum(matrix.reshape(len(unique_ids), width), 0.0)
+
+def forecast_demand(item_ids: np.ndarray, days: np.ndarray, units: np.ndarray, today: int,
+                    history_days: int = HISTORY_DAYS, alpha: float = SMOOTHING_ALPHA) -> DemandForecast:
+    """Fits level, weekday profile and variability for every item from (item_id, day, units) arrays.
+
+    Only completed days (before today) are used. Items whose first sale is less
+    than MIN_HISTORY_DAYS ago are left out.
+    """
+    first_day, last_day = today - history_days, today - 1
+    ids, demand = demand_matrix(item_ids, days, units, first_day, last_day)
+    if not len(ids):
+        empty = np.zeros(0)
+        return DemandForecast(ids, empty, np.ones((0, 7)), empty, today)
+
+    # History starts at each item's first sale; earlier days are not zero demand
+    sold = demand > 0
+    first_sale = np.where(sold.any(axis=1), sold.argmax(axis=1), demand.shape[1])
+    keep = demand.shape[1] - first_sale >= MIN_HISTORY_DAYS
+    ids, demand, first_sale = ids[keep], demand[keep], first_sale[keep]
+    active = np.arange(demand.shape[1]) >= first_sale[:, None]
+    day_weekdays = weekday(np.arange(first_day, last_day + 1))
+
+    # Day-of-week profile over recent weeks, shrunk toward flat where data is thin
+    recent = active & (np.arange(demand.shape[1]) >= demand.shape[1] - SEASONALITY_WEEKS * 7)
+    one_hot = np.eye(7)[day_weekdays] # days x 7
+    weekday_totals = (demand * recent) @ one_hot
+    weekday_counts = recent.astype(float) @ one_hot
+    mean = weekday_totals.sum(axis=1) / np.maximum(weekday_counts.sum(axis=1), 1)
+    weekday_means = (weekday_totals + SEASONALITY_PRIOR_DAYS * mean[:, None]) / (weekday_counts + SEASONALITY_PRIOR_DAYS)
+    factors = np.divide(weekday_means, mean[:, None], out=np.ones_like(weekday_means), where=mean[:, None] > 0)
+
+    # Exponentially weighted level and spread of the deseasonalized series: the
+    # smoothing recursion unrolled into one weighted sum per item
+    deseasonalized = demand / np.maximum(factors[:, day_weekdays], 1e-6)
+    age = demand.shape[1] - 1 - np.arange(demand.shape[1])
+    weights = alpha * (1 - alpha) ** age * active
+    weights /= np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+    level = (weights * deseasonalized).sum(axis=1)
+    daily_sd = np.sqrt((weights * (deseasonalized - level[:, None]) ** 2).sum(axis=1))
+    return DemandForecast(ids, level, factors, daily_sd, today)
+
+def reorder_rules(forecast: DemandForecast, lead_time_days: int = LEAD_TIME_DAYS, coverage_days: int = COVERAGE_DAYS,
+                  service_level_z: float = SERVICE_LEVEL_Z) -> Dict[int, Tuple[int, int]]:
+    """Turns a forecast into {item_id: (reorder_point, reorder_quantity)}."""
+    lead_demand = forecast.expected_demand(1, lead_time_days)
+    safety_stock = service_level_z * forecast.daily_sd * math.sqrt(lead_time_days)
+    points = np.ceil(lead_demand + safety_stock).astype(int)
+    quantities = np.ceil(forecast.expected_demand(1 + lead_time_days, coverage_days)).astype(int)
+    return {
+        int(item_id): (max(int(point), 1), max(int(quantity), 1))
+        for item_id, point, quantity in zip(forecast.item_ids, points, quantities)
+    }
+
+def compute_reorder_rules(now: Optional[float] = None) -> Dict[int, Tuple[int, int]]:
+    """Forecasts from the recorded sales and returns per-item reorder rules (see reorder_rules)."""
+    today = local_day(time.time() if now is None else now)
+    rows = get_daily_sales(today - HISTORY_DAYS)
+    if not rows:
+        return {}
+    item_ids, days, units = np.array(rows, dtype=np.int64).T
+    return reorder_rules(forecast_demand(item_ids, days, units.astype(float), today))
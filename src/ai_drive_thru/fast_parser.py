@@ -0,0 +1,478 @@
+import re
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+from src.ai_drive_thru.menu_cache import MenuSnapshot
+
+# --- Deterministic Fast-Path Order Parser ---
+# Most drive-thru utterances ("two cheeseburgers and a fries", "remove the salad")
+# are simple enough to parse without an LLM round trip. This parser understands
+# number words, plurals, menu aliases and add/remove verbs, and returns the same
+# {"status": "success", "actions": [...]} structure as the OrderTaker prompt.
+# It is deliberately conservative: any word it does not recognize, any item
+# that needs a flavor choice it was not given, or anything not currently in
+# stock makes it return None so the caller falls back to the LLM.
+# A remove verb covers the items joined to it by "and" ("remove the fries and
+# the salad"); after a comma or full stop the clause needs its own verb, so
+# "no fries, two cheeseburgers" goes to the LLM rather than removing both.
+# Words whose meaning depends on context ("to", "for", "without", a "no" that
+# isn't the first word, and "actually" / "just", which usually correct an
+# earlier item: "actually two fries") are not in the tables at all, for the
+# same reason.
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "another": 1, "single": 1,
+    "two": 2, "couple": 2, "pair": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "eleven": 11, "twelve": 12, "dozen": 12,
+}
+MAX_FAST_PATH_QUANTITY = 20 # Larger quantities are unusual enough to double-check with the LLM
+
+# Phrases that carry no meaning for the order. Multi-word phrases are matched
+# before single words (see _build_phrase_table below).
+FILLER_PHRASES = [
+    "please", "thanks", "thank you", "the", "my", "some", "of", "more", "order",
+    "i'd like", "i would like", "id like", "i'll have", "ill have", "i will have",
+    "i'll take", "i will take", "can i get", "can i have", "could i get", "could i have",
+    "may i have", "let me get", "let me have", "get me", "give me", "gimme", "i want",
+    "i need", "we'll have", "we will have", "we want", "we'd like", "can we get",
+    "also", "too", "as well", "yes", "ok", "okay", "um", "uh", "and then",
+    "to order", "to get", "to have", "to my order", "to the order", "to our order",
+    "from my order", "from the order", "from our order", "for me", "for us",
+]
+ADD_PHRASES = ["add", "plus", "and add", "throw in"]
+REMOVE_PHRASES = [
+    "remove", "take off", "take away", "cancel", "drop", "delete",
+    "scratch", "get rid of", "don't want", "do not want", "i don't want",
+]
+# Remove verbs that only count as the first word of the utterance ("no fries");
+# later on, "no" is as likely to start a correction or an answer.
+LEADING_REMOVE_PHRASES = ["no"]
+CONJUNCTIONS = ["and", "&"]
+# Punctuation that ends a clause; the parser sees it as a CLAUSE_BREAK token
+CLAUSE_SEPARATOR = re.compile(r"[,;.!?\n]+")
+CLAUSE_BREAK = ","
+
+# Alternative names for menu items: alias -> exact menu name. Plurals and the
+# lower-cased menu names themselves are generated from the live menu.
+ITEM_ALIASES = {
+    "cheese burger": "Cheeseburger",
+    "cheese burgers": "Cheeseburger",
+    "veggie": "Veggie Burger",
+    "veggies burger": "Veggie Burger",
+    "vegetarian burger": "Veggie Burger",
+    "fry": "Fries",
+    "french fries": "Fries",
+    "french fry": "Fries",
+    "pop": "Soda",
+    "soft drink": "Soda",
+    "drink": "Soda",
+    "shake": "Milkshake",
+    "milk shake": "Milkshake",
+    "chicken sandwhich": "Chicken Sandwich",
+    "garden salad": "Salad",
+}
+
+# Items that need a flavor choice, and the words naming each flavor. An item
+# listed here without a flavor is ambiguous and goes to the LLM, which asks
+# the customer to clarify (OrderTaker prompt, rule 8).
+VARIANT_OPTIONS = {
+    "Soda": {"cola": "Cola", "lemon-lime": "Lemon-Lime", "lemon lime": "Lemon-Lime", "orange": "Orange"},
+    "Milkshake": {"chocolate": "Chocolate", "vanilla": "Vanilla", "strawberry": "Strawberry"},
+}
+# Words that name both the item and its flavor, e.g. "two cokes" -> Soda (Cola)
+VARIANT_ALIASES = {
+    "coke": ("Soda", "Cola"),
+    "cokes": ("Soda", "Cola"),
+    "sprite": ("Soda", "Lemon-Lime"),
+    "sprites": ("Soda", "Lemon-Lime"),
+}
+
+def pluralize(word: str) -> str:
+    """Naive English plural for menu words: 'salad' -> 'salads', 'sandwich' -> 'sandwiches'."""
+    if word.endswith(("s", "sh", "ch", "x")):
+        return word + "es"
+    return word + "s"
+
+def _normalize(text: str) -> List[str]:
+    """Lower-cases text and splits it into word tokens, keeping digits, hyphens and apostrophes."""
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"[^a-z0-9'&\-]+", " ", text)
+    return [token.strip("'-") for token in text.split() if token.strip("'-")]
+
+def _build_phrase_table(snapshot: MenuSnapshot) -> Tuple[Dict[Tuple[str, ...], Tuple[str, Any]], int]:
+    """Builds the token-tuple -> (kind, value) lookup used by the parser for one menu.
+
+    Only in-stock items are matchable; anything else falls back to the LLM so
+    it can explain that the item is unavailable.
+    """
+    table: Dict[Tuple[str, ...], Tuple[str, Any]] = {}
+
+    def add(phrase: str, kind: str, value: Any) -> None:
+        table.setdefault(tuple(_normalize(phrase)), (kind, value))
+
+    in_stock = {item['name'] for item in snapshot.in_stock_items}
+    for name in in_stock:
+        add(name, "item", name)
+        words = name.lower().split()
+        add(" ".join(words[:-1] + [pluralize(words[-1])]), "item", name)
+    for alias, name in ITEM_ALIASES.items():
+        if name in in_stock:
+            add(alias, "item", name)
+            add(pluralize(alias), "item", name)
+    for alias, (name, flavor) in VARIANT_ALIASES.items():
+        if name in in_stock:
+            add(alias, "item_with_flavor", (name, flavor))
+    for name, flavors in VARIANT_OPTIONS.items():
+        if name in in_stock:
+            for word, flavor in flavors.items():
+                add(word, "flavor", (name, flavor))
+    for phrase in REMOVE_PHRASES:
+        add(phrase, "remove", None)
+    for phrase in LEADING_REMOVE_PHRASES:
+        add(phrase, "leading_remove", None)
+    for phrase in ADD_PHRASES:
+        add(phrase, "add", None)
+    for phrase in CONJUNCTIONS:
+        add(phrase, "conjunction", None)
+    for phrase in FILLER_PHRASES:
+        add(phrase, "filler", None)
+    for word, number in NUMBER_WORDS.items():
+        add(word, "number", number)
+
+    longest = max(len(key) for key in table)
+    return table, longest
+
+_phrase_table_cache: Dict[int, Tuple[Dict[Tuple[str, ...], Tuple[str, Any]], int]] = {}
+_phrase_table_lock = threading.Lock()
+
+def _get_phrase_table(snapshot: MenuSnapshot) -> Tuple[Dict[Tuple[str, ...], Tuple[str, Any]], int]:
+    """Returns the phrase table for a snapshot, building it once per menu version."""
+    cached = _phrase_table_cache.get(snapshot.version)
+    if cached is None:
+        cached = _build_phrase_table(snapshot)
+        with _phrase_table_lock:
+            _phrase_table_cache.clear() # Only the current menu version is worth keeping
+            _phrase_table_cache[snapshot.version] = cached
+    return cached
+
+def join_phrases(phrases: List[str]) -> str:
+    """Joins phrases as natural English: 'a', 'a and b', 'a, b and c'."""
+    if len(phrases) <= 1:
+        return "".join(phrases)
+    return f"{', '.join(phrases[:-1])} and {phrases[-1]}"
+
+def _describe(action: Dict[str, Any]) -> str:
+    quantity = action["quantity"]
+    name = action["item"]
+    if action.get("details"):
+        name = f"{action['details']} {name}"
+    if quantity != 1 and not name.endswith("s"):
+        name = pluralize(name)
+    return f"{quantity} {name}"
+
+def parse_order_fast(text_input: str, snapshot: MenuSnapshot) -> Optional[Dict[str, Any]]:
+    """Parses a simple add/remove utterance without the LLM.
+
+    Args:
+        text_input: The raw text input from the customer.
+        snapshot: The current menu snapshot (only in-stock items are recognized).
+
+    Returns:
+        An OrderTaker-style {"status": "success", "actions": [...], "message": ...}
+        dictionary when every word was understood, otherwise None.
+    """
+    tokens: List[str] = []
+    for clause in CLAUSE_SEPARATOR.split(text_input or ""):
+        clause_tokens = _normalize(clause)
+        if clause_tokens:
+            tokens += clause_tokens + [CLAUSE_BREAK]
+    if not tokens:
+        return None
+    table, longest = _get_phrase_table(snapshot)
+
+    actions: List[Dict[str, Any]] = []
+    action_type = "add"
+    needs_verb = False # A remove clause ended; the next item needs its own verb
+    pending_quantity: Optional[int] = None
+    pending_flavor: Optional[Tuple[str, str]] = None
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token == CLAUSE_BREAK:
+            if pending_quantity is not None or pending_flavor is not None:
+                return None # e.g. "two, fries"
+            needs_verb = needs_verb or action_type == "remove"
+            action_type = "add"
+            i += 1
+            continue
+        # Longest phrase starting at this token wins ("french fries" over "french")
+        match = None
+        for length in range(min(longest, len(tokens) - i), 0, -1):
+            match = table.get(tuple(tokens[i:i + length]))
+            if match:
+                break
+        if match is None:
+            if token.isdigit():
+                length, match = 1, ("number", int(token))
+            else:
+                return None # Unknown word: not confident, let the LLM handle it
+        kind, value = match
+        if kind == "leading_remove":
+            if i != 0 or tokens[i + length] == CLAUSE_BREAK:
+                return None # e.g. "no, two fries" or "fries no salad"
+            kind = "remove"
+        i += length
+
+        if kind == "filler":
+            continue
+        if kind in ("add", "remove"):
+            if pending_quantity is not None or pending_flavor is not None:
+                return None # e.g. "two remove fries"
+            action_type = kind
+            needs_verb = False
+            continue
+        if kind == "conjunction":
+            if pending_quantity is not None or pending_flavor is not None:
+                return None # e.g. "two and fries"
+            continue
+        if kind == "number":
+            if pending_quantity is not None:
+                return None # e.g. "two three fries"
+            pending_quantity = value
+            continue
+        if kind == "flavor":
+            if pending_flavor is not None:
+                return None # e.g. "chocolate vanilla shake" is a question for a human
+            pending_flavor = value
+            continue
+
+        if needs_verb:
+            return None # e.g. "no fries, two cheeseburgers": add them, or remove those too?
+        # An item, possibly with its flavor implied by the word itself
+        if kind == "item_with_flavor":
+            if pending_flavor is not None:
+                return None
+            item_name, details = value
+        else:
+            item_name, details = value, None
+            if pending_flavor is not None:
+                if pending_flavor[0] != item_name:
+                    return None # e.g. "orange milkshake"
+                details = pending_flavor[1]
+        if item_name in VARIANT_OPTIONS and details is None:
+            return None # Flavor needed (adding) or ambiguous which one (removing)
+
+        quantity = pending_quantity if pending_quantity is not None else 1
+        if quantity <= 0 or quantity > MAX_FAST_PATH_QUANTITY:
+            return None
+        action = {"action": action_type, "item": item_name, "quantity": quantity}
+        if details:
+            action["details"] = details
+        actions.append(action)
+        pending_quantity = None
+        pending_flavor = None
+
+    if not actions or pending_quantity is not None or pending_flavor is not None:
+        return None
+
+    added = [_describe(action) for action in actions if action["action"] == "add"]
+    removed = [_describe(action) for action in actions if action["action"] == "remove"]
+    message_parts = []
+    if added:
+        message_parts.append(f"added {join_phrases(added)}")
+    if removed:
+        message_parts.append(f"removed {join_phrases(removed)}")
+    message = f"Okay, I've {' and '.join(message_parts)}."
+    return {"status": "success", "actions": actions, "message": message, "source": "fast_path"}
+
+# --- Admin Command Fast Path ---
+# The manager's most common commands are stock queries ("how many fries do we
+# have") and reorders ("order 20 fries", "restock buns by 30"). A handful of
+# sentence patterns cover them. The item phrase they capture must name exactly
+# one menu item (by name, plural or alias), and the quantity must be a number;
+# a list of such commands becomes one batch.
+# Anything else returns None and goes to the AdminManager LLM as before. The
+# result has the same shape as the AdminManager prompt's JSON.
+
+ADMIN_POLITE_PREFIXES = ("please", "can you", "could you", "can we", "could we", "would you", "hey", "ok", "okay", "go ahead and")
+ADMIN_POLITE_SUFFIXES = ("please", "thanks", "thank you")
+ADMIN_QUERY_PATTERNS = [
+    re.compile(r"^how (?:many|much) (?P<item>.+?)(?: do we have| have we got| are there| is there| do we have left| do we have in stock"
+               r"| are left| is left| left| in stock| remaining)?$"),
+    re.compile(r"^(?:what is |what's |whats |check |show |show me |get )?(?:the )?(?:stock|inventory|quantity|count|stock level) (?:of|for) (?P<item>.+)$"),
+    re.compile(r"^(?:check |show |show me )?(?:the )?(?P<item>.+?) (?:stock|inventory|count|stock level)$"),
+    re.compile(r"^(?:do we have|are there|is there) (?:any )?(?P<item>.+?)(?: left| in stock)?$"),
+]
+ADMIN_ORDER_PATTERNS = [
+    re.compile(r"^add (?P<quantity>\S+) (?:units )?to (?:the )?(?P<item>.+?)(?: stock| inventory)?$"),
+    re.compile(r"^(?:order|reorder|restock|add|buy|get|purchase) (?P<quantity>\S+) (?:more )?(?:units of |of )?(?P<item>.+)$"),
+    re.compile(r"^(?:order|reorder|restock|add|buy|get|purchase) (?:more )?(?P<item>.+?) (?:by |with |x ?)?(?P<quantity>\d+)(?: more| units)?$"),
+]
+
+def _build_admin_item_table(snapshot: MenuSnapshot) -> Dict[str, str]:
+    """Phrase -> menu name for every menu item (in stock or not): names, plurals and aliases."""
+    table: Dict[str, str] = {}
+    names = {item['name'] for item in snapshot.items}
+    for name in names:
+        words = _normalize(name)
+        table.setdefault(" ".join(words), name)
+        table.setdefault(" ".join(words[:-1] + [pluralize(words[-1])]), name)
+    for alias, name in ITEM_ALIASES.items():
+        if name in names:
+            table.setdefault(" ".join(_normalize(alias)), name)
+            table.setdefault(" ".join(_normalize(pluralize(alias))), name)
+    return table
+
+_admin_item_table_cache: Dict[int, Dict[str, str]] = {}
+
+def _get_admin_item_table(snapshot: MenuSnapshot) -> Dict[str, str]:
+    """Returns the admin item table for a snapshot, building it once per menu version."""
+    cached = _admin_item_table_cache.get(snapshot.version)
+    if cached is None:
+        cached = _build_admin_item_table(snapshot)
+        with _phrase_table_lock:
+            _admin_item_table_cache.clear()
+            _admin_item_table_cache[snapshot.version] = cached
+    return cached
+
+def _strip_phrases(text: str, prefixes: Tuple[str, ...], suffixes: Tuple[str, ...]) -> str:
+    changed = True
+    while changed:
+        changed = False
+        for prefix in prefixes:
+            if text.startswith(prefix + " "):
+                text, changed = text[len(prefix) + 1:], True
+        for suffix in suffixes:
+            if text.endswith(" " + suffix):
+                text, changed = text[:-len(suffix) - 1], True
+    return text
+
+ADMIN_NUMBER_WORDS = dict(
+    {word: number for word, number in NUMBER_WORDS.items() if word not in ("a", "an", "another")},
+    fifteen=15, twenty=20, thirty=30, forty=40, fifty=50, hundred=100,
+)
+
+def _admin_quantity(word: str) -> Optional[int]:
+    return int(word) if word.isdigit() else ADMIN_NUMBER_WORDS.get(word)
+
+def _name_for_count(quantity: int, name: str) -> str:
+    return name if quantity == 1 or name.endswith("s") else pluralize(name)
+
+def _parse_admin_clause(text: str, snapshot: MenuSnapshot, items: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Parses one normalized command (a stock query or a reorder of one item)."""
+    text = _strip_phrases(text, ADMIN_POLITE_PREFIXES, ADMIN_POLITE_SUFFIXES)
+
+    def item_for(phrase: str) -> Optional[str]:
+        phrase = phrase[4:] if phrase.startswith("the ") else phrase
+        phrase = phrase[4:] if phrase.startswith("our ") else phrase
+        return items.get(phrase)
+
+    for pattern in ADMIN_ORDER_PATTERNS:
+        match = pattern.match(text)
+        item_name = match and item_for(match.group("item"))
+        quantity = match and _admin_quantity(match.group("quantity"))
+        if item_name and quantity:
+            return {
+                "action": "order", "item_name": item_name, "quantity_ordered": quantity,
+                "message": f"Okay, I've ordered {quantity} more {_name_for_count(quantity, item_name)}. The stock level should be updated.",
+                "source": "fast_path",
+            }
+
+    for pattern in ADMIN_QUERY_PATTERNS:
+        match = pattern.match(text)
+        item_name = match and item_for(match.group("item"))
+        if item_name:
+            quantity = snapshot.get_item(item_name)['quantity']
+            return {
+                "action": "query_stock", "item_name": item_name,
+                "message": f"We currently have {quantity} {_name_for_count(quantity, item_name)} in stock.",
+                "source": "fast_path",
+            }
+    return None
+
+# A delivery is typically typed as one list: "add 50 fries, 30 salads and 20
+# shakes". Clauses after a reorder may leave out the verb.
+ADMIN_CLAUSE_SEPARATOR = re.compile(r"\s*(?:[,;\n]|\band\b|&)\s*", re.I)
+
+def parse_admin_command_fast(text_input: str, snapshot: MenuSnapshot) -> Optional[Dict[str, Any]]:
+    """Parses simple stock queries and reorders, or a list of them, without the LLM.
+
+    Args:
+        text_input: The raw text command from the manager.
+        snapshot: The current menu snapshot (stock levels are read from it).
+
+    Returns:
+        An AdminManager-style {"action": "query_stock" | "order", "item_name", ...,
+        "message"} dictionary for a single command, or {"action": "batch",
+        "actions": [...], "message"} for a list, when every clause matched a
+        known form; otherwise None.
+    """
+    items = _get_admin_item_table(snapshot)
+    text = " ".join(_normalize(text_input or ""))
+    if not text:
+        return None
+    single = _parse_admin_clause(text, snapshot, items)
+    if single is not None:
+        return single
+
+    actions: List[Dict[str, Any]] = []
+    for clause in ADMIN_CLAUSE_SEPARATOR.split(text_input):
+        clause_text = " ".join(_normalize(clause))
+        if not clause_text:
+            continue
+        action = _parse_admin_clause(clause_text, snapshot, items)
+        if action is None and actions and actions[-1]["action"] == "order":
+            action = _parse_admin_clause("order " + clause_text, snapshot, items) # "..., 30 salads"
+        if action is None:
+            return None
+        actions.append(action)
+    if len(actions) < 2:
+        return None
+
+    ordered = [f"{action['quantity_ordered']} {_name_for_count(action['quantity_ordered'], action['item_name'])}"
+               for action in actions if action["action"] == "order"]
+    messages = [f"Okay, I've ordered {join_phrases(ordered)}."] if ordered else []
+    messages += [action["message"] for action in actions if action["action"] != "order"]
+    return {"action": "batch", "actions": actions, "message": " ".join(messages), "source": "fast_path"}
+
+# --- Fast-Path Statistics ---
+# Hit rate and an estimate of LLM latency saved, so the fast path's value can
+# be checked in production. LLM latencies are recorded by ai_logic.
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "parse_seconds": 0.0, "llm_calls": 0, "llm_seconds": 0.0}
+
+def record_fast_path_attempt(hit: bool, parse_seconds: float) -> None:
+    """Records one fast-path attempt and how long parsing took."""
+    with _stats_lock:
+        _stats["hits" if hit else "misses"] += 1
+        _stats["parse_seconds"] += parse_seconds
+
+def record_llm_latency(seconds: float) -> None:
+    """Records the duration of one OrderTaker LLM call (used to estimate time saved)."""
+    with _stats_lock:
+        _stats["llm_calls"] += 1
+        _stats["llm_seconds"] += seconds
+
+def get_fast_path_stats() -> Dict[str, Any]:
+    """Returns hit rate, average parse time and the estimated LLM time saved."""
+    with _stats_lock:
+        stats = dict(_stats)
+    attempts = stats["hits"] + stats["misses"]
+    avg_llm_seconds = stats["llm_seconds"] / stats["llm_calls"] if stats["llm_calls"] else 0.0
+    avg_parse_seconds = stats["parse_seconds"] / attempts if attempts else 0.0
+    return {
+        "attempts": attempts,
+        "hits": stats["hits"],
+        "hit_rate": stats["hits"] / attempts if attempts else 0.0,
+        "avg_parse_ms": avg_parse_seconds * 1000,
+        "avg_llm_ms": avg_llm_seconds * 1000,
+        "estimated_seconds_saved": stats["hits"] * max(avg_llm_seconds - avg_parse_seconds, 0.0),
+    }
+
+def reset_fast_path_stats() -> None:
+    """Clears the fast-path counters."""
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0 if isinstance(_stats[key], int) else 0.0
@@ -0,0 +1,205 @@
+import concurrent.futures
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+# --- Group Commit ---
+# Every stock change used to be its own transaction: take the write lock, write
+# the WAL frames, commit. At peak, lanes queued on SQLite's single write lock
+# (and the busy_timeout) one commit at a time. The writer below owns all stock
+# writes of this process on one thread. It takes all the work that queued up
+# while the previous batch was committing (optionally waiting a few more
+# milliseconds for stragglers), runs it in one IMMEDIATE transaction and commits
+# once. Each unit of work gets its own SAVEPOINT, so one that fails (e.g. out
+# of stock) is rolled back alone without affecting the rest of the batch.
+# Callers only get their result once the batch has committed.
+#
+# Other processes (more Streamlit or service workers) write the same database.
+# When one holds the write lock past the connection's busy_timeout, SQLite
+# reports SQLITE_BUSY ("database is locked"). The writer then rolls the batch
+# back and runs it again after a jittered exponential backoff, up to
+# max_attempts times, before failing its callers with the busy error. Work is
+# a function of the connection only, so re-running it is safe, and no caller
+# sees a result from an attempt that didn't commit. Callers tell that final
+# busy error from other failures with is_busy_error() (db_utils turns it into
+# STOCK_BUSY or a "Database busy" failure).
+
+def is_busy_error(error: BaseException) -> bool:
+    """True for SQLITE_BUSY / SQLITE_LOCKED, i.e. another connection holds the lock."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None) # Python 3.11+
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED) # Extended codes keep the primary code in the low byte
+    message = str(error)
+    return "database is locked" in message or "database table is locked" in message
+
+class RollbackWork(Exception):
+    """Raised by a unit of work to undo its own changes and still return `result` to its caller."""
+
+    def __init__(self, result: Any = None):
+        super().__init__(result)
+        self.result = result
+
+Work = Callable[[sqlite3.Connection], Any]
+
+class GroupCommitWriter:
+    """Runs submitted work on a dedicated thread, committing it in batches.
+
+    Args:
+        connect: Returns the connection to use; called on the writer thread
+            before each batch (so a pooled per-thread connection works).
+        window_seconds: How long to keep collecting work after the first item
+            of a batch arrives. 0 takes only what is already queued, which
+            batches well under load without delaying a lone request.
+        max_batch: Upper bound on units of work per transaction.
+        max_attempts: How often a batch is tried when the database is busy.
+        backoff_seconds: Backoff before the first retry; doubles per retry
+            (with full jitter) up to max_backoff_seconds.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], window_seconds: float = 0.0,
+                 max_batch: int = 256, name: str = "group-commit-writer", max_attempts: int = 5,
+                 backoff_seconds: float = 0.025, max_backoff_seconds: float = 0.5):
+        self.connect = connect
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._queue: "queue.Queue[Optional[Tuple[Work, concurrent.futures.Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "work": 0, "rolled_back": 0, "busy_retries": 0, "busy_failures": 0}
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            # A writer inherited across fork() has no thread behind it; start a new one
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, work: Work) -> concurrent.futures.Future:
+        """Queues work(conn) for the next batch; the future resolves after that batch commits."""
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        if self._thread is not None and threading.current_thread() is self._thread:
+            raise RuntimeError(f"{self.name}: submit() called from the writer thread; run the work inline instead.")
+        self._ensure_thread()
+        self._queue.put((work, future))
+        return future
+
+    def execute(self, work: Work, timeout: Optional[float] = None) -> Any:
+        """Runs work(conn) in the next batch and blocks for its result."""
+        return self.submit(work).result(timeout)
+
+    def stop(self) -> None:
+        """Finishes the queued work and stops the writer thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+    def _collect(self, first: Tuple[Work, concurrent.futures.Future]) -> Tuple[List[Tuple[Work, concurrent.futures.Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect(first)
+            try:
+                self._run_batch(batch)
+            except Exception as e: # Never let one batch stop the writer and strand later callers
+                print(f"{self.name}: unexpected error running a batch of {len(batch)}: {e!r}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            if stopping:
+                return
+
+    def _run_batch(self, batch: List[Tuple[Work, concurrent.futures.Future]]) -> None:
+        batch = [(work, future) for work, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        for attempt in range(self.max_attempts):
+            try:
+                outcomes = self._attempt_batch(batch)
+                break
+            except Exception as e:
+                if is_busy_error(e) and attempt + 1 < self.max_attempts:
+                    self.stats["busy_retries"] += 1
+                    time.sleep(random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt)))
+                    continue
+                if is_busy_error(e):
+                    self.stats["busy_failures"] += 1
+                # The transaction itself failed (e.g. no connection, disk I/O or still locked): nothing in it was applied
+                print(f"{self.name}: batch of {len(batch)} failed after {attempt + 1} attempt(s): {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+        self.stats["batches"] += 1
+        self.stats["work"] += len(batch)
+        for future, succeeded, value in outcomes:
+            if succeeded:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _attempt_batch(self, batch: List[Tuple[Work, concurrent.futures.Future]]) -> List[Tuple[concurrent.futures.Future, bool, Any]]:
+        """Runs the batch in one transaction and commits it; raises (after rolling back) if it can't."""
+        outcomes: List[Tuple[concurrent.futures.Future, bool, Any]] = []
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rolled_back = 0
+            for work, future in batch:
+                conn.execute("SAVEPOINT work")
+                try:
+                    outcomes.append((future, True, work(conn)))
+                    conn.execute("RELEASE work")
+                except RollbackWork as rollback:
+                    conn.execute("ROLLBACK TO work")
+                    conn.execute("RELEASE work")
+                    rolled_back += 1
+                    outcomes.append((future, True, rollback.result))
+                except Exception as e:
+                    if is_busy_error(e):
+                        raise # Retry the whole batch rather than fail this work
+                    conn.execute("ROLLBACK TO work")
+                    conn.execute("RELEASE work")
+                    rolled_back += 1
+                    outcomes.append((future, False, e))
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        self.stats["rolled_back"] += rolled_back
+        return outcomes
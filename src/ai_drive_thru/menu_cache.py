@@ -0,0 +1,107 @@
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple
+
+from src.ai_drive_thru import db_utils
+
+# --- Menu Snapshot Cache ---
+# The menu text sent to the LLM, the kiosk menu buttons and the admin/chef views
+# all derive from the same few rows. Rather than re-scanning menu_items and
+# re-formatting strings on every request and Streamlit rerun, we keep one
+# immutable snapshot per menu version and only rebuild it when the
+# menu_version counter in the database moves (see db_utils.SCHEMA_STATEMENTS).
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    """An immutable view of the menu at one menu version.
+
+    The row dictionaries are shared by every reader and must be treated as read-only.
+    """
+    version: int
+    items: List[Dict[str, Any]] # All rows, in table order
+    in_stock_items: List[Dict[str, Any]] # Rows with quantity > 0
+    by_name: Dict[str, Dict[str, Any]] # Lower-cased item name -> row
+    menu_prompt: str # Customer-facing menu text for the OrderTaker prompt
+    inventory_prompt: str # Full inventory text for the AdminManager prompt
+    price_index: Dict[str, int] # Lower-cased item name -> unit price in integer cents
+
+    def get_item(self, item_name: str) -> Optional[Dict[str, Any]]:
+        """Looks up a row by name, case-insensitively (matching COLLATE NOCASE)."""
+        if not item_name:
+            return None
+        return self.by_name.get(item_name.lower())
+
+def render_menu_prompt(items: List[Dict[str, Any]]) -> str:
+    """Formats menu rows into the customer menu string for the LLM prompt,
+       excluding items with quantity 0."""
+    menu_lines = []
+    # For now, we assume unique names from the DB schema constraint
+    for item in items:
+        if item['quantity'] > 0: # Only include items in stock
+            # Basic formatting, assuming 'description' isn't needed for the core prompt
+            menu_lines.append(f"- {item['name']}: ${item['price']:.2f}")
+
+    if not menu_lines:
+        return "Apologies, the menu is currently empty or unavailable."
+
+    return "\n".join(menu_lines)
+
+def render_inventory_prompt(items: List[Dict[str, Any]]) -> str:
+    """Formats menu rows into the inventory string for the admin LLM prompt,
+       including their quantities."""
+    inventory_lines = [f"- {item['name']}: {item['quantity']} available" for item in items]
+
+    if not inventory_lines:
+        return "Inventory is currently empty."
+
+    return "\n".join(inventory_lines)
+
+def price_to_cents(price: Any) -> int:
+    """Converts a DB price (stored as REAL dollars) to exact integer cents."""
+    # Go through str() so 5.99 becomes Decimal('5.99'), not its binary approximation
+    return int((Decimal(str(price)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def build_menu_snapshot(version: int, items: List[Dict[str, Any]]) -> MenuSnapshot:
+    """Builds a snapshot (rows, index and rendered prompt strings) from menu rows."""
+    return MenuSnapshot(
+        version=version,
+        items=items,
+        in_stock_items=[item for item in items if item['quantity'] > 0],
+        by_name={item['name'].lower(): item for item in items},
+        menu_prompt=render_menu_prompt(items),
+        inventory_prompt=render_inventory_prompt(items),
+        price_index={item['name'].lower(): price_to_cents(item['price']) for item in items},
+    )
+
+_cached: Optional[Tuple[str, MenuSnapshot]] = None # (DB path, snapshot)
+_rebuild_lock = threading.Lock()
+
+def get_menu_snapshot() -> MenuSnapshot:
+    """Returns the current menu snapshot, rebuilding it only if the menu changed.
+
+    The common path costs one single-row version read; the table scan and
+    string formatting only happen after a write to menu_items.
+    """
+    global _cached
+    db_path = db_utils.DB_FILE
+    version = db_utils.get_menu_version()
+    cached = _cached
+    if cached is not None and cached[0] == db_path and cached[1].version == version:
+        return cached[1]
+
+    with _rebuild_lock:
+        # Another thread may have rebuilt it while we waited for the lock
+        cached = _cached
+        if cached is not None and cached[0] == db_path and cached[1].version == version:
+            return cached[1]
+        version, items = db_utils.get_menu_items_with_version()
+        snapshot = build_menu_snapshot(version, items)
+        _cached = (db_path, snapshot)
+        return snapshot
+
+def invalidate_menu_snapshot() -> None:
+    """Drops the cached snapshot so the next read rebuilds it from the database."""
+    global _cached
+    with _rebuild_lock:
+        _cached = None
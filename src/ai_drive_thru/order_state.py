@@ -0,0 +1,122 @@
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+
+# --- Order State ---
+# An order is kept as OrderLine objects indexed by (item, details), so adding
+# or removing an item is one dict lookup instead of a scan over every line.
+# Lines use __slots__ (no per-instance __dict__), which keeps an order to a few
+# hundred bytes; the session store holds thousands of them. to_list() gives the
+# [{"item", "quantity", "details"?}] structure the Confirmer prompt, pricing and
+# reserve_order() take. Shared by the Streamlit app and the HTTP service.
+
+LineKey = Tuple[str, Optional[str]]
+
+class OrderLine:
+    """One line of an order: a menu item, its details (e.g. a soda flavor) and a quantity."""
+
+    __slots__ = ("item", "details", "quantity")
+
+    def __init__(self, item: str, details: Optional[str], quantity: int):
+        self.item = item
+        self.details = details
+        self.quantity = quantity
+
+    def to_dict(self) -> Dict[str, Any]:
+        line = {"item": self.item, "quantity": self.quantity}
+        if self.details:
+            line["details"] = self.details
+        return line
+
+    def __repr__(self) -> str:
+        return f"OrderLine({self.item!r}, {self.details!r}, {self.quantity})"
+
+class Order:
+    """The lines of one customer's order, in the order they were first added."""
+
+    __slots__ = ("_lines",)
+
+    def __init__(self, lines: Optional[List[Dict[str, Any]]] = None):
+        self._lines: Dict[LineKey, OrderLine] = {} # Dicts keep insertion order
+        for line in lines or []:
+            self.add(line["item"], line.get("details"), int(line.get("quantity", 1)))
+
+    @staticmethod
+    def _key(item_key: str, details: Optional[str]) -> LineKey:
+        return item_key, details or None # "" and None are the same line
+
+    def add(self, item_key: str, details: Optional[str] = None, quantity: int = 1) -> None:
+        """Adds an item to the order, or increases its quantity."""
+        key = self._key(item_key, details)
+        line = self._lines.get(key)
+        if line is None:
+            self._lines[key] = OrderLine(item_key, key[1], quantity)
+        else:
+            line.quantity += quantity
+
+    def remove(self, item_key: str, quantity: int = 1, details: Optional[str] = None) -> bool:
+        """Removes or decrements an item in the order.
+
+        Args:
+            item_key: The key of the item to remove (e.g., 'Burger').
+            quantity: The number of items to remove (defaults to 1).
+            details: Specific details of the item to remove (e.g., 'Coke' for 'Soda').
+
+        Returns:
+            True if the item was found and its quantity adjusted or removed.
+        """
+        key = self._key(item_key, details)
+        line = self._lines.get(key)
+        if line is None:
+            return False
+        # Decrease quantity; drop the line once it reaches 0
+        line.quantity -= quantity
+        if line.quantity <= 0:
+            del self._lines[key]
+        return True
+
+    def clear(self) -> None:
+        self._lines.clear()
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """The order as a list of {"item", "quantity", "details"?} dictionaries."""
+        return [line.to_dict() for line in self._lines.values()]
+
+    def __iter__(self) -> Iterator[OrderLine]:
+        return iter(self._lines.values())
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def __repr__(self) -> str:
+        return f"Order({list(self._lines.values())!r})"
+
+def apply_order_action(order: Order, action_data: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Applies one add/remove action from the OrderTaker to the order.
+
+    Returns:
+        An (outcome, description) tuple, where outcome is "added", "removed",
+        "not_found" (a removal of something not in the order) or None if the
+        action was invalid.
+    """
+    action_type = action_data.get('action')
+    item_key = action_data.get('item')
+    details = action_data.get('details')
+    try:
+        quantity = int(action_data.get('quantity', 1))
+    except (ValueError, TypeError):
+        quantity = 1
+
+    if not item_key or quantity <= 0:
+        return None, None # Skip invalid actions
+
+    detail_str = f' ({details})' if details else ''
+    item_desc = f"{quantity}x {item_key}{detail_str}"
+
+    if action_type == 'add':
+        # ai_logic has already dropped anything that cannot be added due to stock
+        order.add(item_key, details, quantity)
+        return "added", item_desc
+    if action_type == 'remove':
+        if order.remove(item_key, quantity, details):
+            return "removed", item_desc
+        return "not_found", item_desc
+    return None, None
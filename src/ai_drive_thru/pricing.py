@@ -0,0 +1,47 @@
+from typing import Optional, Dict, Any, List
+
+from src.ai_drive_thru.menu_cache import get_menu_snapshot, MenuSnapshot
+
+# --- Order Pricing ---
+# Totals a whole order in one pass over its lines using the price index held by
+# the menu snapshot, instead of one get_item_details() query per line. All money
+# is integer cents so totals are exact; convert to dollars only for display.
+
+def format_cents(cents: int) -> str:
+    """Formats integer cents as a dollar string, e.g. 1198 -> '$11.98'."""
+    sign = "-" if cents < 0 else ""
+    dollars, remainder = divmod(abs(cents), 100)
+    return f"{sign}${dollars}.{remainder:02d}"
+
+def price_order(order_lines: List[Dict[str, Any]], snapshot: Optional[MenuSnapshot] = None) -> Dict[str, Any]:
+    """Prices every line of an order and totals it.
+
+    Args:
+        order_lines: Order lines as kept in the kiosk, e.g. [{"item": "Fries", "quantity": 2}].
+        snapshot: Menu snapshot to price against; defaults to the current one.
+
+    Returns:
+        A dictionary with "lines" (each input line plus "unit_price_cents",
+        "line_total_cents" and "found"), "total_cents" and "unknown_items"
+        (names not on the menu, priced at 0).
+    """
+    price_index = (snapshot or get_menu_snapshot()).price_index
+    priced_lines = []
+    unknown_items = []
+    total_cents = 0
+    for line in order_lines:
+        item_name = line.get("item") or ""
+        try:
+            quantity = int(line.get("quantity", 1))
+        except (ValueError, TypeError):
+            quantity = 1 # Same fallback the kiosk uses for malformed quantities
+        unit_price_cents = price_index.get(item_name.lower())
+        found = unit_price_cents is not None
+        if not found:
+            unknown_items.append(item_name)
+            unit_price_cents = 0
+        line_total_cents = unit_price_cents * quantity
+        total_cents += line_total_cents
+        priced_lines.append(dict(line, quantity=quantity, unit_price_cents=unit_price_cents, line_total_cents=line_total_cents, found=found))
+
+    return {"lines": priced_lines, "total_cents": total_cents, "unknown_items": unknown_items}
@@ -0,0 +1,268 @@
+import asyncio
+import collections
+import dataclasses
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+# --- Request Policy ---
+# A slow completion leaves a car waiting at the speaker, and most of that wait
+# is in the tail: the median OrderTaker call is fine, the slowest few percent
+# are not. hedged_call() wraps one LLM request with:
+#   - a deadline for the whole call, after which it gives up;
+#   - a hedge: if the primary request hasn't answered after hedge_delay_seconds
+#     (or failed outright), a second request goes to a faster fallback model
+#     and whichever answer arrives first is used; the other is cancelled;
+#   - a few retries with jittered backoff for transient errors (rate limits,
+#     5xx, dropped connections), each within the deadline.
+# stream_with_fallback() does the same for a streamed answer: the first chunk
+# has to arrive within the hedge delay (transient errors before it are
+# retried), otherwise the stream is dropped and a hedged_call() for the time
+# that is left answers instead, in one piece. Once chunks flow the stream
+# can't be swapped out any more, so it only has to finish within the deadline.
+# RequestStats keeps the counters and a window of latencies, so the hedge win
+# rate and p99 can be watched in production.
+
+T = TypeVar("T")
+
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+# openai / httpx exceptions for requests that never got an answer; matched by
+# name so this module needn't import either library.
+TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "TransportError", "ConnectionError"}
+
+def is_transient_error(error: BaseException) -> bool:
+    """True if the error (or one it was raised from, e.g. inside Semantic Kernel) is worth retrying."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if getattr(error, "status_code", None) in TRANSIENT_STATUS_CODES:
+            return True
+        if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+@dataclass(frozen=True)
+class RequestPolicy:
+    """How one LLM call is bounded, hedged and retried."""
+    deadline_seconds: float = 8.0
+    hedge_delay_seconds: Optional[float] = 1.5 # None: no hedge (the fallback is still tried if the primary fails)
+    max_retries: int = 1 # Per request (primary and hedge each)
+    retry_backoff_seconds: float = 0.2 # Doubles per retry, with jitter
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+class RequestStats:
+    """Counters and recent latencies for calls made through one policy."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self._counts = {"calls": 0, "hedged": 0, "hedge_wins": 0, "retries": 0, "timeouts": 0, "failures": 0}
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def record(self, seconds: float, hedged: bool, hedge_won: bool) -> None:
+        """Records one answered call."""
+        with self._lock:
+            self._counts["calls"] += 1
+            self._counts["hedged"] += hedged
+            self._counts["hedge_wins"] += hedge_won
+            self._latencies.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the counters, hedge rates and p50/p99 latency (ms) of the recent answered calls."""
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = sorted(self._latencies)
+        calls = counts["calls"]
+        return dict(
+            counts,
+            hedge_rate=counts["hedged"] / calls if calls else 0.0,
+            hedge_win_rate=counts["hedge_wins"] / counts["hedged"] if counts["hedged"] else 0.0,
+            p50_ms=_percentile(latencies, 50) * 1000,
+            p99_ms=_percentile(latencies, 99) * 1000,
+        )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latencies.clear()
+            for key in self._counts:
+                self._counts[key] = 0
+
+async def _with_retries(call: Callable[[], Awaitable[T]], policy: RequestPolicy, deadline: float,
+                        stats: Optional[RequestStats]) -> T:
+    loop = asyncio.get_running_loop()
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            delay = policy.retry_backoff_seconds * 2 ** attempt * random.uniform(0.5, 1.0)
+            if attempt >= policy.max_retries or not is_transient_error(e) or loop.time() + delay >= deadline:
+                raise
+            print(f"Transient LLM error, retrying in {delay * 1000:.0f} ms: {e}")
+            attempt += 1
+            if stats is not None:
+                stats.count("retries")
+            await asyncio.sleep(delay)
+
+async def hedged_call(primary: Callable[[], Awaitable[T]], hedge: Optional[Callable[[], Awaitable[T]]] = None,
+                      policy: RequestPolicy = RequestPolicy(), stats: Optional[RequestStats] = None) -> T:
+    """Runs primary() under the policy, hedging with hedge() if it is slow or fails.
+
+    Args:
+        primary: Starts the request to the main model.
+        hedge: Starts the same request to the fallback model, or None.
+        policy: Deadline, hedge delay and retries.
+        stats: Where to record the outcome, if anywhere.
+
+    Returns:
+        The first successful answer.
+
+    Raises:
+        asyncio.TimeoutError if nothing answered within the deadline, otherwise
+        the last error if every request failed.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + policy.deadline_seconds
+    hedge_at = started + policy.hedge_delay_seconds if hedge is not None and policy.hedge_delay_seconds is not None else None
+    primary_task = asyncio.ensure_future(_with_retries(primary, policy, deadline, stats))
+    hedge_task: Optional[asyncio.Future] = None
+    pending = {primary_task}
+    last_error: Optional[BaseException] = None
+    try:
+        while True:
+            now = loop.time()
+            if now >= deadline:
+                if stats is not None:
+                    stats.count("timeouts")
+                raise asyncio.TimeoutError(f"No answer from the model within {policy.deadline_seconds:.1f}s.")
+            timeout = deadline - now
+            if hedge_task is None and hedge_at is not None:
+                timeout = min(timeout, max(0.0, hedge_at - now))
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            answered = [task for task in done if task.exception() is None]
+            for task in done:
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    print(f"{'Hedged' if task is hedge_task else 'Primary'} LLM request failed: {last_error}")
+            if answered:
+                winner = primary_task if primary_task in answered else answered[0]
+                if stats is not None:
+                    stats.record(loop.time() - started, hedged=hedge_task is not None, hedge_won=winner is hedge_task)
+                return winner.result()
+            # Hedge when the primary is slow, or right away when it has failed
+            if hedge is not None and hedge_task is None and (not pending or (hedge_at is not None and loop.time() >= hedge_at)):
+                hedge_task = asyncio.ensure_future(_with_retries(hedge, policy, deadline, stats))
+                pending.add(hedge_task)
+            elif not pending:
+                if stats is not None:
+                    stats.count("failures")
+                raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+_END_OF_STREAM = object()
+
+def _pump(chunks: AsyncIterator[T]) -> "tuple[asyncio.Task, asyncio.Queue]":
+    """Drains chunks into a queue on a task of its own, so waiting for a chunk can time out
+    without the stream being resumed in a different task (which breaks context-local
+    state such as Semantic Kernel's tracing spans). Ends with (_END_OF_STREAM, error or None)."""
+    chunk_queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for chunk in chunks:
+                chunk_queue.put_nowait((chunk, None))
+        except Exception as e:
+            chunk_queue.put_nowait((_END_OF_STREAM, e))
+        else:
+            chunk_queue.put_nowait((_END_OF_STREAM, None))
+
+    return asyncio.ensure_future(pump()), chunk_queue
+
+async def stream_with_fallback(stream: Callable[[], AsyncIterator[T]], fallback: Callable[[RequestPolicy], Awaitable[T]],
+                               policy: RequestPolicy = RequestPolicy(), stats: Optional[RequestStats] = None) -> AsyncIterator[T]:
+    """Yields the chunks of stream() under the policy, or fallback()'s answer if the stream is slow to start.
+
+    Args:
+        stream: Starts the streamed request.
+        fallback: Makes the same request unstreamed, given the policy for the
+            time that is left (deadline shortened, hedging right away), e.g.
+            with hedged_call().
+        policy: Deadline, hedge delay (the time allowed for the first chunk)
+            and retries.
+        stats: Where to record the outcome, if anywhere. A call answered by
+            the fallback counts as hedged, with the hedge winning.
+
+    Raises:
+        asyncio.TimeoutError if the answer didn't complete within the deadline,
+        otherwise the fallback's error if it failed too.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + policy.deadline_seconds
+    first_chunk_by = deadline if policy.hedge_delay_seconds is None else min(deadline, started + policy.hedge_delay_seconds)
+    attempt = 0
+    while True:
+        task, chunk_queue = _pump(stream())
+        try:
+            first, error = await asyncio.wait_for(chunk_queue.get(), max(0.0, first_chunk_by - loop.time()))
+        except asyncio.TimeoutError:
+            task.cancel()
+            print(f"No streamed LLM output within {first_chunk_by - started:.1f}s, falling back to an unstreamed request.")
+            break
+        if error is not None:
+            delay = policy.retry_backoff_seconds * 2 ** attempt * random.uniform(0.5, 1.0)
+            if attempt < policy.max_retries and is_transient_error(error) and loop.time() + delay < first_chunk_by:
+                print(f"Transient LLM error, retrying in {delay * 1000:.0f} ms: {error}")
+                attempt += 1
+                if stats is not None:
+                    stats.count("retries")
+                await asyncio.sleep(delay)
+                continue
+            print(f"Streamed LLM request failed, falling back to an unstreamed request: {error}")
+            break
+
+        try:
+            chunk = first
+            while chunk is not _END_OF_STREAM:
+                yield chunk
+                chunk, error = await asyncio.wait_for(chunk_queue.get(), deadline - loop.time())
+                if error is not None:
+                    raise error
+        except asyncio.TimeoutError:
+            if stats is not None:
+                stats.count("timeouts")
+            raise asyncio.TimeoutError(f"The streamed answer didn't finish within {policy.deadline_seconds:.1f}s.")
+        except Exception:
+            if stats is not None:
+                stats.count("failures")
+            raise
+        finally:
+            task.cancel()
+        if stats is not None:
+            stats.record(loop.time() - started, hedged=False, hedge_won=False)
+        return
+
+    remaining = deadline - loop.time()
+    try:
+        if remaining <= 0:
+            raise asyncio.TimeoutError(f"No answer from the model within {policy.deadline_seconds:.1f}s.")
+        answer = await fallback(dataclasses.replace(policy, deadline_seconds=remaining, hedge_delay_seconds=0.0))
+    except Exception as e:
+        if stats is not None:
+            stats.count("timeouts" if isinstance(e, asyncio.TimeoutError) else "failures")
+        raise
+    if stats is not None:
+        stats.record(loop.time() - started, hedged=True, hedge_won=True)
+    yield answer
@@ -0,0 +1,178 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+# --- LLM Response Cache ---
+# Identical requests ("hi", "what do you have", the same phrasing of an order)
+# used to cost a full LLM round trip every time. The cache maps
+# (prompt, normalized input, prompt context) to the raw LLM response text.
+#
+# The context is the menu/inventory text the prompt was rendered with, so a
+# change that alters what the LLM was shown (an item selling out, a price change,
+# a stock level for the admin prompt) changes the key: affected entries simply
+# stop matching, and a cached answer can never offer an item that is now out of
+# stock. Entries also expire after a TTL, and the in-memory layer is an LRU
+# backed by a small SQLite file so restarts start warm.
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'response_cache.db') # Next to menu.db
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+def normalize_cache_input(text: str) -> str:
+    """Normalizes user input so trivially different phrasings share a cache entry.
+
+    Lower-cases, drops punctuation (keeping apostrophes inside words) and collapses whitespace.
+    """
+    text = (text or "").lower().replace("’", "'")
+    text = re.sub(r"[^\w\s']+", " ", text)
+    return " ".join(token.strip("'") for token in text.split() if token.strip("'"))
+
+def make_cache_key(prompt_name: str, text_input: str, context: str) -> str:
+    """Builds the cache key for one prompt invocation."""
+    digest = hashlib.sha256()
+    for part in (prompt_name, normalize_cache_input(text_input), context or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+class ResponseCache:
+    """An LRU + TTL cache of LLM responses with optional SQLite persistence.
+
+    Safe to use from several threads. Pass db_path=None for a memory-only cache.
+    """
+
+    def __init__(self, db_path: Optional[str] = DEFAULT_CACHE_FILE,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict() # key -> (response, expires_at)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_failed = False
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    # --- Disk layer ---
+    def _get_conn(self) -> Optional[sqlite3.Connection]:
+        """Opens the backing store on first use. Must be called with the lock held."""
+        if self.db_path is None or self._disk_failed:
+            return None
+        if self._conn is None:
+            try:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA busy_timeout=2000")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_response_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                """)
+                conn.execute("DELETE FROM llm_response_cache WHERE expires_at < ?", (time.time(),))
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                # The cache is an optimization; carry on memory-only
+                print(f"Warning: Response cache store unavailable at '{self.db_path}': {e}")
+                self._disk_failed = True
+                return None
+        return self._conn
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        conn = self._get_conn()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT response, expires_at FROM llm_response_cache WHERE cache_key = ? AND expires_at >= ?",
+                (key, now),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Warning: Response cache read failed: {e}")
+            return None
+        return (row[0], row[1]) if row else None
+
+    def _disk_put(self, key: str, response: str, expires_at: float, now: float) -> None:
+        conn = self._get_conn()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_response_cache (cache_key, response, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, expires_at, now),
+            )
+            # Keep the file bounded like the memory layer: drop expired and least recently used rows
+            conn.execute("DELETE FROM llm_response_cache WHERE expires_at < ?", (now,))
+            conn.execute("""
+                DELETE FROM llm_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: Response cache write failed: {e}")
+
+    # --- Public API ---
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] >= now:
+                    self._entries.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[0]
+                del self._entries[key]
+
+            entry = self._disk_get(key, now)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._remember(key, entry)
+            self.stats["disk_hits"] += 1
+            return entry[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Stores a response in memory and in the backing store."""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, (response, expires_at))
+            self._disk_put(key, response, expires_at, now)
+            self.stats["stores"] += 1
+
+    def _remember(self, key: str, entry: Tuple[str, float]) -> None:
+        """Adds an entry to the LRU, evicting the oldest ones. Must be called with the lock held."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes every entry from memory and the backing store."""
+        with self._lock:
+            self._entries.clear()
+            conn = self._get_conn()
+            if conn is not None:
+                try:
+                    conn.execute("DELETE FROM llm_response_cache")
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Warning: Response cache clear failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and the overall hit rate."""
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._entries))
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
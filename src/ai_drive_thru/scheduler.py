@@ -0,0 +1,123 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+try:
+    import fcntl # POSIX only; without it every process runs its own schedule
+except ImportError:
+    fcntl = None
+
+# --- Periodic Background Tasks ---
+# Runs a coroutine function every interval_seconds on an event loop, e.g. the
+# autonomous inventory check. Runs never pile up: ticks are on a fixed grid, and
+# ticks missed while a run is still going are skipped rather than queued. A run
+# requested while another is in progress (a manual trigger racing the schedule)
+# is skipped too. Each tick is delayed by a random jitter so several processes
+# started together don't all hit the database at the same moment.
+#
+# Several processes (Streamlit workers, service workers) may share a database.
+# run_forever(lock=...) only runs on the process holding a ProcessLock on a file
+# next to it. The others check the lock each tick and take over if the holder
+# exits, since the OS releases a flock() with its process.
+
+class ProcessLock:
+    """A non-blocking exclusive flock() on path, held until release() or process exit."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._pid: Optional[int] = None
+
+    def try_acquire(self) -> bool:
+        """Returns True if this process holds (or just took) the lock."""
+        if self._file is not None and self._pid == os.getpid():
+            return True
+        if fcntl is None:
+            return True
+        lock_file = open(self.path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file, self._pid = lock_file, os.getpid()
+        return True
+
+    def release(self) -> None:
+        if self._file is not None and self._pid == os.getpid():
+            self._file.close() # Closing the file drops the flock
+        self._file = self._pid = None
+
+class PeriodicTask:
+    """Runs func() every interval_seconds (plus up to jitter_seconds) on the loop that runs run_forever()."""
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[Any]], interval_seconds: float,
+                 jitter_seconds: float = 0.0, timeout_seconds: Optional[float] = None, run_immediately: bool = False):
+        if interval_seconds <= 0:
+            raise ValueError("interval_seconds must be positive")
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.timeout_seconds = timeout_seconds
+        self.run_immediately = run_immediately
+        self._running = threading.Lock() # Held while a run is in progress, from any loop or thread
+        self._rng = random.Random()
+        self.stats: Dict[str, Any] = {"runs": 0, "failures": 0, "skipped": 0, "not_leader": 0, "last_duration": None, "last_result": None}
+
+    async def run_once(self) -> Optional[Any]:
+        """Runs func() now unless a run is already in progress; returns its result, or None if skipped or failed."""
+        if not self._running.acquire(blocking=False):
+            self.stats["skipped"] += 1
+            print(f"{self.name}: previous run still in progress; skipping.")
+            return None
+        started = time.perf_counter()
+        try:
+            if self.timeout_seconds:
+                result = await asyncio.wait_for(self.func(), self.timeout_seconds)
+            else:
+                result = await self.func()
+            self.stats["runs"] += 1
+            self.stats["last_result"] = result
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["failures"] += 1
+            print(f"{self.name}: run failed: {e!r}")
+            return None
+        finally:
+            self.stats["last_duration"] = time.perf_counter() - started
+            self._running.release()
+
+    async def run_forever(self, lock: Optional[ProcessLock] = None) -> None:
+        """Runs the schedule until cancelled; with a lock, only while this process holds it."""
+        next_tick = time.monotonic() + (0.0 if self.run_immediately else self.interval_seconds)
+        try:
+            while True:
+                jitter = self._rng.uniform(0, self.jitter_seconds) if self.jitter_seconds else 0.0
+                await asyncio.sleep(max(0.0, next_tick - time.monotonic()) + jitter)
+                if lock is None or lock.try_acquire():
+                    await self.run_once()
+                else:
+                    self.stats["not_leader"] += 1 # Another process runs the schedule
+                next_tick = self._next_tick(next_tick)
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def _next_tick(self, next_tick: float) -> float:
+        next_tick += self.interval_seconds
+        overdue = time.monotonic() - next_tick
+        if overdue >= 0: # The run outlasted the interval: skip the ticks it covered
+            missed = int(overdue // self.interval_seconds) + 1
+            self.stats["skipped"] += missed
+            next_tick += missed * self.interval_seconds
+        return next_tick
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
@@ -0,0 +1,173 @@
+import collections
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Optional, Dict, Iterator, List
+
+from src.ai_drive_thru.order_state import Order
+
+# --- Session Store ---
+# Per-lane state (the order plus its chat history) for the app and the HTTP
+# service. Memory per session is bounded: the order is a handful of
+# __slots__ objects, and chat history is a ring buffer of (role, content)
+# tuples holding the last CHAT_HISTORY_LIMIT messages. If CHAT_ARCHIVE_DIR is
+# set, messages pushed out of the buffer (and whatever is left when a
+# session ends) are appended to a JSON-lines file per session, so long
+# sessions lose nothing but hold only their recent past in memory.
+
+CHAT_HISTORY_LIMIT = 50
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR") # e.g. "chat_archive"; unset keeps no archive
+
+def archive_path_for(session_id: str, kind: str = "chat", archive_dir: Optional[str] = None) -> Optional[str]:
+    """The archive file for one of a session's chat histories, or None if archiving is off."""
+    archive_dir = archive_dir or CHAT_ARCHIVE_DIR
+    if not archive_dir:
+        return None
+    return os.path.join(archive_dir, f"{session_id}-{kind}.jsonl")
+
+class ChatHistory:
+    """Bounded chat history; iterating yields {"role", "content"} dictionaries, oldest first."""
+
+    __slots__ = ("_messages", "archive_path", "archived")
+
+    def __init__(self, max_messages: int = CHAT_HISTORY_LIMIT, archive_path: Optional[str] = None,
+                 messages: Optional[List[Dict[str, str]]] = None):
+        self._messages: "collections.deque" = collections.deque(maxlen=max_messages)
+        self.archive_path = archive_path
+        self.archived = 0 # Messages moved out of memory (to the archive, or dropped without one)
+        for message in messages or []:
+            self.append(message)
+
+    def append(self, message: Dict[str, str]) -> None:
+        """Records a {"role", "content"} message, evicting the oldest one when full."""
+        if len(self._messages) == self._messages.maxlen:
+            self._archive([self._messages[0]])
+        self._messages.append((message["role"], message["content"]))
+
+    def archive_all(self) -> None:
+        """Moves every message in memory to the archive (e.g. when the session ends)."""
+        if self.archive_path and self._messages:
+            self._archive(list(self._messages))
+            self._messages.clear()
+
+    def _archive(self, entries: List[tuple]) -> None:
+        self.archived += len(entries)
+        if not self.archive_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.archive_path) or ".", exist_ok=True)
+            with open(self.archive_path, "a", encoding="utf-8") as archive:
+                for role, content in entries:
+                    archive.write(json.dumps({"role": role, "content": content}) + "\n")
+        except OSError as e:
+            print(f"Warning: Could not archive chat history to '{self.archive_path}': {e}")
+
+    def read_archive(self) -> Iterator[Dict[str, str]]:
+        """The archived messages, oldest first."""
+        if not self.archive_path or not os.path.exists(self.archive_path):
+            return
+        with open(self.archive_path, encoding="utf-8") as archive:
+            for line in archive:
+                yield json.loads(line)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for role, content in self._messages:
+            yield {"role": role, "content": content}
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+class Session:
+    """One lane's (or browser tab's) order and chat history.
+
+    Subclasses add their own slots, e.g. the HTTP service's per-session lock.
+    """
+
+    __slots__ = ("session_id", "order", "messages", "created_at", "last_seen")
+
+    def __init__(self, session_id: str, history_limit: int = CHAT_HISTORY_LIMIT, archive_dir: Optional[str] = None):
+        self.session_id = session_id
+        self.order = Order()
+        self.messages = ChatHistory(history_limit, archive_path_for(session_id, "chat", archive_dir))
+        self.created_at = self.last_seen = time.monotonic()
+
+    def busy(self) -> bool:
+        """Whether the session is in use and must not be expired."""
+        return False
+
+    def close(self) -> None:
+        self.messages.archive_all()
+
+class SessionStore:
+    """Sessions by id, expired after idle_seconds or least-recently-used beyond max_sessions.
+
+    Sessions are kept in last-used order, so expiring them only looks at the
+    ones that are actually stale.
+    """
+
+    def __init__(self, session_class: type = Session, max_sessions: int = 10000, idle_seconds: float = 15 * 60,
+                 history_limit: int = CHAT_HISTORY_LIMIT, archive_dir: Optional[str] = None):
+        self.session_class = session_class
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.history_limit = history_limit
+        self.archive_dir = archive_dir
+        self._sessions: "collections.OrderedDict[str, Session]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self) -> Session:
+        session = self.session_class(uuid.uuid4().hex, self.history_limit, self.archive_dir)
+        with self._lock:
+            self._sessions[session.session_id] = session
+        self.expire()
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Returns the session and marks it as just used, or None if it doesn't exist."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_seen = time.monotonic()
+                self._sessions.move_to_end(session_id)
+        return session
+
+    def discard(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def expire(self) -> int:
+        """Drops idle sessions and, past max_sessions, the least recently used ones; returns how many."""
+        expired = []
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            for _ in range(len(self._sessions)): # Each session is looked at most once
+                session_id, session = next(iter(self._sessions.items()))
+                if session.last_seen >= cutoff and len(self._sessions) <= self.max_sessions:
+                    break
+                if session.busy():
+                    session.last_seen = time.monotonic()
+                    self._sessions.move_to_end(session_id)
+                    continue
+                expired.append(self._sessions.popitem(last=False)[1])
+        for session in expired:
+            session.close()
+        return len(expired)
+
+    def clear(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
@@ -0,0 +1,105 @@
+import json
+from typing import Optional, Dict, Any, List
+
+# --- Incremental OrderTaker JSON Parsing ---
+# When the OrderTaker response is streamed, the kiosk should not wait for the
+# whole completion before showing anything. IncrementalActionParser scans the
+# text as it arrives and hands back each object of the top-level "actions"
+# array the moment its closing brace is seen, along with top-level string
+# fields such as "status" once they are complete. It tracks only string/escape
+# state and nesting depth, so each character is looked at once.
+
+class IncrementalActionParser:
+    """Extracts "actions" entries from a streamed JSON object as soon as each one closes."""
+
+    def __init__(self):
+        self.text = "" # Everything fed so far
+        self.top_level_strings: Dict[str, str] = {} # e.g. {"status": "success", "message": "..."}
+        self.done = False # True once the top-level object has closed
+        self._pos = 0 # Next character of self.text to scan
+        self._depth = 0
+        self._started = False # Seen the opening brace of the top-level object
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None # Most recent complete string at depth 1
+        self._expect_value_for: Optional[str] = None # Key whose value comes next at depth 1
+        self._in_actions = False
+        self._object_start: Optional[int] = None # Start of the action object being captured
+
+    @property
+    def status(self) -> Optional[str]:
+        return self.top_level_strings.get("status")
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Adds streamed text and returns any action objects completed by it."""
+        self.text += chunk
+        completed = []
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            char = text[self._pos]
+            position = self._pos
+            self._pos += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._on_top_level_string(text[self._string_start:position + 1])
+                continue
+
+            if not self._started:
+                # Skip anything before the object, e.g. a ```json fence
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char == ":" and self._depth == 1:
+                self._expect_value_for = self._last_string
+            elif char == ",":
+                if self._depth == 1:
+                    self._expect_value_for = None
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._expect_value_for == "actions":
+                    self._in_actions = True
+                elif char == "{" and self._depth == 2 and self._in_actions:
+                    self._object_start = position
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._depth == 2 and self._object_start is not None:
+                    action = self._decode(text[self._object_start:position + 1])
+                    if action is not None:
+                        completed.append(action)
+                    self._object_start = None
+                elif char == "]" and self._depth == 1:
+                    self._in_actions = False
+                elif self._depth == 0:
+                    self.done = True
+        return completed
+
+    def _on_top_level_string(self, literal: str) -> None:
+        value = self._decode(literal)
+        if not isinstance(value, str):
+            return
+        if self._expect_value_for is not None:
+            self.top_level_strings[self._expect_value_for] = value # A value
+            self._expect_value_for = None
+        else:
+            self._last_string = value # A key; its ':' follows
+
+    @staticmethod
+    def _decode(literal: str) -> Any:
+        try:
+            return json.loads(literal)
+        except json.JSONDecodeError:
+            print(f"Warning: Could not decode streamed JSON fragment: {literal}")
+            return None
@@ -0,0 +1,353 @@
+import asyncio
+import io
+import math
+import time
+import wave
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator, Callable, Iterable, Union, AsyncIterable
+
+import numpy as np
+
+# --- Chunked, Overlapped Speech-to-Text ---
+# The voice path used to upload the whole recording, wait for the transcript,
+# and only then start the OrderTaker. Here the audio is split at silences by a
+# small local voice activity detector (VAD), every utterance is transcribed
+# concurrently, and each transcript is handed to the OrderTaker as soon as it
+# and the ones before it are ready. "Two cheeseburgers ... and a coke" is
+# being parsed while the second half is still at the transcription service.
+#
+# The transcription backend is pluggable (see TranscriptionBackend), so tests
+# and benchmarks can use StubTranscriptionBackend instead of the API.
+
+@dataclass(frozen=True)
+class Utterance:
+    """One stretch of speech cut from a recording, as 16-bit PCM."""
+    index: int
+    start_ms: float
+    end_ms: float
+    pcm: bytes
+    sample_rate: int
+    channels: int
+    sample_width: int = 2
+    wav: Optional[bytes] = None # Set when the audio could not be split and is passed through as recorded
+
+    def to_wav(self) -> bytes:
+        """Wraps the PCM in a WAV container for upload."""
+        if self.wav is not None:
+            return self.wav
+        return encode_wav(self.pcm, self.sample_rate, self.channels, self.sample_width)
+
+def encode_wav(pcm: bytes, sample_rate: int, channels: int, sample_width: int = 2) -> bytes:
+    """Builds a WAV file from raw little-endian PCM."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+def decode_wav(wav_bytes: bytes) -> Optional[Dict[str, Any]]:
+    """Reads a WAV file into {"pcm", "sample_rate", "channels", "sample_width"}, or None if it can't be read."""
+    try:
+        with wave.open(io.BytesIO(wav_bytes), "rb") as wav_file:
+            return {
+                "pcm": wav_file.readframes(wav_file.getnframes()),
+                "sample_rate": wav_file.getframerate(),
+                "channels": wav_file.getnchannels(),
+                "sample_width": wav_file.getsampwidth(),
+            }
+    except (wave.Error, EOFError) as e:
+        print(f"Warning: Could not read WAV audio: {e}")
+        return None
+
+class EnergyVAD:
+    """Splits 16-bit PCM into utterances at stretches of silence.
+
+    A frame counts as speech when its RMS energy is well above a running
+    estimate of the background noise. The estimate starts low (so the
+    threshold is min_rms) rather than at the first frame, which may already
+    be speech; it follows the frames judged silent, and rises to the quietest
+    frame of the last noise_window_ms if even that was loud enough to count
+    as speech (steady noise such as an idling engine), re-trimming the
+    utterance in progress against the new threshold. Audio can be fed in pieces as it is
+    recorded; feed() returns each utterance as soon as the silence after it
+    is long enough, and flush() returns whatever is left at the end.
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, frame_ms: int = 30,
+                 min_silence_ms: int = 400, min_speech_ms: int = 150, padding_ms: int = 150,
+                 max_utterance_ms: int = 15000, speech_ratio: float = 3.0, min_rms: float = 300.0,
+                 noise_window_ms: int = 2000):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_ms = frame_ms
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * channels * 2
+        self.min_silence_frames = max(1, min_silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.padding_frames = padding_ms // frame_ms
+        self.max_utterance_frames = max(1, max_utterance_ms // frame_ms)
+        self.speech_ratio = speech_ratio
+        self.min_rms = min_rms
+
+        self._pending = b"" # Bytes not yet making up a whole frame
+        self._frame_index = 0
+        self._noise_floor = min_rms / speech_ratio
+        self._recent_rms: deque = deque(maxlen=max(1, noise_window_ms // frame_ms, self.padding_frames + 1))
+        self._recent_silence: deque = deque(maxlen=self.padding_frames or 1) # Lead-in for the next utterance
+        self._speech: List[bytes] = [] # Frames of the utterance in progress
+        self._speech_rms: List[float] = [] # Their energies, to re-judge them if the noise floor rises
+        self._speech_start = 0 # Frame index where the current utterance starts
+        self._speech_frames = 0 # Frames in the utterance that were actually speech
+        self._trailing_silence = 0
+        self._utterance_count = 0
+
+    def _frame_rms(self, frame: bytes) -> float:
+        samples = np.frombuffer(frame, dtype="<i2").astype(np.float64) # WAV PCM is little-endian
+        if not samples.size:
+            return 0.0
+        return math.sqrt(np.mean(samples * samples))
+
+    def _is_speech(self, rms: float) -> bool:
+        self._recent_rms.append(rms)
+        if len(self._recent_rms) == self._recent_rms.maxlen:
+            quietest = min(self._recent_rms)
+            if quietest >= self._noise_floor * self.speech_ratio:
+                self._noise_floor = quietest # No frame in the window was quiet: that's the noise
+        speech = rms >= max(self.min_rms, self._noise_floor * self.speech_ratio)
+        if not speech:
+            # Track slow changes in background noise (fans, traffic)
+            self._noise_floor = 0.95 * self._noise_floor + 0.05 * rms
+        return speech
+
+    def _retrim(self) -> None:
+        """Re-judges the utterance in progress after the noise floor rose, dropping what is now noise."""
+        threshold = max(self.min_rms, self._noise_floor * self.speech_ratio)
+        loud = [index for index, rms in enumerate(self._speech_rms) if rms >= threshold]
+        if not loud:
+            self._recent_silence.extend(self._speech[-self._recent_silence.maxlen:] if self.padding_frames else [])
+            self._speech, self._speech_rms, self._speech_frames, self._trailing_silence = [], [], 0, 0
+            return
+        first = max(0, loud[0] - self.padding_frames)
+        self._speech, self._speech_rms = self._speech[first:], self._speech_rms[first:]
+        self._speech_start += first
+        self._speech_frames = len(loud)
+        self._trailing_silence = len(self._speech_rms) - 1 - (loud[-1] - first)
+
+    def _emit(self) -> Optional[Utterance]:
+        """Closes the utterance in progress, keeping only padding_frames of its trailing silence."""
+        frames = self._speech
+        keep_silence = min(self._trailing_silence, self.padding_frames)
+        if self._trailing_silence > keep_silence:
+            frames = frames[:len(frames) - (self._trailing_silence - keep_silence)]
+        speech_frames = self._speech_frames
+        start = self._speech_start
+        self._speech, self._speech_rms, self._speech_frames, self._trailing_silence = [], [], 0, 0
+        if speech_frames < self.min_speech_frames:
+            return None # A click or a cough, not speech
+        utterance = Utterance(
+            index=self._utterance_count,
+            start_ms=start * self.frame_ms,
+            end_ms=(start + len(frames)) * self.frame_ms,
+            pcm=b"".join(frames),
+            sample_rate=self.sample_rate,
+            channels=self.channels,
+        )
+        self._utterance_count += 1
+        return utterance
+
+    def feed(self, pcm: bytes) -> List[Utterance]:
+        """Adds recorded PCM and returns any utterances it completed."""
+        data = self._pending + pcm
+        completed = []
+        offset = 0
+        while offset + self.frame_bytes <= len(data):
+            frame = data[offset:offset + self.frame_bytes]
+            offset += self.frame_bytes
+            rms = self._frame_rms(frame)
+            noise_floor = self._noise_floor
+            speech = self._is_speech(rms)
+            if self._speech and self._noise_floor > noise_floor:
+                self._retrim()
+
+            if not self._speech:
+                if speech:
+                    self._speech = list(self._recent_silence) + [frame]
+                    self._speech_rms = list(self._recent_rms)[-len(self._speech):] # The lead-in frames are the latest ones
+                    self._speech_start = self._frame_index - len(self._recent_silence)
+                    self._speech_frames = 1
+                    self._recent_silence.clear()
+                elif self.padding_frames:
+                    self._recent_silence.append(frame)
+            else:
+                self._speech.append(frame)
+                self._speech_rms.append(rms)
+                if speech:
+                    self._speech_frames += 1
+                    self._trailing_silence = 0
+                else:
+                    self._trailing_silence += 1
+                if self._trailing_silence >= self.min_silence_frames or len(self._speech) >= self.max_utterance_frames:
+                    utterance = self._emit()
+                    if utterance is not None:
+                        completed.append(utterance)
+            self._frame_index += 1
+        self._pending = data[offset:]
+        return completed
+
+    def flush(self) -> List[Utterance]:
+        """Ends the recording and returns the final utterance, if any."""
+        if self._pending and self._speech:
+            self._speech.append(self._pending)
+        self._pending = b""
+        if not self._speech:
+            return []
+        utterance = self._emit()
+        return [utterance] if utterance is not None else []
+
+def split_wav_utterances(wav_bytes: bytes, **vad_options) -> List[Utterance]:
+    """Splits a whole WAV recording into utterances.
+
+    Audio the VAD can't handle (not 16-bit PCM, or not a readable WAV) is
+    returned as a single utterance so it is still transcribed as before.
+    """
+    audio = decode_wav(wav_bytes)
+    if audio is None or audio["sample_width"] != 2:
+        return [Utterance(index=0, start_ms=0.0, end_ms=0.0, pcm=b"", sample_rate=0, channels=0, sample_width=0, wav=wav_bytes)]
+    vad = EnergyVAD(audio["sample_rate"], audio["channels"], **vad_options)
+    return vad.feed(audio["pcm"]) + vad.flush()
+
+# --- Transcription Backends ---
+
+class TranscriptionBackend:
+    """Turns one utterance (a WAV file) into text. Subclasses implement transcribe()."""
+
+    async def transcribe(self, wav_bytes: bytes) -> str:
+        raise NotImplementedError
+
+class OpenAITranscriptionBackend(TranscriptionBackend):
+    """Transcribes with the OpenAI audio API (or any compatible endpoint the client points at)."""
+
+    def __init__(self, client, model: str = "whisper-1",
+                 prepare_upload: Optional[Callable[[bytes], Tuple[bytes, str]]] = None):
+        self.client = client # An AsyncOpenAI client
+        self.model = model
+        self.prepare_upload = prepare_upload # Optional: WAV bytes -> (upload bytes, file name), e.g. to compress
+
+    async def transcribe(self, wav_bytes: bytes) -> str:
+        data, file_name = self.prepare_upload(wav_bytes) if self.prepare_upload else (wav_bytes, "utterance.wav")
+        audio_file = io.BytesIO(data)
+        audio_file.name = file_name # The API infers the format from the name
+        transcript = await self.client.audio.transcriptions.create(model=self.model, file=audio_file)
+        return transcript.text
+
+class StubTranscriptionBackend(TranscriptionBackend):
+    """A local stand-in for tests and benchmarks.
+
+    Returns the canned transcripts in call order (cycling if there are more
+    utterances than transcripts). Simulated latency is a fixed part, plus
+    seconds_per_audio_second for each second of audio, plus upload time at
+    upload_bytes_per_second, like a real service.
+    """
+
+    def __init__(self, transcripts: List[str], latency_seconds: float = 0.0, seconds_per_audio_second: float = 0.0,
+                 upload_bytes_per_second: Optional[float] = None):
+        self.transcripts = list(transcripts) or [""]
+        self.latency_seconds = latency_seconds
+        self.seconds_per_audio_second = seconds_per_audio_second
+        self.upload_bytes_per_second = upload_bytes_per_second # Simulated uplink; None for unlimited
+        self.calls = 0
+        self.bytes_uploaded = 0
+        self._uplink = asyncio.Lock()
+
+    async def transcribe(self, wav_bytes: bytes) -> str:
+        index = self.calls
+        self.calls += 1
+        self.bytes_uploaded += len(wav_bytes)
+        if self.upload_bytes_per_second:
+            async with self._uplink: # Concurrent uploads share one uplink
+                await asyncio.sleep(len(wav_bytes) / self.upload_bytes_per_second)
+        delay = self.latency_seconds
+        if self.seconds_per_audio_second:
+            audio = decode_wav(wav_bytes)
+            if audio is not None and audio["sample_rate"]:
+                frame_bytes = audio["channels"] * audio["sample_width"]
+                delay += len(audio["pcm"]) / frame_bytes / audio["sample_rate"] * self.seconds_per_audio_second
+        if delay:
+            await asyncio.sleep(delay)
+        return self.transcripts[index % len(self.transcripts)]
+
+# --- Overlapped Pipeline ---
+
+_END = object()
+
+async def _iterate(source: Union[Iterable[Utterance], AsyncIterable[Utterance]]) -> AsyncIterator[Utterance]:
+    if hasattr(source, "__aiter__"):
+        async for item in source:
+            yield item
+    else:
+        for item in source:
+            yield item
+
+async def stream_utterance_pipeline(
+    utterances: Union[Iterable[Utterance], AsyncIterable[Utterance]],
+    backend: TranscriptionBackend,
+    handle_text: Callable[[str], AsyncIterator[Dict[str, Any]]],
+    max_concurrency: int = 4,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Transcribes utterances concurrently and runs handle_text on each transcript.
+
+    Utterances may come from a live (async) source; each starts transcribing as
+    soon as it arrives, and handle_text starts as soon as its transcript is back.
+    Events are yielded in utterance order, each tagged with "utterance" (its index):
+        {"type": "transcript", "text": ..., "elapsed_ms": ...} for each utterance,
+        then the events of handle_text(text) for that utterance, or
+        {"type": "error", "error": ...} if transcription or handling failed.
+    Utterances transcribed as empty text are skipped.
+    """
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    lanes: asyncio.Queue = asyncio.Queue() # One event queue per utterance, in order
+    tasks: List[asyncio.Task] = []
+
+    async def process(utterance: Utterance, events: asyncio.Queue) -> None:
+        try:
+            async with semaphore:
+                text = (await backend.transcribe(utterance.to_wav())).strip()
+            if text:
+                events.put_nowait({"type": "transcript", "utterance": utterance.index, "text": text,
+                                   "elapsed_ms": (time.perf_counter() - started) * 1000})
+                async for event in handle_text(text):
+                    events.put_nowait(dict(event, utterance=utterance.index))
+        except Exception as e:
+            print(f"Error processing utterance {utterance.index}: {e}")
+            events.put_nowait({"type": "error", "utterance": utterance.index, "error": str(e)})
+        finally:
+            events.put_nowait(_END)
+
+    async def produce() -> None:
+        try:
+            async for utterance in _iterate(utterances):
+                events: asyncio.Queue = asyncio.Queue()
+                tasks.append(asyncio.create_task(process(utterance, events)))
+                lanes.put_nowait(events)
+        finally:
+            lanes.put_nowait(_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            events = await lanes.get()
+            if events is _END:
+                break
+            while True:
+                event = await events.get()
+                if event is _END:
+                    break
+                yield event
+        await producer # Surface errors from the audio source
+    finally:
+        for task in tasks + [producer]:
+            if not task.done():
+                task.cancel()